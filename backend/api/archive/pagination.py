@@ -0,0 +1,9 @@
+﻿from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class ArchiveCursorPagination(CursorPagination):
+    ordering = '-timestamp'
+    page_size = settings.ARCHIVE_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.ORDER_MAX_PAGE_SIZE
@@ -0,0 +1,14 @@
+﻿from rest_framework import serializers
+from core.models import AuditLogArchive, OrderStatusHistoryArchive
+
+
+class AuditLogArchiveSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AuditLogArchive
+        fields = ['id', 'action', 'performed_by', 'object_id', 'timestamp', 'details', 'archived_at']
+
+
+class OrderStatusHistoryArchiveSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderStatusHistoryArchive
+        fields = ['id', 'order', 'status', 'changed_by', 'timestamp', 'archived_at']
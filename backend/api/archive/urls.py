@@ -0,0 +1,7 @@
+﻿from django.urls import path
+from .views import AuditLogArchiveView, OrderHistoryArchiveView
+
+urlpatterns = [
+    path('audit-logs/', AuditLogArchiveView.as_view(), name='archive-audit-logs'),
+    path('order-history/', OrderHistoryArchiveView.as_view(), name='archive-order-history'),
+]
@@ -0,0 +1,83 @@
+﻿from rest_framework import generics
+from rest_framework.exceptions import ValidationError
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+
+from core.audit import audit
+from core.models import AuditLogArchive, OrderStatusHistoryArchive
+from api.orders.querysets import parse_timestamp
+from .serializers import AuditLogArchiveSerializer, OrderStatusHistoryArchiveSerializer
+from .permissions import IsManager
+from .pagination import ArchiveCursorPagination
+
+time_range_parameters = [
+    openapi.Parameter('start', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+    openapi.Parameter('end', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+]
+
+
+class ArchiveListView(generics.ListAPIView):
+    """
+    Base for the archive listings: keyset-paginated by timestamp and filtered
+    by an optional [start, end) range plus the view's exact-match filters.
+    """
+    permission_classes = [IsManager]
+    pagination_class = ArchiveCursorPagination
+    filter_fields = {}
+
+    def get_queryset(self):
+        queryset = self.queryset
+        params = self.request.query_params
+
+        start, end = parse_timestamp(params, 'start'), parse_timestamp(params, 'end')
+        if start:
+            queryset = queryset.filter(timestamp__gte=start)
+        if end:
+            queryset = queryset.filter(timestamp__lt=end)
+
+        for param, lookup in self.filter_fields.items():
+            value = params.get(param)
+            if value:
+                try:
+                    queryset = queryset.filter(**{lookup: value})
+                except ValueError:
+                    raise ValidationError({param: "Invalid value."})
+        return queryset
+
+
+class AuditLogArchiveView(ArchiveListView):
+    queryset = AuditLogArchive.objects.all()
+    serializer_class = AuditLogArchiveSerializer
+    filter_fields = {'action': 'action', 'performed_by': 'performed_by_id', 'object_id': 'object_id'}
+
+    @swagger_auto_schema(
+        operation_description="Lists archived audit log entries (manager only).",
+        manual_parameters=time_range_parameters + [
+            openapi.Parameter('action', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('performed_by', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter('object_id', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+        ],
+        responses={200: AuditLogArchiveSerializer(many=True)}
+    )
+    def get(self, request, *args, **kwargs):
+        audit(request.user, 'archive.audit_logs')
+        return super().get(request, *args, **kwargs)
+
+
+class OrderHistoryArchiveView(ArchiveListView):
+    queryset = OrderStatusHistoryArchive.objects.all()
+    serializer_class = OrderStatusHistoryArchiveSerializer
+    filter_fields = {'order': 'order_id', 'status': 'status', 'changed_by': 'changed_by_id'}
+
+    @swagger_auto_schema(
+        operation_description="Lists archived order status history (manager only).",
+        manual_parameters=time_range_parameters + [
+            openapi.Parameter('order', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter('status', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('changed_by', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        ],
+        responses={200: OrderStatusHistoryArchiveSerializer(many=True)}
+    )
+    def get(self, request, *args, **kwargs):
+        audit(request.user, 'archive.order_history')
+        return super().get(request, *args, **kwargs)
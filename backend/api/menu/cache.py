@@ -0,0 +1,124 @@
+﻿import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+MENU_VERSION_KEY = 'menu:version'
+MENU_MODIFIED_KEY = 'menu:modified'
+MENU_HITS_KEY = 'menu:cache:hits'
+MENU_MISSES_KEY = 'menu:cache:misses'
+
+
+def _incr(key):
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The key was evicted between add() and incr().
+        cache.set(key, 1, timeout=None)
+        return 1
+
+
+async def _aincr(key):
+    await cache.aadd(key, 0, timeout=None)
+    try:
+        return await cache.aincr(key)
+    except ValueError:
+        await cache.aset(key, 1, timeout=None)
+        return 1
+
+
+def _new_version():
+    # A counter would restart at 1 after an eviction or a cache restart and
+    # hit bodies cached under the old numbers; a fresh token never does.
+    return uuid.uuid4().hex[:16]
+
+
+def get_menu_version():
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        version = _new_version()
+        if not cache.add(MENU_VERSION_KEY, version, timeout=None):
+            version = cache.get(MENU_VERSION_KEY, version)
+    return version
+
+
+async def aget_menu_version():
+    version = await cache.aget(MENU_VERSION_KEY)
+    if version is None:
+        version = _new_version()
+        if not await cache.aadd(MENU_VERSION_KEY, version, timeout=None):
+            version = await cache.aget(MENU_VERSION_KEY, version)
+    return version
+
+
+def bump_menu_version():
+    """
+    Invalidates every cached menu response. Old entries are never read again
+    and simply expire.
+    """
+    version = _new_version()
+    cache.set(MENU_MODIFIED_KEY, timezone.now(), timeout=None)
+    cache.set(MENU_VERSION_KEY, version, timeout=None)
+    return version
+
+
+def get_menu_last_modified():
+    return cache.get(MENU_MODIFIED_KEY)
+
+
+async def aget_menu_last_modified():
+    return await cache.aget(MENU_MODIFIED_KEY)
+
+
+def get_cached_menu(request, build, version=None):
+    """
+    Returns the serialized menu for this request, calling `build` only on a miss.
+    The key includes the absolute URI so image URLs and query parameters are
+    kept apart. Pass the `version` the response's ETag was made from, so the
+    body always belongs to the same menu generation as its ETag.
+    """
+    uri = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    key = f"menu:list:v{version or get_menu_version()}:{uri}"
+
+    data = cache.get(key)
+    if data is not None:
+        _incr(MENU_HITS_KEY)
+        return data
+
+    _incr(MENU_MISSES_KEY)
+    data = build()
+    cache.set(key, data, timeout=settings.MENU_CACHE_TIMEOUT)
+    return data
+
+
+async def aget_cached_menu(request, build, version=None):
+    """
+    get_cached_menu() for async views; `build` is a coroutine function.
+    """
+    uri = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    key = f"menu:list:v{version or await aget_menu_version()}:{uri}"
+
+    data = await cache.aget(key)
+    if data is not None:
+        await _aincr(MENU_HITS_KEY)
+        return data
+
+    await _aincr(MENU_MISSES_KEY)
+    data = await build()
+    await cache.aset(key, data, timeout=settings.MENU_CACHE_TIMEOUT)
+    return data
+
+
+def get_menu_cache_stats():
+    hits = cache.get(MENU_HITS_KEY, 0)
+    misses = cache.get(MENU_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'version': get_menu_version(),
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
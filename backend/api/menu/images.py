@@ -0,0 +1,140 @@
+﻿import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from core.models import MenuItem
+from .cache import bump_menu_version
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = ['thumbnail', 'display']
+FORMATS = {
+    'webp': ('WEBP', {'method': 4}),
+    'jpeg': ('JPEG', {'optimize': True, 'progressive': True}),
+}
+VARIANT_DIR = 'menu_images/variants'
+
+_executor = None
+_pid = None
+_lock = threading.Lock()
+
+
+def _resize(image, variant):
+    if variant == 'thumbnail':
+        size = settings.MENU_IMAGE_THUMBNAIL_SIZE
+        return ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+    size = settings.MENU_IMAGE_DISPLAY_SIZE
+    image = image.copy()
+    image.thumbnail((size, size), Image.Resampling.LANCZOS)
+    return image
+
+
+def _encode(image, fmt):
+    pil_format, options = FORMATS[fmt]
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    buffer = BytesIO()
+    # No exif or icc_profile is passed, so none is written.
+    image.save(buffer, pil_format, quality=settings.MENU_IMAGE_QUALITY, **options)
+    return buffer.getvalue()
+
+
+def generate_variants(image_name):
+    """
+    Renders every variant of a stored image in every format and saves them
+    next to the original. Returns {variant: {format: storage name}}.
+    """
+    with default_storage.open(image_name, 'rb') as f:
+        image = Image.open(f)
+        # Lets the JPEG decoder downscale while decoding.
+        image.draft('RGB', (settings.MENU_IMAGE_DISPLAY_SIZE, settings.MENU_IMAGE_DISPLAY_SIZE))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    variants = {}
+    display = _resize(image, 'display')
+    for variant in VARIANTS:
+        # The thumbnail is cut from the display variant, which is much smaller.
+        resized = display if variant == 'display' else _resize(display, variant)
+        variants[variant] = {
+            fmt: default_storage.save(f"{VARIANT_DIR}/{stem}-{variant}.{fmt}", ContentFile(_encode(resized, fmt)))
+            for fmt in FORMATS
+        }
+    return variants
+
+
+def delete_variants(variants):
+    for formats in variants.values():
+        for name in formats.values():
+            default_storage.delete(name)
+
+
+def process_image(item_id, image_name):
+    """
+    Generates the variants for `image_name` and stores them on the item,
+    unless the item's image changed in the meantime.
+    """
+    variants = generate_variants(image_name)
+    if not MenuItem.objects.filter(pk=item_id, image=image_name).update(image_variants=variants):
+        delete_variants(variants)
+        return False
+    bump_menu_version()
+    return True
+
+
+def _run(item_id, image_name):
+    try:
+        process_image(item_id, image_name)
+    except Exception:
+        logger.exception("Could not generate image variants for menu item #%s", item_id)
+    finally:
+        close_old_connections()
+
+
+def get_executor():
+    # One pool per process; a forked worker must not reuse its parent's threads.
+    global _executor, _pid
+    if _pid != os.getpid():
+        with _lock:
+            if _pid != os.getpid():
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.MENU_IMAGE_WORKERS, thread_name_prefix='menu-images'
+                )
+                _pid = os.getpid()
+    return _executor
+
+
+def image_saved(item, previous_variants):
+    """
+    Called after a save that set or cleared the image of `item`. Once the
+    transaction commits, the old variants are removed and new ones are
+    generated off the request path.
+    """
+    def schedule():
+        if previous_variants:
+            delete_variants(previous_variants)
+        if item.image:
+            get_executor().submit(_run, item.pk, item.image.name)
+
+    transaction.on_commit(schedule)
+
+
+def variant_urls(variants, request=None):
+    urls = {}
+    for variant, formats in variants.items():
+        urls[variant] = {}
+        for fmt, name in formats.items():
+            url = default_storage.url(name)
+            urls[variant][fmt] = request.build_absolute_uri(url) if request is not None else url
+    return urls
@@ -0,0 +1,79 @@
+﻿from decimal import Decimal, InvalidOperation
+
+from django.db.models import Case, Q, Value, When
+from drf_yasg import openapi
+from rest_framework.exceptions import ValidationError
+
+from core.models import MenuItem
+
+BOOLEANS = {'true': True, '1': True, 'false': False, '0': False}
+
+menu_filter_parameters = [
+    openapi.Parameter(
+        'search', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+        description="Matches name or description; items matching by name come first.",
+    ),
+    openapi.Parameter(
+        'category', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+        description="Comma-separated category ids.",
+    ),
+    openapi.Parameter('available', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN),
+    openapi.Parameter('min_price', openapi.IN_QUERY, type=openapi.TYPE_NUMBER),
+    openapi.Parameter('max_price', openapi.IN_QUERY, type=openapi.TYPE_NUMBER),
+]
+
+
+def menu_queryset():
+    """
+    Base queryset for every menu item read. The category is joined in
+    rather than fetched per item.
+    """
+    return MenuItem.objects.select_related('category')
+
+
+def _price(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        price = Decimal(value)
+    except InvalidOperation:
+        raise ValidationError({name: "A valid number is required."})
+    if not price.is_finite() or price < 0:
+        raise ValidationError({name: "Must be a non-negative number."})
+    return price
+
+
+def filter_menu(queryset, params):
+    """
+    Applies the optional `category`, `available`, `min_price`, `max_price`
+    and `search` query parameters. The filters are served by the
+    (category, available, price) and (available, price) indexes; on
+    PostgreSQL the search uses the trigram indexes on name and description.
+    """
+    category = params.get('category')
+    if category:
+        try:
+            queryset = queryset.filter(category_id__in=[int(part) for part in category.split(',')])
+        except ValueError:
+            raise ValidationError({'category': "Must be a comma-separated list of category ids."})
+
+    available = params.get('available')
+    if available:
+        if available.lower() not in BOOLEANS:
+            raise ValidationError({'available': "Must be true or false."})
+        queryset = queryset.filter(available=BOOLEANS[available.lower()])
+
+    min_price, max_price = _price(params, 'min_price'), _price(params, 'max_price')
+    if min_price is not None:
+        queryset = queryset.filter(price__gte=min_price)
+    if max_price is not None:
+        queryset = queryset.filter(price__lte=max_price)
+
+    search = params.get('search', '').strip()
+    if search:
+        queryset = queryset.filter(Q(name__icontains=search) | Q(description__icontains=search)).order_by(
+            Case(When(name__icontains=search, then=Value(0)), default=Value(1)), 'name', 'id'
+        )
+
+    return queryset
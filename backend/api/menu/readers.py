@@ -0,0 +1,45 @@
+﻿from django.core.files.storage import default_storage
+from rest_framework import serializers
+
+from .images import variant_urls
+
+MENU_COLUMNS = [
+    'id', 'name', 'description', 'price', 'available', 'category_id', 'category__name', 'image', 'image_variants',
+]
+
+_price = serializers.DecimalField(max_digits=8, decimal_places=2)
+
+
+def menu_rows(queryset):
+    # values() joins the category the same way select_related does.
+    return queryset.values(*MENU_COLUMNS)
+
+
+def serialize_menu_items(rows, request=None, image_variant=None):
+    """
+    Returns the MenuItemSerializer representation of rows from menu_rows(),
+    including the `image` swap for `image_variant`.
+    """
+    data = []
+    for row in rows:
+        image = row['image']
+        if image:
+            image = default_storage.url(image)
+            if request is not None:
+                image = request.build_absolute_uri(image)
+        else:
+            image = None
+        variants = variant_urls(row['image_variants'], request)
+        if image_variant in variants:
+            image = variants[image_variant]['webp']
+        data.append({
+            'id': row['id'],
+            'name': row['name'],
+            'description': row['description'],
+            'price': _price.to_representation(row['price']),
+            'available': row['available'],
+            'category': {'id': row['category_id'], 'name': row['category__name']} if row['category_id'] is not None else None,
+            'image': image,
+            'image_variants': variants,
+        })
+    return data
@@ -1,10 +1,35 @@
 ﻿from rest_framework import serializers
-from core.models import MenuItem
+from core.models import MenuCategory, MenuItem
+from .images import variant_urls
+
+
+class MenuCategorySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MenuCategory
+        fields = ['id', 'name']
+
 
 class MenuItemSerializer(serializers.ModelSerializer):
+    # Read from a select_related join; written as `category_id`.
+    category = MenuCategorySerializer(read_only=True)
+    category_id = serializers.PrimaryKeyRelatedField(
+        source='category', queryset=MenuCategory.objects.all(), write_only=True, required=False, allow_null=True
+    )
     image = serializers.ImageField(required=False, allow_null=True)
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = MenuItem
-        fields = ['id', 'name', 'description', 'price', 'available', 'image']
+        fields = ['id', 'name', 'description', 'price', 'available', 'category', 'category_id', 'image', 'image_variants']
+
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image_variants, self.context.get('request'))
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Lists show a smaller variant as `image`; until the upload has been
+        # processed the original is served instead.
+        variant = self.context.get('image_variant')
+        if variant in data['image_variants']:
+            data['image'] = data['image_variants'][variant]['webp']
+        return data
@@ -1,8 +1,14 @@
 ﻿from django.urls import path
-from .views import MenuItemListCreateView, MenuItemDetailView, ToggleAvailabilityView
+from .views import (
+    MenuItemListCreateView, MenuItemDetailView, ToggleAvailabilityView, MenuCacheStatsView,
+    MenuCategoryListCreateView, MenuCategoryDetailView,
+)
 
 urlpatterns = [
     path('items/', MenuItemListCreateView.as_view(), name='menu-item-list-create'),
     path('items/<int:pk>/', MenuItemDetailView.as_view(), name='menu-item-detail'),
     path('items/<int:pk>/toggle-availability/', ToggleAvailabilityView.as_view(), name='toggle-availability'),
+    path('categories/', MenuCategoryListCreateView.as_view(), name='menu-category-list-create'),
+    path('categories/<int:pk>/', MenuCategoryDetailView.as_view(), name='menu-category-detail'),
+    path('cache-stats/', MenuCacheStatsView.as_view(), name='menu-cache-stats'),
 ]
@@ -1,43 +1,90 @@
 ﻿import logging
+from asgiref.sync import sync_to_async
+from django.db import transaction
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from rest_framework import generics
+from rest_framework import generics, mixins
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from core.models import MenuItem
-from .permissions import IsManagerOrReadOnly, IsManagerOrKitchen
-from .serializers import MenuItemSerializer
+from core.async_views import AsyncGenericAPIView
+from core.audit import audit
+from core.conditional import ConditionalGetMixin, make_etag
+from core.metrics import timed_serialization
+from core.models import MenuCategory, MenuItem
+from .cache import aget_cached_menu, aget_menu_last_modified, aget_menu_version, bump_menu_version, get_menu_cache_stats
+from .images import VARIANTS, delete_variants, image_saved
+from .readers import menu_rows, serialize_menu_items
+from .querysets import filter_menu, menu_filter_parameters, menu_queryset
+from .permissions import IsManager, IsManagerOrReadOnly, IsManagerOrKitchen
+from .serializers import MenuCategorySerializer, MenuItemSerializer
 
-logger = logging.getLogger("audit")
 
-
-class MenuItemListCreateView(generics.ListCreateAPIView):
+class MenuItemListCreateView(ConditionalGetMixin, mixins.CreateModelMixin, AsyncGenericAPIView):
     queryset = MenuItem.objects.all()
     serializer_class = MenuItemSerializer
     permission_classes = [IsManagerOrReadOnly]
 
     @swagger_auto_schema(
-        operation_description="Returns the list of all menu items.",
+        operation_description="Returns the menu items matching the filters, with their category. `image` is "
+                              "the WebP thumbnail unless another variant, or `original`, is requested.",
+        manual_parameters=[
+            openapi.Parameter('image', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=VARIANTS + ['original'], default='thumbnail'),
+            *menu_filter_parameters,
+        ],
         responses={200: MenuItemSerializer(many=True)}
     )
-    def get(self, request, *args, **kwargs):
-        logger.info(f"{request.user} fetched menu item list.")
-        return super().get(request, *args, **kwargs)
+    async def get(self, request, *args, **kwargs):
+        audit(request.user, 'menu.list')
+        return await self.aconditional_get(request, self.alist, *args, **kwargs)
+
+    async def aget_conditional_validators(self, request):
+        # The ETag comes from the menu version token, which never repeats.
+        self.menu_version = await aget_menu_version()
+        return make_etag(request, self.menu_version), await aget_menu_last_modified()
+
+    async def alist(self, request, *args, **kwargs):
+        # Built up front so invalid filters are rejected before the cache lookup.
+        context = self.get_serializer_context()
+        queryset = filter_menu(menu_queryset(), request.query_params)
+
+        async def build():
+            rows = [row async for row in menu_rows(queryset)]
+            with timed_serialization():
+                return serialize_menu_items(rows, request, context['image_variant'])
+
+        return Response(await aget_cached_menu(request, build, self.menu_version))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request.method == 'GET':
+            variant = self.request.query_params.get('image', 'thumbnail')
+            if variant not in VARIANTS and variant != 'original':
+                raise ValidationError({'image': f"Must be one of: {', '.join(VARIANTS + ['original'])}."})
+            context['image_variant'] = variant
+        return context
+
+    def perform_create(self, serializer):
+        item = serializer.save()
+        if item.image:
+            image_saved(item, {})
+        bump_menu_version()
 
     @swagger_auto_schema(
         request_body=MenuItemSerializer,
         operation_description="Creates a new menu item. Only accessible to managers.",
         responses={201: MenuItemSerializer}
     )
-    def post(self, request, *args, **kwargs):
-        logger.info(f"{request.user} created a new menu item.")
-        return super().post(request, *args, **kwargs)
+    async def post(self, request, *args, **kwargs):
+        audit(request.user, 'menu.create')
+        return await sync_to_async(self.create)(request, *args, **kwargs)
 
 
 class MenuItemDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = MenuItem.objects.all()
+    queryset = menu_queryset()
     serializer_class = MenuItemSerializer
     permission_classes = [IsManagerOrReadOnly]
 
@@ -46,7 +93,7 @@ class MenuItemDetailView(generics.RetrieveUpdateDestroyAPIView):
         responses={200: MenuItemSerializer}
     )
     def get(self, request, *args, **kwargs):
-        logger.info(f"{request.user} viewed menu item #{kwargs.get('pk')}")
+        audit(request.user, 'menu.view', kwargs.get('pk'))
         return super().get(request, *args, **kwargs)
 
     @swagger_auto_schema(
@@ -55,7 +102,7 @@ class MenuItemDetailView(generics.RetrieveUpdateDestroyAPIView):
         responses={200: MenuItemSerializer}
     )
     def patch(self, request, *args, **kwargs):
-        logger.info(f"{request.user} updated menu item #{kwargs.get('pk')}")
+        audit(request.user, 'menu.update', kwargs.get('pk'))
         return super().patch(request, *args, **kwargs)
 
     @swagger_auto_schema(
@@ -63,9 +110,88 @@ class MenuItemDetailView(generics.RetrieveUpdateDestroyAPIView):
         responses={204: 'No content'}
     )
     def delete(self, request, *args, **kwargs):
-        logger.info(f"{request.user} deleted menu item #{kwargs.get('pk')}")
+        audit(request.user, 'menu.delete', kwargs.get('pk'))
+        return super().delete(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        previous_variants = serializer.instance.image_variants
+        if 'image' in serializer.validated_data:
+            image_saved(serializer.save(image_variants={}), previous_variants)
+        else:
+            serializer.save()
+        bump_menu_version()
+
+    def perform_destroy(self, instance):
+        variants = instance.image_variants
+        instance.delete()
+        if variants:
+            transaction.on_commit(lambda: delete_variants(variants))
+        bump_menu_version()
+
+
+class MenuCategoryListCreateView(generics.ListCreateAPIView):
+    queryset = MenuCategory.objects.order_by('name', 'id')
+    serializer_class = MenuCategorySerializer
+    permission_classes = [IsManagerOrReadOnly]
+
+    @swagger_auto_schema(
+        operation_description="Returns all menu categories, by name.",
+        responses={200: MenuCategorySerializer(many=True)}
+    )
+    def get(self, request, *args, **kwargs):
+        audit(request.user, 'menu.category.list')
+        return super().get(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        request_body=MenuCategorySerializer,
+        operation_description="Creates a menu category. Only accessible to managers.",
+        responses={201: MenuCategorySerializer}
+    )
+    def post(self, request, *args, **kwargs):
+        audit(request.user, 'menu.category.create')
+        return super().post(request, *args, **kwargs)
+
+
+class MenuCategoryDetailView(generics.RetrieveUpdateDestroyAPIView):
+    queryset = MenuCategory.objects.all()
+    serializer_class = MenuCategorySerializer
+    permission_classes = [IsManagerOrReadOnly]
+
+    @swagger_auto_schema(
+        operation_description="Returns a menu category.",
+        responses={200: MenuCategorySerializer}
+    )
+    def get(self, request, *args, **kwargs):
+        audit(request.user, 'menu.category.view', kwargs.get('pk'))
+        return super().get(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        request_body=MenuCategorySerializer,
+        operation_description="Renames a menu category. Only accessible to managers.",
+        responses={200: MenuCategorySerializer}
+    )
+    def patch(self, request, *args, **kwargs):
+        audit(request.user, 'menu.category.update', kwargs.get('pk'))
+        return super().patch(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        operation_description="Deletes a menu category; its items are kept without a category. "
+                              "Only accessible to managers.",
+        responses={204: 'No content'}
+    )
+    def delete(self, request, *args, **kwargs):
+        audit(request.user, 'menu.category.delete', kwargs.get('pk'))
         return super().delete(request, *args, **kwargs)
 
+    # Menu items embed their category, so cached menus are invalidated.
+    def perform_update(self, serializer):
+        serializer.save()
+        bump_menu_version()
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        bump_menu_version()
+
 
 class ToggleAvailabilityView(APIView):
     permission_classes = [IsAuthenticated, IsManagerOrKitchen]
@@ -90,16 +216,29 @@ class ToggleAvailabilityView(APIView):
         try:
             item = MenuItem.objects.get(pk=pk)
         except MenuItem.DoesNotExist:
-            logger.warning(f"{request.user} tried to toggle unavailable item #{pk}")
+            audit(request.user, 'menu.toggle_availability.not_found', pk, level=logging.WARNING)
             return Response({"detail": "Item not found"}, status=404)
 
         item.available = not item.available
         item.save()
+        bump_menu_version()
 
-        logger.info(f"{request.user} toggled availability for item #{pk} to {item.available}")
+        audit(request.user, 'menu.toggle_availability', pk, available=item.available)
 
         return Response({
             "id": item.id,
             "name": item.name,
             "available": item.available
         })
+
+
+class MenuCacheStatsView(APIView):
+    permission_classes = [IsManager]
+
+    @swagger_auto_schema(
+        operation_description="Returns menu cache hit/miss counters. Only accessible to managers.",
+        responses={200: openapi.Response(description="Menu cache statistics")}
+    )
+    def get(self, request):
+        audit(request.user, 'menu.cache_stats')
+        return Response(get_menu_cache_stats())
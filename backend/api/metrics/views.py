@@ -0,0 +1,50 @@
+﻿import json
+
+from rest_framework.negotiation import BaseContentNegotiation
+from rest_framework.renderers import BaseRenderer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+
+from core.metrics import registry, render_prometheus
+from .permissions import IsManager
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain; version=0.0.4'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, str):
+            return data.encode()
+        # Error responses.
+        return json.dumps(data).encode()
+
+
+class PrometheusNegotiation(BaseContentNegotiation):
+    """
+    Always answers in the exposition format, whatever the scraper accepts.
+    """
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+class MetricsView(APIView):
+    permission_classes = [IsManager]
+    renderer_classes = [PrometheusRenderer]
+    content_negotiation_class = PrometheusNegotiation
+
+    @swagger_auto_schema(
+        operation_description="Per-route latency, SQL and render histograms of all running processes, "
+                              "in the Prometheus text format. Only accessible to managers.",
+        responses={200: openapi.Response(description="Prometheus metrics")}
+    )
+    def get(self, request):
+        # Not audited: scrapers call this every few seconds.
+        return Response(render_prometheus(*registry.collect()))
@@ -0,0 +1,196 @@
+﻿from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, DurationField, ExpressionWrapper, F, Min, Q, Sum
+from django.db.models.functions import TruncDay, TruncHour
+
+from core.models import MenuItemRollup, Order, OrderItem, OrderRollup, OrderStatusHistory
+
+HOUR = OrderRollup.Granularity.HOUR
+DAY = OrderRollup.Granularity.DAY
+
+
+def truncate_hour(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def truncate_day(value):
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _hour_buckets(start, end):
+    """
+    Aggregates the live tables for [start, end). Every query is a range scan
+    on an indexed timestamp column.
+    """
+    orders = defaultdict(lambda: {
+        'order_count': 0, 'cancelled_count': 0, 'revenue': Decimal('0'),
+        'delivered_count': 0, 'fulfillment_seconds': 0.0,
+    })
+    hour = start
+    while hour < end:
+        orders[hour]
+        hour += timedelta(hours=1)
+
+    created = (
+        Order.objects
+        .filter(created_at__gte=start, created_at__lt=end)
+        .annotate(bucket=TruncHour('created_at'))
+        .values('bucket')
+        .annotate(
+            order_count=Count('id'),
+            cancelled_count=Count('id', filter=Q(status=Order.Status.CANCELLED)),
+        )
+        .order_by()
+    )
+    for row in created:
+        orders[row['bucket']]['order_count'] = row['order_count']
+        orders[row['bucket']]['cancelled_count'] = row['cancelled_count']
+
+    items = []
+    sold = (
+        OrderItem.objects
+        .filter(order__created_at__gte=start, order__created_at__lt=end)
+        .exclude(order__status=Order.Status.CANCELLED)
+        .annotate(bucket=TruncHour('order__created_at'))
+        .values('bucket', 'menu_item')
+        .annotate(
+            sold=Sum('quantity'),
+            sales=Sum(
+                ExpressionWrapper(F('quantity') * F('menu_item__price'), output_field=DecimalField())
+            ),
+        )
+        .order_by()
+    )
+    for row in sold:
+        orders[row['bucket']]['revenue'] += row['sales'] or 0
+        items.append(MenuItemRollup(
+            granularity=HOUR, bucket_start=row['bucket'], menu_item_id=row['menu_item'],
+            quantity=row['sold'], revenue=row['sales'] or 0,
+        ))
+
+    # Fulfillment is attributed to the hour the order was delivered in, so a
+    # closed bucket never changes afterwards.
+    delivered = (
+        OrderStatusHistory.objects
+        .filter(status=Order.Status.DELIVERED, timestamp__gte=start, timestamp__lt=end)
+        .annotate(bucket=TruncHour('timestamp'))
+        .values('bucket')
+        .annotate(
+            delivered_count=Count('id'),
+            fulfillment=Sum(
+                ExpressionWrapper(F('timestamp') - F('order__created_at'), output_field=DurationField())
+            ),
+        )
+        .order_by()
+    )
+    for row in delivered:
+        orders[row['bucket']]['delivered_count'] = row['delivered_count']
+        orders[row['bucket']]['fulfillment_seconds'] = row['fulfillment'].total_seconds() if row['fulfillment'] else 0.0
+
+    return [
+        OrderRollup(granularity=HOUR, bucket_start=bucket, **values)
+        for bucket, values in sorted(orders.items())
+    ], items
+
+
+def _rebuild_days(start, end):
+    """
+    Rebuilds the daily rollups covering [start, end) from the hourly ones.
+    """
+    start, end = truncate_day(start), truncate_day(end - timedelta(microseconds=1)) + timedelta(days=1)
+    hourly = OrderRollup.objects.filter(granularity=HOUR, bucket_start__gte=start, bucket_start__lt=end)
+
+    totals = ['order_count', 'cancelled_count', 'revenue', 'delivered_count', 'fulfillment_seconds']
+    days = [
+        OrderRollup(granularity=DAY, bucket_start=row['day'], **{field: row[f'total_{field}'] for field in totals})
+        for row in hourly.annotate(day=TruncDay('bucket_start')).values('day').annotate(
+            **{f'total_{field}': Sum(field) for field in totals}
+        ).order_by()
+    ]
+    items = [
+        MenuItemRollup(
+            granularity=DAY, bucket_start=row['day'], menu_item_id=row['menu_item_id'],
+            quantity=row['total_quantity'], revenue=row['total_revenue'],
+        )
+        for row in MenuItemRollup.objects
+        .filter(granularity=HOUR, bucket_start__gte=start, bucket_start__lt=end)
+        .annotate(day=TruncDay('bucket_start'))
+        .values('day', 'menu_item_id')
+        .annotate(total_quantity=Sum('quantity'), total_revenue=Sum('revenue'))
+        .order_by()
+    ]
+
+    OrderRollup.objects.filter(granularity=DAY, bucket_start__gte=start, bucket_start__lt=end).delete()
+    MenuItemRollup.objects.filter(granularity=DAY, bucket_start__gte=start, bucket_start__lt=end).delete()
+    OrderRollup.objects.bulk_create(days)
+    MenuItemRollup.objects.bulk_create(items)
+
+
+def rollup(start, end):
+    """
+    Replaces the hourly rollups in [start, end) and the daily rollups around
+    them. `start` and `end` must be hour-aligned.
+    """
+    orders, items = _hour_buckets(start, end)
+    with transaction.atomic():
+        OrderRollup.objects.filter(granularity=HOUR, bucket_start__gte=start, bucket_start__lt=end).delete()
+        MenuItemRollup.objects.filter(granularity=HOUR, bucket_start__gte=start, bucket_start__lt=end).delete()
+        OrderRollup.objects.bulk_create(orders)
+        MenuItemRollup.objects.bulk_create(items)
+        _rebuild_days(start, end)
+    return len(orders)
+
+
+def pending_range(now, lookback):
+    """
+    The hours that still need rolling up: everything after the latest hourly
+    bucket, re-processing `lookback` for late cancellations and deliveries.
+    Returns None when there is nothing to aggregate yet.
+    """
+    end = truncate_hour(now) + timedelta(hours=1)
+    latest = OrderRollup.objects.filter(granularity=HOUR).order_by('-bucket_start').first()
+    if latest is not None:
+        return min(latest.bucket_start, end - lookback), end
+
+    first = Order.objects.aggregate(first=Min('created_at'))['first']
+    if first is None:
+        return None
+    return truncate_hour(first), end
+
+
+def get_buckets(granularity, start, end):
+    """
+    Reads the rollups for [start, end): one query for the buckets and one for
+    the per-item sales.
+    """
+    items = defaultdict(list)
+    for row in (
+        MenuItemRollup.objects
+        .filter(granularity=granularity, bucket_start__gte=start, bucket_start__lt=end)
+        .values('bucket_start', 'menu_item_id', 'menu_item__name', 'quantity', 'revenue')
+        .order_by('bucket_start', '-quantity')
+    ):
+        items[row['bucket_start']].append({
+            'menu_item': row['menu_item_id'],
+            'name': row['menu_item__name'],
+            'quantity': row['quantity'],
+            'revenue': str(row['revenue']),
+        })
+
+    return [
+        {
+            'bucket_start': bucket.bucket_start,
+            'order_count': bucket.order_count,
+            'cancelled_count': bucket.cancelled_count,
+            'revenue': str(bucket.revenue),
+            'delivered_count': bucket.delivered_count,
+            'avg_fulfillment_seconds': bucket.avg_fulfillment_seconds,
+            'items': items.get(bucket.bucket_start, []),
+        }
+        for bucket in OrderRollup.objects.filter(
+            granularity=granularity, bucket_start__gte=start, bucket_start__lt=end
+        )
+    ]
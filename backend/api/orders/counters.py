@@ -0,0 +1,71 @@
+﻿from django.db import transaction
+from django.db.models import Case, Count, F, When
+
+from core.models import Order, OrderStatusCounter
+
+
+def _apply(deltas):
+    deltas = {status: delta for status, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    updated = OrderStatusCounter.objects.filter(status__in=deltas).update(
+        count=Case(*[When(status=status, then=F('count') + delta) for status, delta in deltas.items()])
+    )
+    if updated < len(deltas):
+        # Counter rows are created by migration; recreate any that went missing.
+        existing = set(OrderStatusCounter.objects.filter(status__in=deltas).values_list('status', flat=True))
+        for status in set(deltas) - existing:
+            _, created = OrderStatusCounter.objects.get_or_create(status=status, defaults={'count': deltas[status]})
+            if not created:
+                OrderStatusCounter.objects.filter(status=status).update(count=F('count') + deltas[status])
+
+
+def record_created(status, count=1):
+    _apply({status: count})
+
+
+def record_status_change(previous_status, status, count=1):
+    if previous_status != status:
+        _apply({previous_status: -count, status: count})
+
+
+def record_status_changes(previous_statuses, status):
+    """
+    Applies a batch of moves to `status` in one update; `previous_statuses`
+    lists the status each order left.
+    """
+    deltas = {status: 0}
+    for previous_status in previous_statuses:
+        if previous_status != status:
+            deltas[previous_status] = deltas.get(previous_status, 0) - 1
+            deltas[status] += 1
+    _apply(deltas)
+
+
+def get_status_counts():
+    return {
+        counter.status: counter.count
+        for counter in OrderStatusCounter.objects.filter(count__gt=0).order_by('status')
+    }
+
+
+def reconcile(fix=True):
+    """
+    Recomputes every counter from the Order table and returns the drift as
+    {status: (stored, actual)}. Counter rows stay locked while counting so
+    concurrent updates are applied on top of the corrected values.
+    """
+    with transaction.atomic():
+        stored = dict(OrderStatusCounter.objects.select_for_update().values_list('status', 'count'))
+        actual = dict(Order.objects.values_list('status').annotate(count=Count('id')).order_by())
+
+        drift = {}
+        for status in set(actual) | set(stored) | set(Order.Status.values):
+            if stored.get(status) != actual.get(status, 0):
+                drift[status] = (stored.get(status), actual.get(status, 0))
+
+        if fix:
+            for status, (_, count) in drift.items():
+                OrderStatusCounter.objects.update_or_create(status=status, defaults={'count': count})
+    return drift
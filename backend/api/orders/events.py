@@ -0,0 +1,157 @@
+﻿import asyncio
+import itertools
+import json
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.models import Order
+from .querysets import ACTIVE_STATUSES
+
+ORDER_CREATED = 'order.created'
+ORDER_STATUS_CHANGED = 'order.status_changed'
+# Sent when a stream fell behind and events were lost; the client reloads its list.
+RESYNC = 'resync'
+
+# Statuses each board shows; an event is sent when an order enters or leaves them.
+ROLE_STATUSES = {
+    'kitchen': ACTIVE_STATUSES,
+    'waiter': [Order.Status.READY],
+}
+
+
+class Subscription:
+    def __init__(self, loop, maxsize):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def deliver(self, event):
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # A slow client is disconnected instead of buffering without bound;
+            # it gets what was queued, then a resync event, and reconnects.
+            self.overflowed = True
+
+    async def get(self):
+        return await self.queue.get()
+
+    def drain(self):
+        events = []
+        while not self.queue.empty():
+            events.append(self.queue.get_nowait())
+        return events
+
+
+class LocalBroker:
+    """
+    In-process fan-out of order events to the streams connected to this worker.
+    Publishing is thread-safe, so sync views can publish to async streams.
+    """
+
+    def __init__(self, queue_size=None):
+        self.queue_size = queue_size or settings.ORDER_EVENTS_QUEUE_SIZE
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self):
+        subscription = Subscription(asyncio.get_running_loop(), self.queue_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event):
+        event = {'id': next(self._ids), **event}
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.deliver(event)
+            except RuntimeError:
+                # The subscriber's event loop has already been closed.
+                self.unsubscribe(subscription)
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(settings.ORDER_EVENTS_BROKER)()
+    return _broker
+
+
+def publish_order_event(event_type, order_data, previous_status=None):
+    """
+    Sends an event to connected streams once the current transaction commits.
+    """
+    event = {'type': event_type, 'order': order_data, 'previous_status': previous_status}
+    transaction.on_commit(lambda: get_broker().publish(event))
+
+
+def is_visible(user, event):
+    """
+    Mirrors the role filtering of the order list views.
+    """
+    order = event['order']
+    if user.role == 'client':
+        return order['user'] == user.pk
+
+    statuses = ROLE_STATUSES.get(user.role)
+    if statuses is None:
+        return True
+    return order['status'] in statuses or event['previous_status'] in statuses
+
+
+def format_event(event):
+    data = json.dumps({'order': event['order'], 'previous_status': event['previous_status']}, cls=JSONEncoder)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+
+async def event_stream(user, broker=None):
+    broker = broker or get_broker()
+    subscription = broker.subscribe()
+    try:
+        yield f"retry: {settings.ORDER_EVENTS_RETRY_MS}\n\n"
+        while True:
+            if subscription.overflowed:
+                for event in subscription.drain():
+                    if is_visible(user, event):
+                        yield format_event(event)
+                yield f"event: {RESYNC}\ndata: {{}}\n\n"
+                return
+            try:
+                event = await asyncio.wait_for(subscription.get(), timeout=settings.ORDER_EVENTS_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if is_visible(user, event):
+                yield format_event(event)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+class EventStreamRenderer(BaseRenderer):
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only used for error responses; the stream itself bypasses rendering.
+        if data is None:
+            return b''
+        return json.dumps(data, cls=JSONEncoder).encode()
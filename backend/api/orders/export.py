@@ -0,0 +1,151 @@
+﻿import csv
+import io
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+from core.models import OrderItem
+
+# values() lookups of the exported columns, in CSV column order.
+EXPORT_ORDER_LOOKUPS = ['id', 'created_at', 'updated_at', 'status', 'user_id', 'table_number', 'notes']
+EXPORT_ITEM_LOOKUPS = ['order_id', 'id', 'menu_item_id', 'menu_item__name', 'menu_item__price', 'quantity', 'comment']
+
+CSV_COLUMNS = [
+    'order_id', 'created_at', 'updated_at', 'status', 'user_id', 'table_number', 'notes',
+    'item_id', 'menu_item_id', 'menu_item_name', 'unit_price', 'quantity', 'comment',
+]
+
+
+def _items_query(orders):
+    return (
+        OrderItem.objects
+        .filter(order_id__in=[order['id'] for order in orders])
+        .values(*EXPORT_ITEM_LOOKUPS)
+        .order_by('order_id', 'id')
+    )
+
+
+def _attach(orders, items):
+    by_order = defaultdict(list)
+    for item in items:
+        by_order[item['order_id']].append(item)
+    return [(order, by_order.get(order['id'], [])) for order in orders]
+
+
+def export_chunks(queryset, chunk_size):
+    """
+    Yields lists of (order, items) pairs, `chunk_size` orders at a time.
+    Orders are read through a server-side cursor and each chunk's items
+    come from one joined query, so memory does not grow with the export.
+    """
+    rows = queryset.values(*EXPORT_ORDER_LOOKUPS).order_by('created_at', 'id').iterator(chunk_size=chunk_size)
+    while True:
+        orders = list(islice(rows, chunk_size))
+        if not orders:
+            return
+        yield _attach(orders, _items_query(orders))
+
+
+async def aexport_chunks(queryset, chunk_size):
+    orders = []
+    async for order in queryset.values(*EXPORT_ORDER_LOOKUPS).order_by('created_at', 'id').aiterator(chunk_size=chunk_size):
+        orders.append(order)
+        if len(orders) == chunk_size:
+            yield _attach(orders, [item async for item in _items_query(orders)])
+            orders = []
+    if orders:
+        yield _attach(orders, [item async for item in _items_query(orders)])
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def format_csv(chunk):
+    """
+    One row per order item; orders without items get a single row with the
+    item columns empty.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for order, items in chunk:
+        head = [_csv_value(order[field]) for field in EXPORT_ORDER_LOOKUPS]
+        for item in items or [None]:
+            tail = [''] * (len(EXPORT_ITEM_LOOKUPS) - 1) if item is None else [_csv_value(item[field]) for field in EXPORT_ITEM_LOOKUPS[1:]]
+            writer.writerow(head + tail)
+    return buffer.getvalue()
+
+
+def format_ndjson(chunk):
+    return ''.join(
+        json.dumps({
+            **order,
+            'items': [
+                {
+                    'id': item['id'],
+                    'menu_item': item['menu_item_id'],
+                    'name': item['menu_item__name'],
+                    'unit_price': item['menu_item__price'],
+                    'quantity': item['quantity'],
+                    'comment': item['comment'],
+                }
+                for item in items
+            ],
+        }, cls=DjangoJSONEncoder) + '\n'
+        for order, items in chunk
+    )
+
+
+def csv_header():
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(CSV_COLUMNS)
+    return buffer.getvalue()
+
+
+FORMATTERS = {
+    'csv': (csv_header, format_csv),
+    'ndjson': (None, format_ndjson),
+}
+
+
+def stream_export(queryset, fmt, chunk_size):
+    header, formatter = FORMATTERS[fmt]
+    if header:
+        yield header()
+    for chunk in export_chunks(queryset, chunk_size):
+        yield formatter(chunk)
+
+
+async def astream_export(queryset, fmt, chunk_size):
+    header, formatter = FORMATTERS[fmt]
+    if header:
+        yield header()
+    async for chunk in aexport_chunks(queryset, chunk_size):
+        yield formatter(chunk)
+
+
+class ExportRenderer(BaseRenderer):
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only used for error responses; exports are streamed by the view.
+        if data is None:
+            return b''
+        return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
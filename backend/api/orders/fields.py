@@ -0,0 +1,126 @@
+﻿from django.db.models import Prefetch
+from drf_yasg import openapi
+from rest_framework.exceptions import ValidationError
+
+from core.models import OrderItem
+
+ORDER_FIELDS = ['id', 'user', 'status', 'created_at', 'updated_at', 'items', 'table_number', 'notes']
+DEFAULT_ITEM_FIELDS = ['id', 'menu_item', 'quantity', 'comment']
+
+# Model lookup behind each field of OrderSerializer and OrderItemSerializer,
+# used both for only() and for values(); `name` comes from the joined menu item.
+ORDER_VALUE_LOOKUPS = {
+    'id': 'id',
+    'user': 'user_id',
+    'status': 'status',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+    'table_number': 'table_number',
+    'notes': 'notes',
+}
+ITEM_VALUE_LOOKUPS = {
+    'id': 'id',
+    'menu_item': 'menu_item_id',
+    'name': 'menu_item__name',
+    'quantity': 'quantity',
+    'comment': 'comment',
+}
+
+# Named field sets for ?view=.
+VIEWS = {
+    'board': (['id', 'table_number', 'status', 'created_at', 'items'], ['menu_item', 'name', 'quantity']),
+}
+
+sparse_field_parameters = [
+    openapi.Parameter(
+        'fields', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+        description="Comma-separated order fields to return; `items.<field>` picks item fields "
+                    "(id, menu_item, name, quantity, comment).",
+    ),
+    openapi.Parameter('view', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(VIEWS)),
+]
+
+
+def parse_fields(params):
+    """
+    Returns (order fields, item fields) requested with ?fields= or ?view=,
+    or None for the full representation.
+    """
+    view, fields = params.get('view'), params.get('fields')
+    if view and fields:
+        raise ValidationError({'fields': "Use either fields or view, not both."})
+    if view:
+        if view not in VIEWS:
+            raise ValidationError({'view': f"Must be one of: {', '.join(VIEWS)}."})
+        return VIEWS[view]
+    if not fields:
+        return None
+
+    order_fields, item_fields, unknown = [], [], []
+    for name in filter(None, (part.strip() for part in fields.split(','))):
+        parent, _, child = name.partition('.')
+        if parent == 'items' and child:
+            if child in ITEM_VALUE_LOOKUPS:
+                item_fields.append(child)
+            else:
+                unknown.append(name)
+        elif parent not in ORDER_FIELDS:
+            unknown.append(name)
+            continue
+        if parent not in order_fields:
+            order_fields.append(parent)
+    if unknown:
+        raise ValidationError({'fields': f"Unknown field(s): {', '.join(unknown)}."})
+    if not order_fields:
+        raise ValidationError({'fields': "Select at least one field."})
+    return order_fields, item_fields or DEFAULT_ITEM_FIELDS
+
+
+def order_lookups(order_fields):
+    """
+    Returns the order lookups the fields need, plus the cursor position
+    (created_at, id), which is always loaded.
+    """
+    return {'id', 'created_at', *(ORDER_VALUE_LOOKUPS[field] for field in order_fields if field != 'items')}
+
+
+def project_orders(queryset, order_fields, item_fields):
+    """
+    Restricts an order queryset to the columns the fields need. The cursor
+    position (created_at, id) is always loaded. Items, when requested, come
+    from one prefetch query, joined to the menu item only for `name`.
+    """
+    queryset = queryset.only(*order_lookups(order_fields)).prefetch_related(None)
+    if 'items' not in order_fields:
+        return queryset
+
+    items = OrderItem.objects.only('order_id', *(ITEM_VALUE_LOOKUPS[field] for field in item_fields))
+    if 'name' in item_fields:
+        items = items.select_related('menu_item')
+    return queryset.prefetch_related(Prefetch('items', queryset=items))
+
+
+class SparseFieldsMixin:
+    """
+    Lets a GET on an order list choose its fields with ?fields= or
+    ?view=board. The queryset and the serializer are narrowed together, so
+    unrequested columns are not loaded.
+    """
+
+    def get_sparse_fields(self):
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = parse_fields(self.request.query_params) if self.request.method == 'GET' else None
+        return self._sparse_fields
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        sparse = self.get_sparse_fields()
+        if sparse is not None:
+            queryset = project_orders(queryset, *sparse)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        sparse = self.get_sparse_fields()
+        if sparse is not None:
+            kwargs['fields'], kwargs['item_fields'] = sparse
+        return super().get_serializer(*args, **kwargs)
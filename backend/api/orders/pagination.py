@@ -0,0 +1,116 @@
+﻿from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+class OrderCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (created_at, id). The position stored in the cursor
+    is unique, so every page is a single indexed range query regardless of
+    how deep the client has paged.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = settings.ORDER_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.ORDER_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        # Only the created_at direction can be chosen (via OrderingFilter),
+        # id always follows it as the tie-breaker.
+        primary = super().get_ordering(request, queryset, view)[0]
+        descending = primary.startswith('-')
+        if primary.lstrip('-') != 'created_at':
+            descending = True
+        if descending:
+            return ('-created_at', '-id')
+        return ('created_at', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self._page_queryset(queryset, request, view)
+        return self._set_page(list(queryset[:self.page_size + 1]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self._page_queryset(queryset, request, view)
+        return self._set_page([row async for row in queryset[:self.page_size + 1]])
+
+    def _page_queryset(self, queryset, request, view):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        self.reverse = self.cursor.reverse if self.cursor else False
+        self.current_position = self.cursor.position if self.cursor else None
+
+        if self.reverse:
+            queryset = queryset.order_by(*[
+                order[1:] if order.startswith('-') else '-' + order
+                for order in self.ordering
+            ])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if self.current_position is not None:
+            created_at, pk = self._parse_position(self.current_position)
+            if self.reverse != self.ordering[0].startswith('-'):
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+                )
+        return queryset
+
+    def _set_page(self, results):
+        reverse, current_position = self.reverse, self.current_position
+        self.page = results[:self.page_size]
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = current_position is not None
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def _get_position_from_instance(self, instance, ordering):
+        if isinstance(instance, dict):
+            created_at, pk = instance['created_at'], instance['id']
+        else:
+            created_at, pk = instance.created_at, instance.id
+        return f"{created_at.isoformat()}|{pk}"
+
+    def _parse_position(self, position):
+        created_at, _, pk = position.partition('|')
+        try:
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
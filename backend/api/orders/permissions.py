@@ -10,7 +10,7 @@ class CanViewOrder(BasePermission):
         if user.role in ['manager', 'kitchen', 'waiter']:
             return True
 
-        return obj.user == user
+        return obj.user_id == user.id
 
 
 class CanModifyOrderStatus(BasePermission):
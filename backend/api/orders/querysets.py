@@ -0,0 +1,74 @@
+﻿from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from core.models import Order
+
+ACTIVE_STATUSES = [Order.Status.NEW, Order.Status.IN_PROGRESS]
+
+# Roles whose view of the orders is limited to some statuses.
+ROLE_VIEW_STATUSES = {
+    'kitchen': ACTIVE_STATUSES,
+}
+
+
+def order_queryset():
+    """
+    Base queryset for every order read. Items are fetched with a single
+    prefetch query instead of one query per order.
+    """
+    return Order.objects.prefetch_related('items')
+
+
+def orders_for_user(user):
+    """
+    Orders visible to the given user: clients see their own orders,
+    kitchen sees orders still to prepare, other roles see everything.
+    """
+    queryset = order_queryset()
+
+    if user.role == 'client':
+        queryset = queryset.filter(user_id=user.id)
+    elif user.role in ROLE_VIEW_STATUSES:
+        queryset = queryset.filter(status__in=ROLE_VIEW_STATUSES[user.role])
+
+    return queryset
+
+
+def parse_timestamp(params, name):
+    """
+    The ISO 8601 timestamp in query parameter `name`, or None when it is
+    absent. Naive values are taken in the current time zone.
+    """
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: "Must be an ISO 8601 timestamp."})
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def filter_orders(queryset, params):
+    """
+    Applies the optional `status`, `created_after` and `created_before`
+    query parameters. Invalid values raise a ValidationError (400).
+    """
+    status = params.get('status')
+    if status:
+        if status not in Order.Status.values:
+            raise ValidationError({'status': f"Must be one of: {', '.join(Order.Status.values)}."})
+        queryset = queryset.filter(status=status)
+
+    created_after = parse_timestamp(params, 'created_after')
+    if created_after:
+        queryset = queryset.filter(created_at__gte=created_after)
+
+    created_before = parse_timestamp(params, 'created_before')
+    if created_before:
+        queryset = queryset.filter(created_at__lte=created_before)
+
+    return queryset
@@ -0,0 +1,54 @@
+﻿from collections import defaultdict
+
+from rest_framework import serializers
+
+from core.models import OrderItem
+from .fields import DEFAULT_ITEM_FIELDS, ITEM_VALUE_LOOKUPS, ORDER_FIELDS, ORDER_VALUE_LOOKUPS, order_lookups
+
+DATETIME_FIELDS = {'created_at', 'updated_at'}
+
+_datetime = serializers.DateTimeField()
+
+
+def order_rows(queryset, order_fields=ORDER_FIELDS):
+    """
+    Turns an order queryset into values() rows holding the columns the
+    fields need, as selected by order_lookups().
+    """
+    return queryset.prefetch_related(None).values(*order_lookups(order_fields))
+
+
+def _items_by_order(rows, item_fields):
+    lookups = [ITEM_VALUE_LOOKUPS[field] for field in item_fields]
+    items = (
+        OrderItem.objects
+        .filter(order_id__in=[row['id'] for row in rows])
+        .values_list('order_id', *lookups)
+        .order_by('id')
+    )
+    by_order = defaultdict(list)
+    for order_id, *values in items:
+        by_order[order_id].append(dict(zip(item_fields, values)))
+    return by_order
+
+
+def serialize_orders(rows, order_fields=ORDER_FIELDS, item_fields=DEFAULT_ITEM_FIELDS):
+    """
+    Returns the OrderSerializer representation of rows from order_rows(),
+    without building model instances or serializer fields. The items of all
+    rows come from one query, joined to the menu item only for `name`.
+    """
+    items = _items_by_order(rows, item_fields) if 'items' in order_fields and rows else {}
+    data = []
+    for row in rows:
+        order = {}
+        for field in order_fields:
+            if field == 'items':
+                order[field] = items.get(row['id'], [])
+                continue
+            value = row[ORDER_VALUE_LOOKUPS[field]]
+            if field in DATETIME_FIELDS and value is not None:
+                value = _datetime.to_representation(value)
+            order[field] = value
+        data.append(order)
+    return data
@@ -1,34 +1,95 @@
-﻿from rest_framework import serializers
+﻿from django.conf import settings
+from django.db import transaction
+from rest_framework import serializers
 from core.models import Order, OrderItem, MenuItem, OrderStatusHistory
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
-    menu_item = serializers.PrimaryKeyRelatedField(queryset=MenuItem.objects.all())
+class SparseSerializerMixin:
+    """
+    Keeps only the fields named in the `fields` argument. Fields listed in
+    `optional_fields` are left out unless they are asked for.
+    """
+    optional_fields = []
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        keep = set(fields) if fields is not None else set(self.fields) - set(self.optional_fields)
+        for name in set(self.fields) - keep:
+            self.fields.pop(name)
+
+
+class OrderItemSerializer(SparseSerializerMixin, serializers.ModelSerializer):
+    # Resolved for the whole order at once in OrderSerializer.validate_items.
+    menu_item = serializers.IntegerField(source='menu_item_id', min_value=1)
+    # Needs the menu item joined in; see api.orders.fields.project_orders.
+    name = serializers.CharField(source='menu_item.name', read_only=True)
+    optional_fields = ['name']
 
     class Meta:
         model = OrderItem
-        fields = ['id', 'menu_item', 'quantity', 'comment']
+        fields = ['id', 'menu_item', 'name', 'quantity', 'comment']
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseSerializerMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
+    # Status changes are applied by api.orders.status.change_status, not save().
+    expected_status = serializers.ChoiceField(choices=Order.Status.choices, write_only=True, required=False)
 
     class Meta:
         model = Order
-        fields = ['id', 'user', 'status', 'created_at', 'updated_at', 'items', 'table_number', 'notes']
-        read_only_fields = ['user', 'created_at', 'updated_at', 'status']
+        fields = ['id', 'user', 'status', 'created_at', 'updated_at', 'items', 'table_number', 'notes', 'expected_status']
+        read_only_fields = ['user', 'created_at', 'updated_at']
+
+    def __init__(self, *args, item_fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if item_fields is not None and 'items' in self.fields:
+            self.fields['items'] = OrderItemSerializer(many=True, fields=item_fields)
+
 
+    def validate_items(self, items):
+        menu_item_ids = {item['menu_item_id'] for item in items}
+        available = dict(
+            MenuItem.objects.filter(id__in=menu_item_ids).values_list('id', 'available')
+        )
+
+        errors = []
+        for menu_item_id in sorted(menu_item_ids):
+            if menu_item_id not in available:
+                errors.append(f"Menu item #{menu_item_id} does not exist.")
+            elif not available[menu_item_id]:
+                errors.append(f"Menu item #{menu_item_id} is not available.")
+        if errors:
+            raise serializers.ValidationError(errors)
+        return items
 
     def create(self, validated_data):
+        # New orders always start as new.
+        validated_data.pop('status', None)
+        validated_data.pop('expected_status', None)
         items_data = validated_data.pop('items')
-        order = Order.objects.create(user=self.context['request'].user, **validated_data)
-        for item in items_data:
-            OrderItem.objects.create(order=order, **item)
+        validated_data.setdefault('user_id', self.context['request'].user.id)
+        with transaction.atomic():
+            order = Order.objects.create(**validated_data)
+            OrderItem.objects.bulk_create([OrderItem(order=order, **item) for item in items_data])
         return order
 
+    def update(self, instance, validated_data):
+        serializers.raise_errors_on_nested_writes('update', self, validated_data)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
+
 class OrderStatusHistorySerializer(serializers.ModelSerializer):
     changed_by = serializers.StringRelatedField()
 
     class Meta:
         model = OrderStatusHistory
-        fields = ['status', 'changed_by', 'timestamp']
\ No newline at end of file
+        fields = ['status', 'changed_by', 'timestamp']
+
+
+class OrderBulkStatusSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), min_length=1, max_length=settings.ORDER_BULK_STATUS_LIMIT
+    )
+    status = serializers.ChoiceField(choices=Order.Status.choices)
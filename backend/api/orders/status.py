@@ -0,0 +1,97 @@
+﻿from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status as http_status
+from rest_framework.exceptions import APIException, ValidationError
+
+from core.models import Order, OrderStatusHistory
+from .counters import record_status_change, record_status_changes
+
+NOT_FOUND = 'not_found'
+UNCHANGED = 'unchanged'
+INVALID_TRANSITION = 'invalid_transition'
+CONFLICT = 'conflict'
+
+
+class StatusConflict(APIException):
+    status_code = http_status.HTTP_409_CONFLICT
+    default_detail = "The order status was changed by someone else."
+    default_code = 'conflict'
+
+
+def check_transition(previous_status, status):
+    if status not in Order.TRANSITIONS[previous_status]:
+        raise ValidationError({'status': f"Cannot change status from {previous_status} to {status}."})
+
+
+def change_status(order, status, user, expected_status=None):
+    """
+    Moves `order` from `expected_status` (by default the status it was read
+    with) to `status`. The UPDATE only matches while the row still has the
+    expected status and writes nothing but status and updated_at; the
+    history row goes in with it. No row lock is taken: a concurrent change
+    makes the UPDATE match nothing and raises StatusConflict.
+    """
+    expected_status = expected_status or order.status
+    check_transition(expected_status, status)
+
+    now = timezone.now()
+    with transaction.atomic(savepoint=False):
+        if not Order.objects.filter(pk=order.pk, status=expected_status).update(status=status, updated_at=now):
+            raise StatusConflict(
+                f"Order #{order.pk} is no longer {expected_status}; reload it and try again."
+            )
+        OrderStatusHistory.objects.create(order_id=order.pk, status=status, changed_by_id=user.id)
+        record_status_change(expected_status, status)
+
+    order.status = status
+    order.updated_at = now
+    return expected_status
+
+
+def bulk_change_status(order_ids, status, user):
+    """
+    Moves the given orders to `status` in one transaction. Like
+    change_status(), no row lock is taken: the orders are read, then each
+    group sharing a previous status is moved by one UPDATE that only matches
+    rows still in that status, and the history goes in with a single INSERT.
+    Orders changed by someone else in between are rejected as conflicts.
+    Returns ({order id: previous status}, {order id: reason}) for the orders
+    that moved and those that did not.
+    """
+    with transaction.atomic():
+        current = dict(Order.objects.filter(id__in=order_ids).values_list('id', 'status'))
+        expected = defaultdict(list)
+        rejected = {}
+        for order_id in order_ids:
+            if order_id not in current:
+                rejected[order_id] = NOT_FOUND
+            elif current[order_id] == status:
+                rejected[order_id] = UNCHANGED
+            elif status not in Order.TRANSITIONS[current[order_id]]:
+                rejected[order_id] = INVALID_TRANSITION
+            else:
+                expected[current[order_id]].append(order_id)
+
+        # update() bypasses auto_now; the sync cursor relies on updated_at.
+        now = timezone.now()
+        moved = {}
+        for previous, ids in expected.items():
+            updated = Order.objects.filter(id__in=ids, status=previous).update(status=status, updated_at=now)
+            if updated < len(ids):
+                # The rows this UPDATE matched stay locked until commit and carry its timestamp.
+                ids = set(Order.objects.filter(id__in=ids, status=status, updated_at=now).values_list('id', flat=True))
+            moved.update((order_id, previous) for order_id in ids)
+        rejected = {
+            order_id: rejected.get(order_id, CONFLICT)
+            for order_id in order_ids if order_id not in moved
+        }
+
+        if moved:
+            OrderStatusHistory.objects.bulk_create([
+                OrderStatusHistory(order_id=order_id, status=status, changed_by_id=user.id)
+                for order_id in moved
+            ])
+            record_status_changes(moved.values(), status)
+    return moved, rejected
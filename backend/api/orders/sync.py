@@ -0,0 +1,91 @@
+﻿import base64
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from core.models import Order, OrderStatusHistory
+from .querysets import ROLE_VIEW_STATUSES, order_queryset, orders_for_user
+
+
+def encode_cursor(updated_at, pk):
+    return base64.urlsafe_b64encode(f"{updated_at.isoformat()}|{pk}".encode()).decode()
+
+
+def decode_cursor(value):
+    try:
+        updated_at, _, pk = base64.urlsafe_b64decode(value.encode()).decode().partition('|')
+        updated_at = parse_datetime(updated_at)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise ValidationError({'cursor': "Invalid cursor."})
+    if updated_at is None:
+        raise ValidationError({'cursor': "Invalid cursor."})
+    return updated_at, pk
+
+
+def statuses_at(orders, moment):
+    """
+    The status each of `orders` had at `moment`, from the status history.
+    Orders created after `moment` are left out; orders without a change by
+    then were still new.
+    """
+    statuses = {order.id: Order.Status.NEW for order in orders if order.created_at <= moment}
+    history = (
+        OrderStatusHistory.objects
+        .filter(order_id__in=list(statuses), timestamp__lte=moment)
+        .order_by('order_id', 'timestamp', 'id')
+        .values_list('order_id', 'status')
+    )
+    statuses.update(history)
+    return statuses
+
+
+def get_changes(user, cursor=None, limit=None):
+    """
+    Orders created or modified after `cursor`, ordered by (updated_at, id).
+
+    Without a cursor the caller gets its current role view. With one, orders
+    that changed and left the role view come back as tombstones: those that
+    were in it at the cursor's time, which the caller may still hold. Orders
+    the caller never saw are skipped. Returns (orders, tombstones,
+    next_cursor, has_more).
+    """
+    limit = max(1, min(limit or settings.ORDER_SYNC_LIMIT, settings.ORDER_SYNC_LIMIT))
+
+    if cursor is None:
+        changed = orders_for_user(user)
+    else:
+        updated_at, pk = decode_cursor(cursor)
+        changed = order_queryset()
+        if user.role == 'client':
+            changed = changed.filter(user_id=user.id)
+        changed = changed.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk))
+
+    rows = list(changed.order_by('updated_at', 'id')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if not rows:
+        return [], [], cursor, False
+
+    if cursor is None:
+        visible_ids = {order.id for order in rows}
+    else:
+        visible_ids = set(
+            orders_for_user(user).filter(id__in=[order.id for order in rows]).values_list('id', flat=True)
+        )
+
+    orders = [order for order in rows if order.id in visible_ids]
+    hidden = [order for order in rows if order.id not in visible_ids]
+    tombstones = []
+    if hidden:
+        view_statuses = ROLE_VIEW_STATUSES.get(user.role, ())
+        previous = statuses_at(hidden, updated_at)
+        tombstones = [
+            {'id': order.id, 'status': order.status} for order in hidden
+            if previous.get(order.id) in view_statuses
+        ]
+    last = rows[-1]
+    return orders, tombstones, encode_cursor(last.updated_at, last.id), has_more
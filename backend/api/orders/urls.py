@@ -1,13 +1,18 @@
 ﻿from django.urls import path
-from .views import OrderListCreateView, OrderDetailView, OrderStatsView, ManagerOrderListView, KitchenOrderListView, WaiterOrderListView, OrderHistoryView
+from .views import OrderListCreateView, OrderDetailView, OrderStatsView, ManagerOrderListView, KitchenOrderListView, WaiterOrderListView, OrderHistoryView, OrderEventStreamView, OrderChangesView, OrderAnalyticsView, OrderExportView, OrderBulkStatusView
 
 urlpatterns = [
     path('', OrderListCreateView.as_view(), name='order-list-create'),
     path('<int:pk>/', OrderDetailView.as_view(), name='order-detail'),
+    path('status/', OrderBulkStatusView.as_view(), name='order-bulk-status'),
     path('stats/', OrderStatsView.as_view(), name='order-stats'),
+    path('analytics/', OrderAnalyticsView.as_view(), name='order-analytics'),
     path('manager/', ManagerOrderListView.as_view(), name='manager-orders'),
+    path('export/', OrderExportView.as_view(), name='order-export'),
     path('kitchen/', KitchenOrderListView.as_view(), name='kitchen-orders'),
     path('waiter/', WaiterOrderListView.as_view(), name='waiter-orders'),
     path('<int:pk>/history/', OrderHistoryView.as_view(), name='order-history'),
+    path('changes/', OrderChangesView.as_view(), name='order-changes'),
+    path('events/', OrderEventStreamView.as_view(), name='order-events'),
 ]
 
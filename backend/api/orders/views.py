@@ -1,73 +1,81 @@
-﻿import logging
-from django.db.models import Count
-from rest_framework import generics, permissions
-from rest_framework.exceptions import PermissionDenied
+﻿from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import generics, mixins, permissions
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.filters import OrderingFilter
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
+from core.async_views import AsyncGenericAPIView
+from core.audit import audit
+from core.renderers import FastJSONRenderer
+from core.conditional import ConditionalGetMixin, aqueryset_validators, make_etag, queryset_validators
+from core.metrics import timed_serialization
 from core.models import Order, OrderStatusHistory
-from .serializers import OrderSerializer, OrderStatusHistorySerializer
+from .serializers import OrderBulkStatusSerializer, OrderSerializer, OrderStatusHistorySerializer
 from .permissions import CanViewOrder, CanModifyOrderStatus, IsManager, IsKitchen, IsWaiter
-
-logger = logging.getLogger("audit")
-
-
-class OrderListCreateView(generics.ListCreateAPIView):
+from .querysets import ACTIVE_STATUSES, order_queryset, orders_for_user, filter_orders, parse_timestamp
+from .pagination import OrderCursorPagination
+from .analytics import DAY, HOUR, get_buckets
+from .counters import get_status_counts, record_created
+from .sync import get_changes
+from .events import ORDER_CREATED, ORDER_STATUS_CHANGED, EventStreamRenderer, event_stream, publish_order_event
+from .fields import DEFAULT_ITEM_FIELDS, ORDER_FIELDS, SparseFieldsMixin, sparse_field_parameters
+from .export import CSVRenderer, NDJSONRenderer, astream_export, stream_export
+from .status import bulk_change_status, change_status
+from .readers import order_rows, serialize_orders
+
+
+class OrderListCreateView(SparseFieldsMixin, ConditionalGetMixin, mixins.CreateModelMixin, AsyncGenericAPIView):
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OrderCursorPagination
     filter_backends = [OrderingFilter]
     ordering_fields = ['created_at']
     ordering = ['-created_at']
 
     def get_queryset(self):
-        user = self.request.user
-        queryset = Order.objects.all()
-
-        if user.role == 'client':
-            queryset = queryset.filter(user=user)
-        elif user.role == 'kitchen':
-            queryset = queryset.filter(status__in=['new', 'in_progress'])
+        queryset = orders_for_user(self.request.user)
+        return filter_orders(queryset, self.request.query_params)
 
-        status = self.request.query_params.get('status')
-        if status:
-            queryset = queryset.filter(status=status)
-
-        created_after = self.request.query_params.get('created_after')
-        if created_after:
-            queryset = queryset.filter(created_at__gte=created_after)
-
-        created_before = self.request.query_params.get('created_before')
-        if created_before:
-            queryset = queryset.filter(created_at__lte=created_before)
-
-        return queryset
+    async def aget_conditional_validators(self, request):
+        return await aqueryset_validators(request, self.get_queryset())
 
     def perform_create(self, serializer):
-        instance = serializer.save(user=self.request.user)
-        logger.info(f"{self.request.user} created order #{instance.id}.")
+        with transaction.atomic():
+            instance = serializer.save(user_id=self.request.user.id)
+            record_created(instance.status)
+        audit(self.request.user, 'order.create', instance.id)
+        publish_order_event(ORDER_CREATED, serializer.data)
 
     @swagger_auto_schema(
         operation_description="Returns orders depending on user role (client: own only, kitchen: new/in_progress, others: all).",
+        manual_parameters=sparse_field_parameters,
         responses={200: OrderSerializer(many=True)}
     )
-    def get(self, request, *args, **kwargs):
-        logger.info(f"{request.user} fetched order list.")
-        return super().get(request, *args, **kwargs)
+    async def get(self, request, *args, **kwargs):
+        audit(request.user, 'order.list')
+        return await self.aconditional_get(request, self.alist, *args, **kwargs)
 
     @swagger_auto_schema(
         request_body=OrderSerializer,
         operation_description="Creates a new order. Default status is 'new'.",
         responses={201: OrderSerializer}
     )
-    def post(self, request, *args, **kwargs):
-        return super().post(request, *args, **kwargs)
+    async def post(self, request, *args, **kwargs):
+        return await sync_to_async(self.create)(request, *args, **kwargs)
 
 
-class OrderDetailView(generics.RetrieveUpdateAPIView):
-    queryset = Order.objects.all()
+class OrderDetailView(ConditionalGetMixin, mixins.UpdateModelMixin, AsyncGenericAPIView):
+    queryset = order_queryset()
     serializer_class = OrderSerializer
     permission_classes = [permissions.IsAuthenticated, CanViewOrder]
 
@@ -75,36 +83,102 @@ class OrderDetailView(generics.RetrieveUpdateAPIView):
         operation_description="Retrieve details of a specific order.",
         responses={200: OrderSerializer}
     )
-    def get(self, request, *args, **kwargs):
-        logger.info(f"{request.user} fetched order #{kwargs.get('pk')}.")
-        return super().get(request, *args, **kwargs)
+    async def get(self, request, *args, **kwargs):
+        audit(request.user, 'order.view', kwargs.get('pk'))
+        return await self.aconditional_get(request, self.aretrieve, *args, **kwargs)
+
+    async def aget_object(self):
+        # Fetched once for the validators and reused by aretrieve().
+        if not hasattr(self, '_order'):
+            self._order = await super().aget_object()
+        return self._order
+
+    async def aget_conditional_validators(self, request):
+        order = await self.aget_object()
+        return make_etag(request, order.updated_at.isoformat()), order.updated_at
 
     @swagger_auto_schema(
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             properties={
-                'status': openapi.Schema(type=openapi.TYPE_STRING, example='in_progress')
+                'status': openapi.Schema(type=openapi.TYPE_STRING, example='in_progress'),
+                'expected_status': openapi.Schema(type=openapi.TYPE_STRING, example='new'),
             },
         ),
-        operation_description="Update order status. Only managers are allowed.",
-        responses={200: OrderSerializer}
+        operation_description="Update order status along new → in_progress → ready → delivered; any non-final "
+                              "status can be cancelled. Returns 409 if the order is no longer in "
+                              "`expected_status` (default: its status when the request was read). "
+                              "Only managers are allowed.",
+        responses={200: OrderSerializer, 409: "Status changed concurrently"}
     )
-    def patch(self, request, *args, **kwargs):
+    async def patch(self, request, *args, **kwargs):
         if not CanModifyOrderStatus().has_permission(request, self):
             raise PermissionDenied("Only managers can change order status.")
 
-        logger.info(f"{request.user} attempted to update status for order #{kwargs.get('pk')}.")
-        return self.partial_update(request, *args, **kwargs)
+        audit(request.user, 'order.status.update_attempt', kwargs.get('pk'))
+        return await sync_to_async(self.partial_update)(request, *args, **kwargs)
+
+    async def put(self, request, *args, **kwargs):
+        return await sync_to_async(self.update)(request, *args, **kwargs)
 
     def perform_update(self, serializer):
-        instance = serializer.save()
-        if 'status' in serializer.validated_data:
-            OrderStatusHistory.objects.create(
-                order=instance,
-                status=instance.status,
-                changed_by=self.request.user
-            )
-            logger.info(f"Order #{instance.id} status changed to {instance.status} by {self.request.user}.")
+        order = serializer.instance
+        status = serializer.validated_data.pop('status', None)
+        expected_status = serializer.validated_data.pop('expected_status', None)
+        if status is not None and not CanModifyOrderStatus().has_permission(self.request, self):
+            raise PermissionDenied("Only managers can change order status.")
+
+        previous_status = None
+        with transaction.atomic():
+            if status is not None and (status != order.status or expected_status):
+                previous_status = change_status(order, status, self.request.user, expected_status)
+            if serializer.validated_data:
+                serializer.save()
+        if previous_status is not None:
+            audit(self.request.user, 'order.status.change', order.id, status=order.status)
+            publish_order_event(ORDER_STATUS_CHANGED, serializer.data, previous_status)
+
+
+class OrderBulkStatusView(APIView):
+    permission_classes = [permissions.IsAuthenticated, CanModifyOrderStatus]
+
+    @swagger_auto_schema(
+        request_body=OrderBulkStatusSerializer,
+        operation_description="Moves several orders to one status in a single transaction and reports which "
+                              "ids moved and which were rejected (not_found, unchanged, invalid_transition, "
+                              "conflict when another request changed the order first). Only managers are allowed.",
+        responses={200: openapi.Response(
+            description="Moved and rejected orders",
+            examples={
+                "application/json": {
+                    "status": "ready",
+                    "moved": [12, 14],
+                    "rejected": [{"id": 13, "reason": "unchanged"}]
+                }
+            }
+        )}
+    )
+    def patch(self, request):
+        serializer = OrderBulkStatusSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        order_ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        status = serializer.validated_data['status']
+
+        moved, rejected = bulk_change_status(order_ids, status, request.user)
+
+        if moved:
+            for order in OrderSerializer(order_queryset().filter(id__in=moved), many=True).data:
+                publish_order_event(ORDER_STATUS_CHANGED, order, moved[order['id']])
+        for order_id in moved:
+            audit(request.user, 'order.status.change', order_id, status=status)
+        if rejected:
+            audit(request.user, 'order.status.bulk_rejected', rejected=rejected)
+
+        return Response({
+            'status': status,
+            'moved': [order_id for order_id in order_ids if order_id in moved],
+            'rejected': [{'id': order_id, 'reason': reason} for order_id, reason in rejected.items()],
+        })
 
 
 class OrderStatsView(APIView):
@@ -115,65 +189,220 @@ class OrderStatsView(APIView):
         responses={200: openapi.Response(description="Order statistics")}
     )
     def get(self, request):
-        stats = (
-            Order.objects
-            .values('status')
-            .annotate(count=Count('id'))
-            .order_by('status')
-        )
-        logger.info(f"{request.user} requested order statistics.")
-        return Response({entry['status']: entry['count'] for entry in stats})
+        audit(request.user, 'order.stats')
+        return Response(get_status_counts())
+
+
+class OrderAnalyticsView(APIView):
+    permission_classes = [IsManager]
+    default_ranges = {HOUR: timedelta(hours=24), DAY: timedelta(days=30)}
+
+    @swagger_auto_schema(
+        operation_description="Returns hourly or daily order volume, revenue, items sold and average time to "
+                              "delivery from the pre-aggregated rollups (manager only).",
+        manual_parameters=[
+            openapi.Parameter('granularity', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=[HOUR, DAY]),
+            openapi.Parameter('start', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+            openapi.Parameter('end', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+        ],
+        responses={200: openapi.Response(description="Analytics buckets")}
+    )
+    def get(self, request):
+        granularity = request.query_params.get('granularity', HOUR)
+        if granularity not in self.default_ranges:
+            raise ValidationError({'granularity': f"Must be one of: {HOUR}, {DAY}."})
+
+        end = self.parse_time('end') or timezone.now()
+        start = self.parse_time('start') or end - self.default_ranges[granularity]
+
+        audit(request.user, 'order.analytics', granularity=granularity, start=start, end=end)
+        return Response({
+            'granularity': granularity,
+            'start': start,
+            'end': end,
+            'buckets': get_buckets(granularity, start, end),
+        })
 
+    def parse_time(self, name):
+        return parse_timestamp(self.request.query_params, name)
 
-class ManagerOrderListView(generics.ListAPIView):
+
+class ManagerOrderListView(SparseFieldsMixin, ConditionalGetMixin, generics.ListAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsManager]
+    pagination_class = OrderCursorPagination
     filter_backends = [OrderingFilter]
     ordering_fields = ['created_at']
     ordering = ['-created_at']
 
     @swagger_auto_schema(
         operation_description="Returns a list of all orders (manager only).",
+        manual_parameters=sparse_field_parameters,
         responses={200: OrderSerializer(many=True)}
     )
     def get(self, request, *args, **kwargs):
-        logger.info(f"Manager {request.user} accessed full order list.")
-        return super().get(request, *args, **kwargs)
+        audit(request.user, 'order.list.manager')
+        return self.conditional_get(request, super().get, *args, **kwargs)
 
     def get_queryset(self):
-        return Order.objects.all()
-
+        return filter_orders(order_queryset(), self.request.query_params)
+
+    def list(self, request, *args, **kwargs):
+        # Serialized from values() rows; the output matches OrderSerializer.
+        order_fields, item_fields = self.get_sparse_fields() or (ORDER_FIELDS, DEFAULT_ITEM_FIELDS)
+        rows = order_rows(self.filter_queryset(self.get_queryset()), order_fields)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            with timed_serialization():
+                data = serialize_orders(page, order_fields, item_fields)
+            return self.get_paginated_response(data)
+        rows = list(rows)
+        with timed_serialization():
+            data = serialize_orders(rows, order_fields, item_fields)
+        return Response(data)
+
+    def get_conditional_validators(self, request):
+        return queryset_validators(request, self.get_queryset())
+
+
+class OrderExportView(APIView):
+    permission_classes = [IsManager]
+    renderer_classes = [CSVRenderer, NDJSONRenderer]
 
-class KitchenOrderListView(generics.ListAPIView):
+    @swagger_auto_schema(
+        operation_description="Streams every order matching the filters, oldest first, as CSV (one row per item) "
+                              "or NDJSON (one order per line with its items). Choose with `?format=csv|ndjson` "
+                              "or the Accept header. Only accessible to managers.",
+        manual_parameters=[
+            openapi.Parameter('format', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['csv', 'ndjson']),
+            openapi.Parameter('status', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('created_after', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+            openapi.Parameter('created_before', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+        ],
+        responses={200: openapi.Response(description="text/csv or application/x-ndjson")}
+    )
+    def get(self, request):
+        queryset = filter_orders(Order.objects.all(), request.query_params)
+
+        fmt = request.accepted_renderer.format
+        audit(request.user, 'order.export', format=fmt, **{
+            param: request.query_params[param]
+            for param in ('status', 'created_after', 'created_before') if param in request.query_params
+        })
+
+        # Under ASGI a sync iterator would be read to the end before sending.
+        if isinstance(request._request, ASGIRequest):
+            content = astream_export(queryset, fmt, settings.ORDER_EXPORT_CHUNK_SIZE)
+        else:
+            content = stream_export(queryset, fmt, settings.ORDER_EXPORT_CHUNK_SIZE)
+        response = StreamingHttpResponse(content, content_type=f"{request.accepted_renderer.media_type}; charset=utf-8")
+        response['Content-Disposition'] = f'attachment; filename="orders-{timezone.now():%Y%m%d-%H%M%S}.{fmt}"'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class KitchenOrderListView(SparseFieldsMixin, ConditionalGetMixin, AsyncGenericAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsKitchen]
+    pagination_class = OrderCursorPagination
 
     @swagger_auto_schema(
         operation_description="Returns orders to prepare (status: new, in_progress).",
+        manual_parameters=sparse_field_parameters,
         responses={200: OrderSerializer(many=True)}
     )
-    def get(self, request, *args, **kwargs):
-        logger.info(f"Kitchen user {request.user} accessed kitchen orders.")
-        return super().get(request, *args, **kwargs)
+    async def get(self, request, *args, **kwargs):
+        audit(request.user, 'order.list.kitchen')
+        return await self.aconditional_get(request, self.alist, *args, **kwargs)
 
     def get_queryset(self):
-        return Order.objects.filter(status__in=['new', 'in_progress']).order_by('-created_at')
+        queryset = order_queryset().filter(status__in=ACTIVE_STATUSES).order_by('-created_at')
+        return filter_orders(queryset, self.request.query_params)
+
+    async def aget_conditional_validators(self, request):
+        return await aqueryset_validators(request, self.get_queryset())
 
 
-class WaiterOrderListView(generics.ListAPIView):
+class WaiterOrderListView(SparseFieldsMixin, ConditionalGetMixin, AsyncGenericAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsWaiter]
+    pagination_class = OrderCursorPagination
 
     @swagger_auto_schema(
         operation_description="Returns orders ready to serve (waiter view).",
+        manual_parameters=sparse_field_parameters,
         responses={200: OrderSerializer(many=True)}
     )
-    def get(self, request, *args, **kwargs):
-        logger.info(f"Waiter {request.user} accessed ready orders.")
-        return super().get(request, *args, **kwargs)
+    async def get(self, request, *args, **kwargs):
+        audit(request.user, 'order.list.waiter')
+        return await self.aconditional_get(request, self.alist, *args, **kwargs)
 
     def get_queryset(self):
-        return Order.objects.filter(status='ready').order_by('-created_at')
+        queryset = order_queryset().filter(status=Order.Status.READY).order_by('-created_at')
+        return filter_orders(queryset, self.request.query_params)
+
+    async def aget_conditional_validators(self, request):
+        return await aqueryset_validators(request, self.get_queryset())
+
+
+class OrderChangesView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Returns orders created or modified since `cursor`, visible to the caller's role. "
+                              "Orders that changed and left the role view are returned as tombstones. "
+                              "Omit `cursor` for the initial sync and pass the returned `cursor` on the next call.",
+        manual_parameters=[
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        ],
+        responses={200: openapi.Response(description="Changed orders, tombstones and the next cursor")}
+    )
+    def get(self, request):
+        limit = request.query_params.get('limit') or None
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except ValueError:
+                raise ValidationError({'limit': "A valid integer is required."})
+            if limit < 1:
+                raise ValidationError({'limit': "Must be at least 1."})
+
+        orders, tombstones, cursor, has_more = get_changes(
+            request.user, request.query_params.get('cursor'), limit
+        )
+        audit(request.user, 'order.sync', changed=len(orders))
+        with timed_serialization():
+            data = OrderSerializer(orders, many=True).data
+        return Response({
+            'orders': data,
+            'tombstones': tombstones,
+            'cursor': cursor,
+            'has_more': has_more,
+        })
+
+
+class OrderEventStreamView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, EventStreamRenderer]
+
+    @swagger_auto_schema(
+        operation_description="Server-Sent Events stream of order creations and status changes, filtered by role "
+                              "like the order lists (client: own, kitchen: new/in_progress, waiter: ready, "
+                              "manager: all). A client that falls too far behind gets the events already "
+                              "queued, then a `resync` event, and the stream closes: reload the list and "
+                              "reconnect. Requires the ASGI server.",
+        responses={200: openapi.Response(description="text/event-stream")}
+    )
+    def get(self, request):
+        if not isinstance(request._request, ASGIRequest):
+            return Response({"detail": "The order event stream is only available through the ASGI server."}, status=501)
+
+        audit(request.user, 'order.events.open')
+        response = StreamingHttpResponse(event_stream(request.user), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
 
 class OrderHistoryView(generics.ListAPIView):
@@ -185,9 +414,9 @@ class OrderHistoryView(generics.ListAPIView):
         responses={200: OrderStatusHistorySerializer(many=True)}
     )
     def get(self, request, *args, **kwargs):
-        logger.info(f"{request.user} requested status history for order #{kwargs.get('pk')}.")
+        audit(request.user, 'order.history', kwargs.get('pk'))
         return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
         order_id = self.kwargs['pk']
-        return OrderStatusHistory.objects.filter(order_id=order_id)
+        return OrderStatusHistory.objects.filter(order_id=order_id).select_related('changed_by')
@@ -4,4 +4,6 @@ urlpatterns = [
     path('users/', include('api.users.urls')),
     path('menu/', include('api.menu.urls')),
     path('orders/', include('api.orders.urls')),
+    path('archive/', include('api.archive.urls')),
+    path('metrics/', include('api.metrics.urls')),
 ]
@@ -1,4 +1,8 @@
 ﻿from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from core.authentication import add_role_claims
 from core.models import User
 
 
@@ -30,4 +34,26 @@ class RegisterSerializer(serializers.ModelSerializer):
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'role']
\ No newline at end of file
+        fields = ['id', 'username', 'email', 'role']
+
+
+class RoleTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_role_claims(super().get_token(user), user)
+
+
+class RoleTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Re-reads the role claims on refresh, so role changes reach new access
+    tokens without waiting for the refresh token to expire.
+    """
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        access = AccessToken(data['access'])
+        user = User.objects.only(*('id', 'username', 'role', 'is_active')).get(
+            pk=access[jwt_settings.USER_ID_CLAIM]
+        )
+        data['access'] = str(add_role_claims(access, user))
+        return data
@@ -1,17 +1,17 @@
-﻿import logging
-from rest_framework.views import APIView
+﻿from rest_framework.views import APIView
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
+from core.async_views import AsyncAPIView
+from core.audit import audit
+from core.authentication import aget_full_user, forget_user
 from core.models import User
 from .serializers import RegisterSerializer, UserSerializer
 from .permissions import IsManager
 
-logger = logging.getLogger("audit")
-
 
 class RegisterView(APIView):
     permission_classes = [permissions.AllowAny]
@@ -32,20 +32,20 @@ class RegisterView(APIView):
         serializer = RegisterSerializer(data=data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
-        logger.info(f"User registered: {user.username} with role {user.role}")
+        audit(user, 'user.register', user.id, role=user.role)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-class MeView(APIView):
+class MeView(AsyncAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     @swagger_auto_schema(
         operation_description="Return details of the currently authenticated user.",
         responses={200: UserSerializer}
     )
-    def get(self, request):
-        user = request.user
-        logger.info(f"User {user.username} fetched their profile.")
+    async def get(self, request):
+        user = await aget_full_user(request.user)
+        audit(user, 'user.profile.view', user.id)
         return Response({
             "id": user.id,
             "username": user.username,
@@ -64,7 +64,7 @@ class UserListView(generics.ListAPIView):
         responses={200: UserSerializer(many=True)}
     )
     def get(self, request, *args, **kwargs):
-        logger.info(f"Manager {request.user.username} fetched user list.")
+        audit(request.user, 'user.list')
         return super().get(request, *args, **kwargs)
 
 
@@ -78,7 +78,7 @@ class UserDetailView(generics.RetrieveUpdateAPIView):
         responses={200: UserSerializer}
     )
     def get(self, request, *args, **kwargs):
-        logger.info(f"Manager {request.user.username} fetched details for user ID {kwargs.get('pk')}")
+        audit(request.user, 'user.view', kwargs.get('pk'))
         return super().get(request, *args, **kwargs)
 
     @swagger_auto_schema(
@@ -87,5 +87,9 @@ class UserDetailView(generics.RetrieveUpdateAPIView):
         responses={200: UserSerializer}
     )
     def patch(self, request, *args, **kwargs):
-        logger.info(f"Manager {request.user.username} updated user ID {kwargs.get('pk')}")
+        audit(request.user, 'user.update', kwargs.get('pk'))
         return super().patch(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        user = serializer.save()
+        forget_user(user.pk)
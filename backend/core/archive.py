@@ -0,0 +1,93 @@
+﻿from datetime import datetime, timezone
+
+from django.db import connection, transaction
+
+from core.models import AuditLog, AuditLogArchive, OrderStatusHistory, OrderStatusHistoryArchive
+
+# name -> (live model, archive model, copied columns)
+ARCHIVES = {
+    'audit': (
+        AuditLog, AuditLogArchive,
+        ['id', 'action', 'performed_by_id', 'object_id', 'timestamp', 'details'],
+    ),
+    'history': (
+        OrderStatusHistory, OrderStatusHistoryArchive,
+        ['id', 'order_id', 'status', 'changed_by_id', 'timestamp'],
+    ),
+}
+
+
+def month_bounds(value):
+    """
+    The [start, end) UTC month holding `value`: the range of its partition.
+    """
+    start = value.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+
+
+def partition_name(table, month_start):
+    return f"{table}_{month_start:%Y%m}"
+
+
+def ensure_partitions(archive, timestamps):
+    """
+    Creates the monthly partitions of `archive` the timestamps fall in. On
+    PostgreSQL the archive tables are partitioned by month on timestamp, so
+    a month of archived rows can be detached or dropped as one table;
+    elsewhere they are plain tables and nothing is done.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    table = archive._meta.db_table
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for start, end in sorted({month_bounds(value) for value in timestamps}):
+            name = partition_name(table, start)
+            cursor.execute("SELECT to_regclass(%s)", [name])
+            if cursor.fetchone()[0] is None:
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {quote(name)} PARTITION OF {quote(table)} "
+                    f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                )
+
+
+def count_archivable(name, cutoff):
+    live, _, _ = ARCHIVES[name]
+    return live.objects.filter(timestamp__lt=cutoff).count()
+
+
+def archive_chunk(name, cutoff, chunk_size):
+    """
+    Moves up to `chunk_size` of the oldest rows before `cutoff` into the
+    archive table: one indexed range read, one bulk insert and one delete by
+    primary key, in a single short transaction. Rows already in the archive
+    are skipped, so a re-run never fails on them. Returns the number moved.
+    """
+    live, archive, fields = ARCHIVES[name]
+    with transaction.atomic():
+        rows = list(
+            live.objects
+            .filter(timestamp__lt=cutoff)
+            .order_by('timestamp', 'id')
+            .select_for_update()
+            .values(*fields)[:chunk_size]
+        )
+        if not rows:
+            return 0
+        ensure_partitions(archive, [row['timestamp'] for row in rows])
+        archive.objects.bulk_create([archive(**row) for row in rows], ignore_conflicts=True)
+        live.objects.filter(id__in=[row['id'] for row in rows]).delete()
+    return len(rows)
+
+
+def archive_before(name, cutoff, chunk_size):
+    """
+    Archives everything older than `cutoff`, chunk by chunk, yielding the
+    size of each chunk so callers can report progress.
+    """
+    while True:
+        moved = archive_chunk(name, cutoff, chunk_size)
+        if not moved:
+            return
+        yield moved
@@ -0,0 +1,222 @@
+﻿import atexit
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger("audit")
+# Problems of the writer itself; not under "audit", whose records it writes.
+writer_logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def audit(actor, action, object_id=None, level=logging.INFO, **details):
+    """
+    Records an audit event with structured fields. The message is only
+    formatted on the background writer; see AuditQueueHandler.prepare().
+    """
+    logger.log(
+        level,
+        "%s %s%s",
+        actor,
+        action,
+        f" #{object_id}" if object_id is not None else "",
+        extra={
+            'actor': getattr(actor, 'pk', None),
+            'action': action,
+            'object_id': object_id,
+            'details': details,
+        },
+    )
+
+
+def _gzip_rotator(source, dest):
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+class AuditWriter(threading.Thread):
+    """
+    Drains the audit queue and writes records in batches: whatever is queued
+    when the writer wakes up goes out in one bulk_create. A failed batch is
+    retried `retries` times, then written row by row so one bad record does
+    not take the others with it. Records that still fail are counted in
+    `failed` and reported on the core.audit logger.
+    """
+
+    def __init__(self, queue, batch_size, file_handler=None, database=True, retries=3, retry_delay=0.5):
+        super().__init__(name='audit-writer', daemon=True)
+        self.queue = queue
+        self.batch_size = batch_size
+        self.file_handler = file_handler
+        self.database = database
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.failed = 0
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            record = self.queue.get()
+            batch = []
+            while record is not _STOP:
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            stopping = record is _STOP
+            if batch:
+                self.write(batch)
+
+    def write(self, batch):
+        if self.file_handler is not None:
+            for record in batch:
+                self.file_handler.handle(record)
+        if self.database:
+            self.write_database(batch)
+
+    def write_database(self, batch):
+        from django.apps import apps
+        from django.db import close_old_connections
+
+        if not apps.ready:
+            return
+        from core.models import AuditLog
+
+        rows = [
+            AuditLog(
+                action=getattr(record, 'action', record.name)[:100],
+                performed_by_id=getattr(record, 'actor', None),
+                object_id=None if getattr(record, 'object_id', None) is None else str(record.object_id),
+                timestamp=datetime.fromtimestamp(record.created, tz=timezone.utc),
+                details=json.dumps(
+                    {'message': record.getMessage(), 'level': record.levelname,
+                     **getattr(record, 'details', {})},
+                    default=str,
+                ),
+            )
+            for record in batch
+        ]
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.retry_delay * attempt)
+            try:
+                AuditLog.objects.bulk_create(rows)
+                return
+            except Exception as exc:
+                error = exc
+            finally:
+                close_old_connections()
+
+        failed = []
+        for row in rows:
+            try:
+                row.save(force_insert=True)
+            except Exception as exc:
+                error = exc
+                failed.append(row)
+            finally:
+                close_old_connections()
+        if failed:
+            self.failed += len(failed)
+            writer_logger.error(
+                "Audit writer could not store %d of %d records: %r; first lost: %s",
+                len(failed), len(rows), error, failed[0].details,
+            )
+
+
+class AuditQueueHandler(logging.handlers.QueueHandler):
+    """
+    Non-blocking audit handler. Records go into a bounded queue that a
+    background thread writes to AuditLog and, optionally, a gzip-rotated
+    file. When the queue is full records are dropped and counted instead
+    of slowing the request down.
+    """
+
+    def __init__(self, maxsize=10000, batch_size=500, database=True, retries=3,
+                 filename=None, max_bytes=10 * 1024 * 1024, backup_count=10):
+        super().__init__(queue.Queue(maxsize))
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.database = database
+        self.retries = retries
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.dropped = 0
+        self._writer = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _make_file_handler(self):
+        if not self.filename:
+            return None
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            self.filename, maxBytes=self.max_bytes, backupCount=self.backup_count, delay=True
+        )
+        handler.namer = lambda name: name + '.gz'
+        handler.rotator = _gzip_rotator
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+        return handler
+
+    def _ensure_writer(self):
+        # Started lazily and restarted after a fork, so every worker process
+        # gets its own queue and writer thread.
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                self.queue = queue.Queue(self.maxsize)
+            self._writer = AuditWriter(
+                self.queue, self.batch_size, self._make_file_handler(), self.database, self.retries
+            )
+            self._writer.start()
+            self._pid = os.getpid()
+            atexit.register(self.close)
+
+    def prepare(self, record):
+        # QueueHandler.prepare() formats the message on the logging thread.
+        # The writer runs in this process, so the record is queued as is and
+        # formatted there, with its args and exc_info still attached.
+        return record
+
+    def enqueue(self, record):
+        self._ensure_writer()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self, timeout=5):
+        """
+        Stops the writer after everything queued so far has been written.
+        """
+        writer = self._writer
+        if writer is None or not writer.is_alive() or self._pid != os.getpid():
+            return
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        writer.join(timeout)
+        if writer.file_handler is not None:
+            writer.file_handler.close()
+        self._pid = None
+
+    def close(self):
+        self.stop()
+        super().close()
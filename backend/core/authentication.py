@@ -0,0 +1,127 @@
+﻿from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+
+from core.models import User
+
+ROLE_CLAIMS = ('username', 'role', 'is_active')
+
+
+def add_role_claims(token, user):
+    for claim in ROLE_CLAIMS:
+        token[claim] = getattr(user, claim)
+    return token
+
+
+class UserPrincipal(TokenUser):
+    """
+    The request user, built from the access token claims without a query.
+    It carries what permissions, throttling and the role filters need (id,
+    username, role, is_active); anything else goes through get_full_user().
+    """
+
+    @cached_property
+    def id(self):
+        # Simple JWT stores the claim as a string; ids are compared with
+        # foreign key values, which are ints.
+        return int(super().id)
+
+    @cached_property
+    def pk(self):
+        return self.id
+
+    @cached_property
+    def role(self):
+        return self.token['role']
+
+    @cached_property
+    def is_active(self):
+        return self.token.get('is_active', False)
+
+    def __str__(self):
+        return f"{self.username} ({self.role})"
+
+    def __eq__(self, other):
+        if isinstance(other, User):
+            return self.id == other.pk
+        return super().__eq__(other)
+
+    __hash__ = TokenUser.__hash__
+
+
+class RoleClaimsAuthentication(JWTStatelessUserAuthentication):
+    """
+    JWT authentication that trusts the role claims instead of loading the
+    User on every request. Tokens issued before the claims existed are
+    still accepted and fall back to a database lookup. Tokens naming a role
+    that no longer exists are rejected: the role filters would treat them
+    as staff.
+    """
+
+    def get_user(self, validated_token):
+        if 'role' not in validated_token:
+            return JWTAuthentication.get_user(self, validated_token)
+        if not validated_token.get('is_active'):
+            raise AuthenticationFailed("User is inactive", code='user_inactive')
+        if validated_token['role'] not in User.Role.values:
+            raise AuthenticationFailed("Token has an unknown role", code='unknown_role')
+        return super().get_user(validated_token)
+
+    async def aauthenticate(self, request):
+        """
+        authenticate() for async views. Only tokens without the role claims
+        need the database, and only those leave the event loop.
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        if 'role' not in validated_token:
+            return await sync_to_async(self.get_user)(validated_token), validated_token
+        return self.get_user(validated_token), validated_token
+
+
+def _user_cache_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def get_full_user(user):
+    """
+    The User row behind a request user, cached for AUTH_USER_CACHE_TTL
+    seconds (0 disables the cache).
+    """
+    if isinstance(user, User):
+        return user
+
+    timeout = settings.AUTH_USER_CACHE_TTL
+    full_user = cache.get(_user_cache_key(user.id)) if timeout else None
+    if full_user is None:
+        full_user = User.objects.get(pk=user.id)
+        if timeout:
+            cache.set(_user_cache_key(user.id), full_user, timeout)
+    return full_user
+
+
+async def aget_full_user(user):
+    if isinstance(user, User):
+        return user
+
+    timeout = settings.AUTH_USER_CACHE_TTL
+    full_user = await cache.aget(_user_cache_key(user.id)) if timeout else None
+    if full_user is None:
+        full_user = await User.objects.aget(pk=user.id)
+        if timeout:
+            await cache.aset(_user_cache_key(user.id), full_user, timeout)
+    return full_user
+
+
+def forget_user(user_id):
+    cache.delete(_user_cache_key(user_id))
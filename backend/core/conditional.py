@@ -0,0 +1,73 @@
+﻿import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def make_etag(request, *parts):
+    """
+    Strong ETag for a GET response. The path, caller and renderer are always
+    part of the tag, so role-filtered and paginated responses never collide.
+    """
+    renderer = getattr(request, 'accepted_media_type', '')
+    user_id = request.user.pk if request.user and request.user.is_authenticated else None
+    value = '|'.join(str(part) for part in (request.get_full_path(), user_id, renderer, *parts))
+    return f'"{hashlib.sha1(value.encode()).hexdigest()}"'
+
+
+def queryset_validators(request, queryset, field='updated_at'):
+    """
+    ETag and Last-Modified for a list, computed from one aggregate query:
+    max(field) changes on every write and the count changes when rows leave.
+    """
+    stats = queryset.order_by().aggregate(last_modified=Max(field), count=Count('pk'))
+    etag = make_etag(request, stats['count'], stats['last_modified'])
+    return etag, stats['last_modified']
+
+
+async def aqueryset_validators(request, queryset, field='updated_at'):
+    stats = await queryset.order_by().aaggregate(last_modified=Max(field), count=Count('pk'))
+    etag = make_etag(request, stats['count'], stats['last_modified'])
+    return etag, stats['last_modified']
+
+
+class ConditionalGetMixin:
+    """
+    Answers If-None-Match / If-Modified-Since with 304 before the serializer
+    runs. Views implement get_conditional_validators() and route their GET
+    handler through conditional_get(); async views implement
+    aget_conditional_validators() and use aconditional_get().
+    """
+
+    def get_conditional_validators(self, request):
+        raise NotImplementedError
+
+    async def aget_conditional_validators(self, request):
+        raise NotImplementedError
+
+    def conditional_get(self, request, handler, *args, **kwargs):
+        etag, last_modified = self.get_conditional_validators(request)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        return self._set_validators(response, etag, timestamp)
+
+    async def aconditional_get(self, request, handler, *args, **kwargs):
+        etag, last_modified = await self.aget_conditional_validators(request)
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = await handler(request, *args, **kwargs)
+        return self._set_validators(response, etag, timestamp)
+
+    def _set_validators(self, response, etag, timestamp):
+        if response.status_code in (200, 304):
+            if etag:
+                response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+        return response
@@ -0,0 +1,20 @@
+﻿"""
+Naming shared by seed_load_data and run_load_test, so the load runner can
+log in as the accounts the seeder created.
+"""
+from core.models import User
+
+DEFAULT_PREFIX = 'load'
+DEFAULT_PASSWORD = 'loadtest-password'
+
+# Accounts seeded per role by default.
+DEFAULT_USERS = {
+    User.Role.CLIENT: 2000,
+    User.Role.WAITER: 40,
+    User.Role.KITCHEN: 20,
+    User.Role.MANAGER: 5,
+}
+
+
+def username_for(prefix, role, index):
+    return f"{prefix}_{role}_{index}"
@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.archive import ARCHIVES, archive_before, count_archivable
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves audit log and order status history rows past their retention period "
+        "into the archive tables. Run it daily (e.g. from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only', choices=sorted(ARCHIVES), help="Archive a single table instead of both.",
+        )
+        parser.add_argument(
+            '--days', type=int,
+            help="Retention in days for every table (defaults to AUDIT_LOG_RETENTION_DAYS "
+                 "and ORDER_HISTORY_RETENTION_DAYS).",
+        )
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Rows moved per transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report how many rows would be moved.")
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError("--chunk-size must be positive.")
+        if options['days'] is not None and options['days'] < 0:
+            raise CommandError("--days must not be negative.")
+
+        retention = {
+            'audit': settings.AUDIT_LOG_RETENTION_DAYS,
+            'history': settings.ORDER_HISTORY_RETENTION_DAYS,
+        }
+        names = [options['only']] if options['only'] else sorted(ARCHIVES)
+        now = timezone.now()
+
+        for name in names:
+            days = options['days'] if options['days'] is not None else retention[name]
+            cutoff = now - timedelta(days=days)
+
+            if options['dry_run']:
+                self.stdout.write(f"{name}: {count_archivable(name, cutoff)} row(s) older than {cutoff:%Y-%m-%d %H:%M}.")
+                continue
+
+            moved = 0
+            for chunk in archive_before(name, cutoff, options['chunk_size']):
+                moved += chunk
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"{name}: moved {moved} row(s)...")
+            self.stdout.write(self.style.SUCCESS(
+                f"{name}: archived {moved} row(s) older than {cutoff:%Y-%m-%d %H:%M}."
+            ))
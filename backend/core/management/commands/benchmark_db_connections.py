@@ -0,0 +1,86 @@
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures per-request database latency against PostgreSQL with a new connection "
+        "per request, persistent connections (CONN_MAX_AGE) and the psycopg 3 pool."
+    )
+
+    modes = ['new', 'persistent', 'pool']
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Requests per thread and mode.")
+        parser.add_argument('--threads', type=int, default=4, help="Concurrent request threads.")
+        parser.add_argument('--mode', choices=self.modes, action='append', help="Only run these modes.")
+        parser.add_argument('--query', default='SELECT 1', help="SQL run once per request.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("The connection benchmark requires PostgreSQL.")
+
+        for mode in options['mode'] or self.modes:
+            try:
+                timings = self.run(mode, options['requests'], options['threads'], options['query'])
+            except ImportError as exc:
+                self.stdout.write(self.style.WARNING(f"{mode:>10}: skipped ({exc})"))
+                continue
+            timings.sort()
+            self.stdout.write(
+                f"{mode:>10}: mean {statistics.fmean(timings):7.2f} ms, "
+                f"p50 {timings[len(timings) // 2]:7.2f} ms, "
+                f"p95 {timings[int(len(timings) * 0.95)]:7.2f} ms "
+                f"over {len(timings)} requests"
+            )
+
+    def settings_for(self, mode):
+        settings_dict = {**connection.settings_dict, 'OPTIONS': dict(connection.settings_dict['OPTIONS'])}
+        settings_dict['OPTIONS'].pop('pool', None)
+        settings_dict['CONN_HEALTH_CHECKS'] = True
+        settings_dict['CONN_MAX_AGE'] = 60 if mode == 'persistent' else 0
+        if mode == 'pool':
+            import psycopg_pool  # noqa: F401
+
+            settings_dict['OPTIONS']['pool'] = {'min_size': 1, 'max_size': 32}
+        return settings_dict
+
+    def run(self, mode, requests, threads, query):
+        settings_dict = self.settings_for(mode)
+        # A separate alias, so the benchmark never touches the default
+        # connection or its pool.
+        alias = f'benchmark_{mode}'
+        timings = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(threads)
+
+        def worker():
+            wrapper = connection.__class__(settings_dict, alias)
+            local = []
+            barrier.wait()
+            for _ in range(requests):
+                start = time.perf_counter()
+                # What close_old_connections() does on request_started and
+                # request_finished.
+                wrapper.close_if_unusable_or_obsolete()
+                with wrapper.cursor() as cursor:
+                    cursor.execute(query)
+                    cursor.fetchall()
+                wrapper.close_if_unusable_or_obsolete()
+                local.append((time.perf_counter() - start) * 1000)
+            wrapper.close()
+            with lock:
+                timings.extend(local)
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        if mode == 'pool':
+            connection.__class__(settings_dict, alias).close_pool()
+        return timings
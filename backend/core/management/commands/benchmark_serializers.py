@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from api.orders.querysets import order_queryset
+from api.orders.readers import order_rows, serialize_orders
+from api.orders.serializers import OrderSerializer
+from core import renderers
+from core.models import Order
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares OrderSerializer with JSONRenderer against the values()-based order "
+        "serializer with FastJSONRenderer on the newest orders: query, serialize and "
+        "render time per 1,000 orders, and whether both produce the same bytes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=1000, help="Newest orders to serialize.")
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per path; the fastest is reported.")
+
+    def handle(self, *args, **options):
+        total = Order.objects.count()
+        if not total:
+            raise CommandError("There are no orders to serialize; run seed_load_data first.")
+        count = min(options['orders'], total)
+
+        def model_path():
+            start = time.perf_counter()
+            orders = list(order_queryset().order_by('-created_at', '-id')[:count])
+            fetched = time.perf_counter()
+            data = OrderSerializer(orders, many=True).data
+            serialized = time.perf_counter()
+            body = JSONRenderer().render(data)
+            return body, (fetched - start, serialized - fetched, time.perf_counter() - serialized)
+
+        def values_path():
+            start = time.perf_counter()
+            rows = list(order_rows(Order.objects.order_by('-created_at', '-id'))[:count])
+            fetched = time.perf_counter()
+            # Includes the items query, which the model path runs while fetching.
+            data = serialize_orders(rows)
+            serialized = time.perf_counter()
+            body = renderers.FastJSONRenderer().render(data)
+            return body, (fetched - start, serialized - fetched, time.perf_counter() - serialized)
+
+        encoder = 'orjson' if renderers.orjson is not None else 'json (orjson is not installed)'
+        self.stdout.write(f"{count} orders, best of {options['repeat']} runs, FastJSONRenderer using {encoder}")
+        bodies, results = [], []
+        for name, path in [('OrderSerializer', model_path), ('values()', values_path)]:
+            runs = [path() for _ in range(options['repeat'])]
+            bodies.append(runs[0][0])
+            best = min(runs, key=lambda run: sum(run[1]))[1]
+            results.append(sum(best))
+            per_thousand = [part * 1000 / count * 1000 for part in best]
+            self.stdout.write(
+                f"{name:>16}: query {per_thousand[0]:8.1f} ms, serialize {per_thousand[1]:8.1f} ms, "
+                f"render {per_thousand[2]:8.1f} ms, total {sum(per_thousand):8.1f} ms per 1,000 orders, "
+                f"{count / sum(best):10.0f} orders/s"
+            )
+
+        self.stdout.write(f"speed-up: {results[0] / results[1]:.1f}x")
+        if bodies[0] == bodies[1]:
+            self.stdout.write(self.style.SUCCESS("Both paths produced identical responses."))
+        else:
+            self.stdout.write(self.style.WARNING("The responses differ."))
@@ -0,0 +1,120 @@
+import itertools
+import pickle
+import threading
+import time
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from rest_framework.settings import api_settings
+from rest_framework.test import APIRequestFactory
+from rest_framework.throttling import UserRateThrottle
+
+from core.models import User
+from core.throttling import RoleBasedThrottle
+
+
+class HistoryRoleBasedThrottle(UserRateThrottle):
+    """
+    The previous RoleBasedThrottle, verbatim: DRF's timestamp history list per
+    client. The rate is parsed in __init__ for the 'user' scope, so it only
+    ever enforced that rate; the role scopes only changed the cache key.
+    """
+
+    def get_cache_key(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            self.scope = 'anon'
+        else:
+            role = request.user.role
+            if role == 'manager':
+                self.scope = 'manager'
+            elif role == 'waiter':
+                self.scope = 'waiter'
+            elif role == 'kitchen':
+                self.scope = 'kitchen'
+            else:
+                self.scope = 'client'
+        return super().get_cache_key(request, view)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the sliding-window RoleBasedThrottle with the previous history-list "
+        "implementation at the same rate: time per admitted request, cache footprint "
+        "per client and accuracy under concurrency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--role', default='manager', choices=['client', 'waiter', 'kitchen', 'manager'])
+        parser.add_argument('--rate', help="Rate for both implementations (defaults to the role's configured rate).")
+        parser.add_argument('--rounds', type=int, default=5, help="Times the client is filled up to its limit.")
+        parser.add_argument('--threads', type=int, default=8, help="Threads for the accuracy run.")
+        parser.add_argument('--cache', default='throttle', help="Cache alias to benchmark against.")
+
+    def handle(self, *args, **options):
+        cache = caches[options['cache']]
+        rate = options['rate'] or api_settings.DEFAULT_THROTTLE_RATES[options['role']]
+        # The alias may be shared with a running site, so it is never cleared:
+        # every measurement throttles a fresh client id, whose keys expire
+        # on their own.
+        client_ids = itertools.count(10 ** 9 + int(time.time()) % 10 ** 6 * 1000)
+
+        def fresh_request():
+            request = APIRequestFactory().get('/api/orders/')
+            request.user = User(pk=next(client_ids), username='throttle-benchmark', role=options['role'])
+            return request
+
+        def history():
+            throttle = HistoryRoleBasedThrottle()
+            throttle.cache = cache
+            throttle.rate = rate
+            throttle.num_requests, throttle.duration = throttle.parse_rate(rate)
+            return throttle
+
+        def window():
+            throttle = RoleBasedThrottle()
+            throttle.cache_alias = options['cache']
+            throttle.get_rate = lambda: rate
+            return throttle
+
+        limit = RoleBasedThrottle.parse_rate(None, rate)[0]
+        self.stdout.write(f"{rate} for a {options['role']} on the '{options['cache']}' cache ({cache.__class__.__name__})")
+        for name, factory in [('history list', history), ('sliding window', window)]:
+            elapsed = 0.0
+            for _ in range(options['rounds']):
+                request = fresh_request()
+                start = time.perf_counter()
+                for _ in range(limit):
+                    factory().allow_request(request, None)
+                elapsed += time.perf_counter() - start
+            footprint = self.footprint(cache, factory(), request)
+            allowed = self.concurrent_allowed(factory, fresh_request(), limit, options['threads'])
+            self.stdout.write(
+                f"{name:>15}: {elapsed / (limit * options['rounds']) * 1e6:8.1f} us/request, "
+                f"{footprint:6d} bytes cached per client at the limit, "
+                f"{allowed}/{limit} admitted to {options['threads']} threads"
+            )
+
+    def footprint(self, cache, throttle, request):
+        throttle.allow_request(request, None)
+        if isinstance(throttle, HistoryRoleBasedThrottle):
+            return len(pickle.dumps(cache.get(throttle.key)))
+        key = throttle.get_cache_key(request, None)
+        window = int(throttle.timer() // throttle.duration)
+        values = cache.get_many([f"{key}:{window}", f"{key}:{window - 1}"])
+        return sum(len(pickle.dumps(value)) for value in values.values())
+
+    def concurrent_allowed(self, factory, request, limit, threads):
+        allowed = []
+        barrier = threading.Barrier(threads)
+        per_thread = limit * 2 // threads + 1
+
+        def worker():
+            barrier.wait()
+            allowed.append(sum(factory().allow_request(request, None) for _ in range(per_thread)))
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return sum(allowed)
@@ -0,0 +1,142 @@
+import random
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.menu.querysets import filter_menu, menu_queryset
+from api.orders.querysets import orders_for_user
+from core.models import MenuCategory, MenuItem, Order, OrderItem, OrderStatusHistory, User
+
+SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+HOT_TABLES = {Order._meta.db_table, OrderStatusHistory._meta.db_table, MenuItem._meta.db_table}
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs EXPLAIN on the hot order queries against a seeded dataset and fails "
+        "if any of them falls back to a sequential scan of the order or menu tables."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=20000, help="Number of orders to seed.")
+        parser.add_argument('--clients', type=int, default=500, help="Number of client accounts to seed.")
+        parser.add_argument('--menu-items', type=int, default=5000, help="Number of menu items to seed.")
+        parser.add_argument('--page-size', type=int, default=50, help="LIMIT used for the list queries.")
+        parser.add_argument(
+            '--no-seed', action='store_true',
+            help="Explain against the existing data instead of a temporary seeded dataset.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Query plan checks require PostgreSQL.")
+        self.verbosity = options['verbosity']
+
+        failures = []
+        try:
+            with transaction.atomic():
+                if not options['no_seed']:
+                    self.seed(options['orders'], options['clients'], options['menu_items'])
+                failures = self.check_plans(options['page_size'])
+                # The seeded rows are never kept.
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        if failures:
+            raise CommandError(f"Sequential scans found in: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS("All hot queries use an index."))
+
+    def seed(self, order_count, client_count, menu_item_count):
+        self.stdout.write(f"Seeding {order_count} orders for {client_count} clients...")
+        clients = User.objects.bulk_create(
+            User(username=f"plancheck_client_{i}", role=User.Role.CLIENT) for i in range(client_count)
+        )
+        categories = MenuCategory.objects.bulk_create(
+            MenuCategory(name=f"Plan check category {i}") for i in range(50)
+        )
+        menu_items = MenuItem.objects.bulk_create(
+            (
+                MenuItem(
+                    name=f"Plan check dish {i}", description=f"Seeded dish number {i}",
+                    price=5 + i % 40, category=categories[i % len(categories)], available=i % 10 != 0,
+                )
+                for i in range(menu_item_count)
+            ),
+            batch_size=2000,
+        )
+
+        # Most of the history is delivered; only a small share is still active.
+        statuses = [Order.Status.DELIVERED] * 90 + [Order.Status.CANCELLED] * 4 + [
+            Order.Status.NEW, Order.Status.NEW, Order.Status.IN_PROGRESS, Order.Status.IN_PROGRESS,
+            Order.Status.READY, Order.Status.READY,
+        ]
+        orders = Order.objects.bulk_create(
+            (Order(user=random.choice(clients), status=random.choice(statuses)) for _ in range(order_count)),
+            batch_size=2000,
+        )
+        OrderItem.objects.bulk_create(
+            (OrderItem(order=order, menu_item=random.choice(menu_items), quantity=1) for order in orders),
+            batch_size=2000,
+        )
+        OrderStatusHistory.objects.bulk_create(
+            (OrderStatusHistory(order=order, status=order.status) for order in orders),
+            batch_size=2000,
+        )
+
+        with connection.cursor() as cursor:
+            # auto_now/auto_now_add stamp every seeded row with the same time; spread them out.
+            cursor.execute(
+                f"UPDATE {Order._meta.db_table} "
+                f"SET created_at = now() - id * interval '1 minute', updated_at = now() - id * interval '1 minute'"
+            )
+            for table in HOT_TABLES:
+                cursor.execute(f"ANALYZE {table}")
+
+    def hot_queries(self, page_size):
+        client = User.objects.filter(role=User.Role.CLIENT).first()
+        kitchen = User(role=User.Role.KITCHEN)
+        order_id = Order.objects.values_list('id', flat=True).first()
+        category_id = MenuCategory.objects.values_list('id', flat=True).first()
+        ordering = ('-created_at', '-id')
+
+        queries = {
+            'kitchen orders': orders_for_user(kitchen).order_by(*ordering)[:page_size],
+            'waiter orders': Order.objects.filter(status=Order.Status.READY).order_by(*ordering)[:page_size],
+            'manager orders': Order.objects.order_by(*ordering)[:page_size],
+        }
+        queries['kitchen changes since cursor'] = Order.objects.filter(
+            updated_at__gt=timezone.now() - timedelta(minutes=5)
+        ).order_by('updated_at', 'id')[:page_size]
+        if client is not None:
+            queries['client orders'] = orders_for_user(client).order_by(*ordering)[:page_size]
+        if order_id is not None:
+            queries['order status history'] = OrderStatusHistory.objects.filter(order_id=order_id)
+        queries['menu search'] = filter_menu(menu_queryset(), {'search': 'dish 4321'})
+        queries['menu price range'] = filter_menu(menu_queryset(), {'available': 'true', 'max_price': '6'})
+        if category_id is not None:
+            queries['menu category'] = filter_menu(
+                menu_queryset(), {'category': str(category_id), 'available': 'true', 'max_price': '20'}
+            )
+        return queries
+
+    def check_plans(self, page_size):
+        failures = []
+        for name, queryset in self.hot_queries(page_size).items():
+            plan = queryset.explain()
+            scanned = HOT_TABLES.intersection(SEQ_SCAN.findall(plan))
+            if scanned:
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f"[SEQ SCAN] {name}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"[OK] {name}"))
+            if self.verbosity > 1:
+                self.stdout.write(plan)
+        return failures
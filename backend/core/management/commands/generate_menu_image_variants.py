@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from api.menu.images import delete_variants, process_image
+from core.models import MenuItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates the thumbnail and display variants for menu item images that do not have them yet, "
+        "such as those uploaded before variants existed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regenerate variants that already exist.")
+        parser.add_argument('--ids', type=int, nargs='+', help="Only process these menu items.")
+
+    def handle(self, *args, **options):
+        items = MenuItem.objects.exclude(image='').exclude(image__isnull=True).order_by('id')
+        if options['ids']:
+            items = items.filter(id__in=options['ids'])
+        if not options['force']:
+            items = items.filter(image_variants={})
+
+        processed = failed = 0
+        for item in items.only('id', 'image', 'image_variants').iterator():
+            try:
+                if process_image(item.pk, item.image.name):
+                    delete_variants(item.image_variants)
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f"#{item.pk} {item.image.name}: {exc}")
+                continue
+            processed += 1
+            if processed % 100 == 0:
+                self.stdout.write(f"Processed {processed} images...")
+
+        self.stdout.write(self.style.SUCCESS(f"Generated variants for {processed} image(s)."))
+        if failed:
+            self.stdout.write(self.style.WARNING(f"{failed} image(s) could not be processed."))
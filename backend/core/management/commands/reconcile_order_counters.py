@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from api.orders.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recomputes the order status counters from the Order table and reports any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without correcting it.")
+
+    def handle(self, *args, **options):
+        drift = reconcile(fix=not options['dry_run'])
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("Order status counters are in sync."))
+            return
+
+        for status, (stored, actual) in sorted(drift.items()):
+            self.stdout.write(self.style.WARNING(f"{status}: stored {stored}, actual {actual}"))
+        if options['dry_run']:
+            self.stdout.write(f"{len(drift)} counter(s) drifted; run without --dry-run to correct them.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Corrected {len(drift)} counter(s)."))
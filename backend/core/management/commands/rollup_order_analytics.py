@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api.orders.analytics import pending_range, rollup, truncate_hour
+
+
+class Command(BaseCommand):
+    help = (
+        "Incrementally fills the hourly and daily order analytics rollups. "
+        "Run it periodically (e.g. every 15 minutes from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lookback', type=int, default=24,
+            help="Hours before the latest rollup to re-aggregate (catches late cancellations).",
+        )
+        parser.add_argument('--since', help="Rebuild everything from this ISO timestamp.")
+        parser.add_argument('--chunk-days', type=int, default=7, help="Days aggregated per transaction.")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError("--since must be an ISO 8601 timestamp.")
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            window = truncate_hour(since), truncate_hour(now) + timedelta(hours=1)
+        else:
+            window = pending_range(now, timedelta(hours=options['lookback']))
+
+        if window is None:
+            self.stdout.write("No orders to aggregate yet.")
+            return
+
+        start, end = window
+        chunk = timedelta(days=options['chunk_days'])
+        buckets = 0
+        while start < end:
+            chunk_end = min(start + chunk, end)
+            buckets += rollup(start, chunk_end)
+            start = chunk_end
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled up {buckets} hourly buckets from {window[0]:%Y-%m-%d %H:%M} to {window[1]:%Y-%m-%d %H:%M}."
+        ))
@@ -0,0 +1,382 @@
+import http.client
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote, urlencode, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from core.loadtest import DEFAULT_PASSWORD, DEFAULT_PREFIX, DEFAULT_USERS, username_for
+from core.models import Order, User
+
+# (weight, method, route) per role. Routes are reported as written here;
+# {order}, {item} and {user} are filled in from earlier responses, {term}
+# with one of SEARCH_TERMS and {since} with the start of EXPORT_WINDOW.
+SCENARIOS = {
+    User.Role.CLIENT: [
+        (8, 'GET', '/api/menu/items/'),
+        (3, 'GET', '/api/menu/items/?search={term}'),
+        (1, 'GET', '/api/menu/items/?available=true&max_price=15'),
+        (2, 'GET', '/api/menu/categories/'),
+        (2, 'GET', '/api/menu/items/{item}/'),
+        (6, 'GET', '/api/orders/'),
+        (3, 'GET', '/api/orders/{order}/'),
+        (1, 'GET', '/api/orders/{order}/history/'),
+        (4, 'GET', '/api/orders/changes/'),
+        (2, 'GET', '/api/orders/stats/'),
+        (1, 'GET', '/api/users/me/'),
+        (1, 'POST', '/api/orders/'),
+    ],
+    User.Role.KITCHEN: [
+        (8, 'GET', '/api/orders/kitchen/'),
+        (4, 'GET', '/api/orders/kitchen/?view=board'),
+        (6, 'GET', '/api/orders/changes/'),
+        (2, 'GET', '/api/orders/{order}/'),
+        (1, 'GET', '/api/orders/stats/'),
+        (1, 'GET', '/api/menu/items/'),
+        (1, 'POST', '/api/menu/items/{item}/toggle-availability/'),
+    ],
+    User.Role.WAITER: [
+        (8, 'GET', '/api/orders/waiter/'),
+        (4, 'GET', '/api/orders/waiter/?view=board'),
+        (6, 'GET', '/api/orders/changes/'),
+        (3, 'GET', '/api/orders/'),
+        (2, 'GET', '/api/orders/{order}/'),
+        (1, 'GET', '/api/menu/items/'),
+        (1, 'POST', '/api/orders/'),
+    ],
+    User.Role.MANAGER: [
+        (5, 'GET', '/api/orders/manager/'),
+        (2, 'GET', '/api/orders/analytics/'),
+        (2, 'GET', '/api/orders/stats/'),
+        (2, 'GET', '/api/orders/{order}/'),
+        (1, 'GET', '/api/orders/{order}/history/'),
+        (1, 'PATCH', '/api/orders/{order}/'),
+        (1, 'PATCH', '/api/orders/status/'),
+        (1, 'GET', '/api/orders/export/?format=csv&created_after={since}'),
+        (1, 'GET', '/api/orders/export/?format=ndjson&created_after={since}'),
+        (1, 'GET', '/api/users/'),
+        (1, 'GET', '/api/users/{user}/'),
+        (1, 'GET', '/api/menu/cache-stats/'),
+        (1, 'GET', '/api/archive/audit-logs/'),
+        (1, 'GET', '/api/archive/order-history/'),
+    ],
+}
+
+WRITE_METHODS = {'POST', 'PATCH', 'PUT', 'DELETE'}
+
+# Words that occur in the menu item names created by seed_load_data.
+SEARCH_TERMS = ['chicken', 'salmon', 'tofu', 'spicy', 'garlic', 'bowl', 'tacos', 'platter']
+EXPORT_WINDOW = timedelta(days=1)
+BULK_STATUS_SIZE = 5
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class VirtualUser:
+    """
+    One logged-in account issuing requests over a keep-alive connection.
+    """
+
+    def __init__(self, base_url, role, username, password, rng, read_only):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port, timeout=30)
+        self.role = role
+        self.rng = rng
+        self.scenario = [
+            (weight, method, route) for weight, method, route in SCENARIOS[role]
+            if not (read_only and method in WRITE_METHODS)
+        ]
+        self.weights = [weight for weight, _, _ in self.scenario]
+        self.ids = {'order': [], 'item': [], 'user': []}
+        self.cursor = None
+
+        status, body, _ = self.request('POST', '/api/users/login/', {'username': username, 'password': password})
+        if status != 200:
+            raise CommandError(f"Login failed for {username} ({status}); seed the data with seed_load_data first.")
+        self.token = body['access']
+
+    def request(self, method, path, payload=None):
+        # Exports pick CSV or NDJSON with ?format=, so other types stay acceptable.
+        headers = {'Accept': 'application/json, */*;q=0.1'}
+        if getattr(self, 'token', None):
+            headers['Authorization'] = f"Bearer {self.token}"
+        data = None
+        if payload is not None:
+            data = json.dumps(payload)
+            headers['Content-Type'] = 'application/json'
+
+        start = time.perf_counter()
+        try:
+            self.connection.request(method, path, body=data, headers=headers)
+            response = self.connection.getresponse()
+            raw = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            return None, None, time.perf_counter() - start
+        elapsed = time.perf_counter() - start
+
+        try:
+            body = json.loads(raw) if raw else None
+        except ValueError:
+            body = None
+        return status, body, elapsed
+
+    def warm_up(self):
+        for path, key in [('/api/menu/items/', 'item'), (self.list_route(), 'order')]:
+            _, body, _ = self.request('GET', path)
+            self.remember(key, body)
+        if self.role == User.Role.MANAGER:
+            _, body, _ = self.request('GET', '/api/users/')
+            self.remember('user', body)
+
+    def list_route(self):
+        return {
+            User.Role.KITCHEN: '/api/orders/kitchen/',
+            User.Role.WAITER: '/api/orders/waiter/',
+            User.Role.MANAGER: '/api/orders/manager/',
+        }.get(self.role, '/api/orders/')
+
+    def remember(self, key, body):
+        rows = body.get('results', body.get('orders')) if isinstance(body, dict) else body
+        if isinstance(rows, list):
+            # Orders can only be placed for available items.
+            ids = [
+                row['id'] for row in rows
+                if isinstance(row, dict) and 'id' in row and row.get('available', True)
+            ]
+            if ids:
+                self.ids[key] = ids[:100]
+
+    def next_request(self):
+        _, method, route = self.rng.choices(self.scenario, weights=self.weights)[0]
+        path = route
+        for key in ('order', 'item', 'user'):
+            placeholder = '{' + key + '}'
+            if placeholder in path:
+                if not self.ids[key]:
+                    return None
+                path = path.replace(placeholder, str(self.rng.choice(self.ids[key])))
+        if '{term}' in path:
+            path = path.replace('{term}', quote(self.rng.choice(SEARCH_TERMS)))
+        if '{since}' in path:
+            path = path.replace('{since}', quote((datetime.now(timezone.utc) - EXPORT_WINDOW).isoformat()))
+
+        payload = None
+        if route == '/api/orders/changes/' and self.cursor:
+            path += '?' + urlencode({'cursor': self.cursor})
+        elif method == 'POST' and route == '/api/orders/':
+            if not self.ids['item']:
+                return None
+            payload = {
+                'items': [{'menu_item': item, 'quantity': 1} for item in self.rng.sample(self.ids['item'], 2)],
+                'table_number': str(self.rng.randint(1, 40)),
+            }
+        elif route == '/api/orders/status/':
+            if not self.ids['order']:
+                return None
+            # Orders that cannot make the move are reported as rejected, not failed.
+            payload = {
+                'ids': self.rng.sample(self.ids['order'], min(BULK_STATUS_SIZE, len(self.ids['order']))),
+                'status': self.rng.choice([Order.Status.IN_PROGRESS, Order.Status.READY]),
+            }
+        elif method == 'PATCH':
+            payload = {'notes': 'Load test'}
+        return method, route, path, payload
+
+    def step(self):
+        request = self.next_request()
+        if request is None:
+            return None
+        method, route, path, payload = request
+        status, body, elapsed = self.request(method, path, payload)
+        if route == '/api/orders/changes/' and isinstance(body, dict) and body.get('cursor'):
+            self.cursor = body['cursor']
+        return f"{method} {route}", status, elapsed
+
+
+class Command(BaseCommand):
+    help = (
+        "Drives the API routes of a running server with role-appropriate JWTs for the accounts "
+        "created by seed_load_data and writes throughput and p50/p95/p99 latency per endpoint "
+        "to a JSON file. Raise THROTTLE_RATE_* on the server, or 429s will dominate."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://localhost:8000', help="Server to load.")
+        parser.add_argument('--duration', type=float, default=60, help="Seconds to run.")
+        parser.add_argument('--concurrency', type=int, default=20, help="Virtual users.")
+        parser.add_argument(
+            '--mix', default='client=70,waiter=15,kitchen=10,manager=5',
+            help="Share of virtual users per role.",
+        )
+        parser.add_argument('--think-time', type=float, default=0, help="Seconds each user waits between requests.")
+        parser.add_argument('--read-only', action='store_true', help="Skip creating and updating orders.")
+        parser.add_argument('--prefix', default=DEFAULT_PREFIX)
+        parser.add_argument('--password', default=DEFAULT_PASSWORD)
+        parser.add_argument('--seed', type=int, help="Random seed for the request sequence.")
+        parser.add_argument('--output', help="Result file (default: loadtest-results/<timestamp>.json).")
+        parser.add_argument('--baseline', help="Earlier result file to compare p95 latency against.")
+
+    def handle(self, *args, **options):
+        mix = self.parse_mix(options['mix'])
+        rng = random.Random(options['seed'])
+        roles = rng.choices(list(mix), weights=list(mix.values()), k=options['concurrency'])
+
+        self.stdout.write(f"Logging in {len(roles)} virtual users against {options['base_url']}...")
+        users = []
+        used = defaultdict(int)
+        accounts = {role: self.count_accounts(options['prefix'], role) for role in set(roles)}
+        for role in roles:
+            index = used[role] % accounts[role]
+            used[role] += 1
+            user = VirtualUser(
+                options['base_url'], role, username_for(options['prefix'], role, index),
+                options['password'], random.Random(rng.random()), options['read_only'],
+            )
+            user.warm_up()
+            users.append(user)
+
+        samples = defaultdict(list)
+        statuses = defaultdict(lambda: defaultdict(int))
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['duration']
+
+        def run(user):
+            local_samples = defaultdict(list)
+            local_statuses = defaultdict(lambda: defaultdict(int))
+            while time.perf_counter() < deadline:
+                result = user.step()
+                if result is not None:
+                    endpoint, status, elapsed = result
+                    local_samples[endpoint].append(elapsed)
+                    local_statuses[endpoint][str(status) if status else 'error'] += 1
+                if options['think_time']:
+                    time.sleep(options['think_time'])
+            with lock:
+                for endpoint, values in local_samples.items():
+                    samples[endpoint].extend(values)
+                    for status, count in local_statuses[endpoint].items():
+                        statuses[endpoint][status] += count
+
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        threads = [threading.Thread(target=run, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        report = self.build_report(options, started_at, elapsed, samples, statuses, used)
+        path = options['output'] or os.path.join(
+            'loadtest-results', f"{started_at:%Y%m%d-%H%M%S}.json"
+        )
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+
+        self.print_report(report, self.load_baseline(options['baseline']))
+        self.stdout.write(self.style.SUCCESS(f"Results written to {path}"))
+
+    def count_accounts(self, prefix, role):
+        # Virtual users cycle through the seeded accounts; the defaults apply
+        # when the server's database is not the one configured here.
+        try:
+            seeded = User.objects.filter(username__startswith=username_for(prefix, role, '')).count()
+        except DatabaseError:
+            seeded = 0
+        return seeded or DEFAULT_USERS[role]
+
+    def parse_mix(self, value):
+        mix = {}
+        for part in value.split(','):
+            role, _, share = part.partition('=')
+            role = role.strip()
+            if role not in SCENARIOS:
+                raise CommandError(f"Unknown role in --mix: {role!r}")
+            try:
+                mix[role] = float(share)
+            except ValueError:
+                raise CommandError(f"Invalid share for {role} in --mix: {share!r}")
+        if not any(mix.values()):
+            raise CommandError("--mix must give at least one role a positive share.")
+        return mix
+
+    def build_report(self, options, started_at, elapsed, samples, statuses, used):
+        endpoints = {}
+        all_samples = []
+        for endpoint in sorted(samples):
+            values = sorted(samples[endpoint])
+            all_samples.extend(values)
+            errors = sum(
+                count for status, count in statuses[endpoint].items()
+                if status == 'error' or int(status) >= 400
+            )
+            endpoints[endpoint] = self.summary(values, elapsed)
+            endpoints[endpoint].update({
+                'errors': errors,
+                'statuses': dict(statuses[endpoint]),
+            })
+
+        all_samples.sort()
+        total = self.summary(all_samples, elapsed)
+        total['errors'] = sum(stats['errors'] for stats in endpoints.values())
+        return {
+            'started_at': started_at.isoformat(),
+            'base_url': options['base_url'],
+            'duration_seconds': round(elapsed, 3),
+            'concurrency': options['concurrency'],
+            'users_per_role': dict(used),
+            'read_only': options['read_only'],
+            'think_time': options['think_time'],
+            'total': total,
+            'endpoints': endpoints,
+        }
+
+    def summary(self, values, elapsed):
+        to_ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None
+        return {
+            'requests': len(values),
+            'throughput_rps': round(len(values) / elapsed, 2) if elapsed else 0,
+            'mean_ms': to_ms(sum(values) / len(values)) if values else None,
+            'p50_ms': to_ms(percentile(values, 0.50)),
+            'p95_ms': to_ms(percentile(values, 0.95)),
+            'p99_ms': to_ms(percentile(values, 0.99)),
+            'max_ms': to_ms(values[-1]) if values else None,
+        }
+
+    def load_baseline(self, path):
+        if not path:
+            return {}
+        try:
+            with open(path) as f:
+                return json.load(f).get('endpoints', {})
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Could not read baseline {path}: {exc}")
+
+    def print_report(self, report, baseline):
+        self.stdout.write(f"{'endpoint':<60}{'req':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'err':>7}")
+        rows = list(report['endpoints'].items()) + [('TOTAL', report['total'])]
+        for endpoint, stats in rows:
+            line = (
+                f"{endpoint:<60}{stats['requests']:>8}{stats['throughput_rps']:>9}"
+                f"{stats['p50_ms'] or 0:>9}{stats['p95_ms'] or 0:>9}{stats['p99_ms'] or 0:>9}"
+                f"{stats['errors']:>7}"
+            )
+            previous = baseline.get(endpoint, {}).get('p95_ms')
+            if previous and stats['p95_ms']:
+                line += f"  p95 {(stats['p95_ms'] - previous) / previous:+.0%} vs baseline"
+            self.stdout.write(line)
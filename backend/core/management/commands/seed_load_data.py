@@ -0,0 +1,247 @@
+import bisect
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.menu.cache import bump_menu_version
+from api.orders.counters import reconcile
+from core.loadtest import DEFAULT_PASSWORD, DEFAULT_PREFIX, DEFAULT_USERS, username_for
+from core.models import MenuCategory, MenuItem, Order, OrderItem, OrderStatusHistory, User
+
+CATEGORIES = [
+    'Starters', 'Soups', 'Salads', 'Mains', 'Grill', 'Pasta', 'Pizza', 'Burgers',
+    'Seafood', 'Vegetarian', 'Sides', 'Desserts', 'Hot Drinks', 'Soft Drinks', 'Wine', 'Beer',
+]
+STYLES = ['Classic', 'Spicy', 'Smoked', 'Grilled', 'Crispy', 'Roasted', 'Creamy', 'Garlic', 'Lemon', 'Chef\'s']
+DISHES = [
+    'Chicken', 'Salmon', 'Beef', 'Tofu', 'Mushroom', 'Halloumi', 'Prawn', 'Lamb', 'Aubergine', 'Duck',
+    'Pork', 'Tuna', 'Goat Cheese', 'Chickpea', 'Cod',
+]
+SERVINGS = ['Bowl', 'Plate', 'Wrap', 'Skewers', 'Salad', 'Stew', 'Risotto', 'Tacos', 'Platter', 'Special']
+
+# Relative order volume per hour of the day: lunch and dinner peaks.
+HOUR_WEIGHTS = [1, 0, 0, 0, 0, 0, 1, 2, 4, 4, 5, 9, 14, 12, 6, 4, 5, 8, 13, 15, 12, 7, 4, 2]
+
+# Orders younger than this are still moving through the kitchen.
+ACTIVE_WINDOW = timedelta(hours=2)
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """
+    Lets bulk_create keep the created_at/updated_at/timestamp values set on
+    the instances instead of stamping every row with the current time.
+    """
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a realistic dataset for load testing: menu categories and items, users in "
+        "every role and months of orders with items and status history."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=200000, help="Orders to create.")
+        parser.add_argument('--days', type=int, default=90, help="Days of order history.")
+        parser.add_argument('--menu-items', type=int, default=2000, help="Menu items to create.")
+        for role, count in DEFAULT_USERS.items():
+            parser.add_argument(f'--{role}s', type=int, default=count, help=f"{role.title()} accounts to create.")
+        parser.add_argument('--prefix', default=DEFAULT_PREFIX, help="Prefix for seeded usernames and categories.")
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help="Password of every seeded account.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Orders written per transaction.")
+        parser.add_argument('--seed', type=int, help="Random seed, for reproducible datasets.")
+        parser.add_argument('--clear', action='store_true', help="Delete data seeded with this prefix first.")
+        parser.add_argument('--skip-rollups', action='store_true', help="Do not build the analytics rollups.")
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.prefix = options['prefix']
+        if options['orders'] and not options['clients']:
+            raise CommandError("Orders need at least one client account.")
+
+        if options['clear']:
+            self.clear()
+        elif User.objects.filter(username__startswith=f"{self.prefix}_").exists():
+            raise CommandError(f"Data with prefix '{self.prefix}' already exists; pass --clear to replace it.")
+
+        now = timezone.now()
+        users = self.seed_users(options)
+        menu_items = self.seed_menu(options['menu_items'])
+        start = now - timedelta(days=options['days'])
+        self.seed_orders(users, menu_items, options['orders'], start, now, options['batch_size'])
+
+        drift = reconcile(fix=True)
+        self.stdout.write(f"Corrected {len(drift)} order status counter(s).")
+        bump_menu_version()
+        if not options['skip_rollups']:
+            call_command('rollup_order_analytics', since=start.isoformat(), stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {sum(len(accounts) for accounts in users.values())} users, {len(menu_items)} menu items "
+            f"and {options['orders']} orders. Accounts: {username_for(self.prefix, '<role>', '<n>')} / "
+            f"{options['password']}"
+        ))
+
+    def clear(self):
+        with transaction.atomic():
+            orders, _ = Order.objects.filter(user__username__startswith=f"{self.prefix}_").delete()
+            MenuItem.objects.filter(category__name__startswith=f"{self.prefix.title()} ").delete()
+            MenuCategory.objects.filter(name__startswith=f"{self.prefix.title()} ").delete()
+            User.objects.filter(username__startswith=f"{self.prefix}_").delete()
+        self.stdout.write(f"Removed {orders} previously seeded rows.")
+
+    def seed_users(self, options):
+        # Hashing is deliberately slow; every account shares one hash.
+        password = make_password(options['password'])
+        users = {}
+        for role in DEFAULT_USERS:
+            users[role] = User.objects.bulk_create(
+                (
+                    User(username=username_for(self.prefix, role, index), role=role, password=password)
+                    for index in range(options[f'{role}s'])
+                ),
+                batch_size=1000,
+            )
+            self.stdout.write(f"Created {len(users[role])} {role} accounts.")
+        return users
+
+    def seed_menu(self, count):
+        categories = MenuCategory.objects.bulk_create(
+            MenuCategory(name=f"{self.prefix.title()} {name}") for name in CATEGORIES
+        )
+        items = []
+        for index in range(count):
+            dish = f"{self.random.choice(STYLES)} {self.random.choice(DISHES)} {self.random.choice(SERVINGS)}"
+            items.append(MenuItem(
+                name=f"{dish} #{index + 1}",
+                description=f"{dish}, freshly prepared.",
+                price=Decimal(self.random.randrange(350, 4500, 50)) / 100,
+                available=self.random.random() > 0.05,
+                category=self.random.choice(categories),
+            ))
+        items = MenuItem.objects.bulk_create(items, batch_size=1000)
+        self.stdout.write(f"Created {len(categories)} categories and {len(items)} menu items.")
+        return items
+
+    def order_times(self, count, start, end):
+        """
+        `count` creation times between start and end, sorted, following the
+        daily lunch/dinner curve.
+        """
+        midnight = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        days = (end - midnight).days + 1
+        hours = [(day, hour) for day in range(days) for hour in range(24)]
+        cumulative = []
+        total = 0
+        for _, hour in hours:
+            total += HOUR_WEIGHTS[hour]
+            cumulative.append(total)
+
+        times = []
+        while len(times) < count:
+            day, hour = hours[bisect.bisect(cumulative, self.random.uniform(0, total))]
+            moment = midnight + timedelta(days=day, hours=hour, seconds=self.random.uniform(0, 3600))
+            if start <= moment <= end:
+                times.append(moment)
+        times.sort()
+        return times
+
+    def lifecycle(self, created_at, now):
+        """
+        Status transitions of one order as (status, timestamp, actor role).
+        """
+        steps = []
+        moment = created_at
+        if now - created_at > ACTIVE_WINDOW:
+            final = Order.Status.CANCELLED if self.random.random() < 0.06 else Order.Status.DELIVERED
+        else:
+            final = self.random.choice([
+                Order.Status.NEW, Order.Status.IN_PROGRESS, Order.Status.READY, Order.Status.DELIVERED,
+            ])
+
+        if final == Order.Status.CANCELLED:
+            if self.random.random() < 0.5:
+                moment += timedelta(minutes=self.random.uniform(1, 8))
+                steps.append((Order.Status.IN_PROGRESS, moment, User.Role.KITCHEN))
+            moment += timedelta(minutes=self.random.uniform(1, 15))
+            steps.append((Order.Status.CANCELLED, moment, User.Role.MANAGER))
+            return steps
+
+        path = [Order.Status.IN_PROGRESS, Order.Status.READY, Order.Status.DELIVERED]
+        delays = [(1, 8, User.Role.KITCHEN), (8, 35, User.Role.KITCHEN), (1, 12, User.Role.WAITER)]
+        for status, (low, high, role) in zip(path, delays):
+            if final == Order.Status.NEW:
+                break
+            next_moment = moment + timedelta(minutes=self.random.uniform(low, high))
+            if next_moment > now:
+                break
+            moment = next_moment
+            steps.append((status, moment, role))
+            if status == final:
+                break
+        return steps
+
+    def seed_orders(self, users, menu_items, count, start, now, batch_size):
+        times = self.order_times(count, start, now)
+        available = [item for item in menu_items if item.available] or menu_items
+        comments = ['', '', '', '', 'No onions', 'Extra spicy', 'Gluten free', 'Sauce on the side']
+
+        for offset in range(0, count, batch_size):
+            orders, lifecycles = [], []
+            for created_at in times[offset:offset + batch_size]:
+                steps = self.lifecycle(created_at, now)
+                orders.append(Order(
+                    user=self.random.choice(users[User.Role.CLIENT]),
+                    status=steps[-1][0] if steps else Order.Status.NEW,
+                    created_at=created_at,
+                    updated_at=steps[-1][1] if steps else created_at,
+                    table_number=str(self.random.randint(1, 40)),
+                ))
+                lifecycles.append(steps)
+
+            with transaction.atomic(), explicit_timestamps(Order, OrderStatusHistory):
+                orders = Order.objects.bulk_create(orders)
+                OrderItem.objects.bulk_create(
+                    (
+                        OrderItem(
+                            order=order,
+                            menu_item=menu_item,
+                            quantity=self.random.choice([1, 1, 1, 2, 2, 3]),
+                            comment=self.random.choice(comments),
+                        )
+                        for order in orders
+                        for menu_item in self.random.sample(available, self.random.randint(1, 5))
+                    ),
+                    batch_size=2000,
+                )
+                OrderStatusHistory.objects.bulk_create(
+                    (
+                        OrderStatusHistory(
+                            order=order, status=status, timestamp=timestamp,
+                            changed_by=self.random.choice(users[role]) if users[role] else None,
+                        )
+                        for order, steps in zip(orders, lifecycles)
+                        for status, timestamp, role in steps
+                    ),
+                    batch_size=2000,
+                )
+            self.stdout.write(f"Created {min(offset + batch_size, count)}/{count} orders...")
@@ -0,0 +1,343 @@
+﻿import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+HISTOGRAMS = {
+    'eatit_http_request_duration_seconds': ("Time from URL resolution to the rendered response.", DURATION_BUCKETS),
+    'eatit_http_request_view_seconds': ("Time spent in the view outside serializers, including SQL.", DURATION_BUCKETS),
+    'eatit_http_request_db_seconds': ("Time spent executing SQL.", DURATION_BUCKETS),
+    'eatit_http_request_serialize_seconds': ("Time spent serializing the response data.", DURATION_BUCKETS),
+    'eatit_http_request_render_seconds': ("Time spent rendering the response body.", DURATION_BUCKETS),
+    'eatit_http_request_queries': ("SQL queries executed per request.", QUERY_BUCKETS),
+}
+RESPONSES = 'eatit_http_responses_total'
+
+SLOTS_KEY = 'metrics:slots'
+
+logger = logging.getLogger(__name__)
+
+_timings = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    __slots__ = ('start', 'rendering', 'queries', 'db', 'serialize', 'serializing')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.rendering = None
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.serializing = False
+
+
+def time_query(execute, sql, params, many, context):
+    timings = _timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db += time.perf_counter() - start
+        timings.queries += 1
+
+
+def install_query_timer(sender, connection, **kwargs):
+    # Sent again when a persistent connection reconnects.
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+connection_created.connect(install_query_timer)
+
+
+@contextmanager
+def timed_serialization():
+    """
+    Counts the enclosed block as serializer time instead of view time. Wrap
+    the evaluation of serializer.data, not the serializer's construction.
+    """
+    timings = _timings.get()
+    if timings is None or timings.serializing:
+        yield
+        return
+    timings.serializing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.serialize += time.perf_counter() - start
+        timings.serializing = False
+
+
+def _slot_key(slot):
+    return f"metrics:slot:{slot}"
+
+
+def _next_slot():
+    cache.add(SLOTS_KEY, 0, timeout=None)
+    try:
+        return cache.incr(SLOTS_KEY)
+    except ValueError:
+        # The key was evicted between add() and incr().
+        cache.set(SLOTS_KEY, 1, timeout=None)
+        return 1
+
+
+class Registry:
+    """
+    Histograms for this process. A background thread stores a snapshot in
+    the shared cache every METRICS_FLUSH_INTERVAL seconds, where the metrics
+    endpoint sums the snapshots of all live processes.
+
+    Each process keeps its snapshot under a numbered slot, claimed with an
+    atomic add(), so processes never rewrite a shared key. A slot whose
+    snapshot expired is free to be claimed again.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.histograms = {}
+        self.responses = defaultdict(int)
+        self.slot = None
+        self.pid = None
+
+    @property
+    def instance(self):
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def observe(self, method, route, status, values):
+        with self.lock:
+            for name, value in values.items():
+                buckets = HISTOGRAMS[name][1]
+                series = self.histograms.get((name, method, route))
+                if series is None:
+                    # Bucket counts, then the +Inf bucket, then the sum.
+                    series = self.histograms[(name, method, route)] = [0] * (len(buckets) + 1) + [0.0]
+                series[bisect_left(buckets, value)] += 1
+                series[-1] += value
+            self.responses[(method, route, str(status))] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'histograms': {key: list(series) for key, series in self.histograms.items()},
+                'responses': dict(self.responses),
+            }
+
+    def start(self):
+        """
+        Starts the flush thread of this process. A forked worker starts its
+        own, with its own slot and without the parent's observations.
+        """
+        if self.pid == os.getpid():
+            return
+        with self.flush_lock:
+            if self.pid == os.getpid():
+                return
+            if self.pid is not None:
+                with self.lock:
+                    self.histograms.clear()
+                    self.responses.clear()
+                self.slot = None
+            threading.Thread(target=self.run, name='metrics-flush', daemon=True).start()
+            self.pid = os.getpid()
+
+    def run(self):
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Could not flush the request metrics")
+
+    def flush(self):
+        snapshot = {'instance': self.instance, **self.snapshot()}
+        timeout = settings.METRICS_FLUSH_INTERVAL * 6
+        with self.flush_lock:
+            if self.slot is not None:
+                stored = cache.get(_slot_key(self.slot))
+                if stored is not None and stored['instance'] == snapshot['instance']:
+                    cache.set(_slot_key(self.slot), snapshot, timeout=timeout)
+                    return
+                if stored is None and cache.add(_slot_key(self.slot), snapshot, timeout=timeout):
+                    return
+            self.slot = self.claim_slot(snapshot, timeout)
+
+    def claim_slot(self, snapshot, timeout):
+        # Reuse the first expired slot, or take a new number.
+        for slot in range(1, (cache.get(SLOTS_KEY) or 0) + 1):
+            if cache.add(_slot_key(slot), snapshot, timeout=timeout):
+                return slot
+        while True:
+            slot = _next_slot()
+            if cache.add(_slot_key(slot), snapshot, timeout=timeout):
+                return slot
+
+    def collect(self):
+        """
+        Sums the snapshots of every process that flushed recently. Slots
+        whose snapshot expired are skipped.
+        """
+        self.flush()
+        slots = cache.get(SLOTS_KEY) or 0
+        snapshots = cache.get_many([_slot_key(slot) for slot in range(1, slots + 1)])
+
+        histograms = {}
+        responses = defaultdict(int)
+        for snapshot in snapshots.values():
+            for key, series in snapshot['histograms'].items():
+                total = histograms.setdefault(key, [0] * len(series))
+                for index, value in enumerate(series):
+                    total[index] += value
+            for key, count in snapshot['responses'].items():
+                responses[key] += count
+        return histograms, responses
+
+
+registry = Registry()
+
+
+def _labels(**labels):
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def render_prometheus(histograms, responses):
+    """
+    Formats collected metrics in the Prometheus text exposition format.
+    """
+    lines = []
+    for name, (description, buckets) in HISTOGRAMS.items():
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} histogram")
+        for (metric, method, route), series in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip([*buckets, '+Inf'], series[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(method=method, route=route, le=bound)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(method=method, route=route)} {series[-1]}")
+            lines.append(f"{name}_count{_labels(method=method, route=route)} {cumulative}")
+
+    lines.append(f"# HELP {RESPONSES} Responses by route and status code.")
+    lines.append(f"# TYPE {RESPONSES} counter")
+    for (method, route, status), count in sorted(responses.items()):
+        lines.append(f"{RESPONSES}{_labels(method=method, route=route, status=status)} {count}")
+    return '\n'.join(lines) + '\n'
+
+
+class RequestMetricsMiddleware:
+    """
+    Records the SQL query count, SQL time, view time, serializer time and
+    render time of every request, returns them in a Server-Timing header
+    and adds them to the per-route histograms. Listed last in MIDDLEWARE,
+    so the timings cover URL resolution, the view and rendering only.
+
+    Serializer time is what views spend inside timed_serialization(); it is
+    taken out of the view time. SQL run by a serializer is counted in both
+    the SQL time and the serializer time. Rendering starts where
+    process_template_response is called. Responses without a render step
+    (streams) report all their time as view time.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Connections opened before this module was imported.
+        for connection in connections.all(initialized_only=True):
+            install_query_timer(None, connection)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # A sync hook would be run in a thread under ASGI.
+            self.process_template_response = self.aprocess_template_response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        self.record(request, response, timings)
+        return response
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        self.record(request, response, timings)
+        return response
+
+    def mark_rendering(self):
+        timings = _timings.get()
+        if timings is not None:
+            timings.rendering = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        self.mark_rendering()
+        return response
+
+    async def aprocess_template_response(self, request, response):
+        self.mark_rendering()
+        return response
+
+    def record(self, request, response, timings):
+        end = time.perf_counter()
+        rendering = timings.rendering or end
+        total = end - timings.start
+        view = rendering - timings.start - timings.serialize
+        render = end - rendering
+
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = (
+                f'db;dur={timings.db * 1000:.1f};desc="{timings.queries} queries", '
+                f'view;dur={view * 1000:.1f}, '
+                f'serialize;dur={timings.serialize * 1000:.1f}, '
+                f'render;dur={render * 1000:.1f}, '
+                f'total;dur={total * 1000:.1f}'
+            )
+
+        match = request.resolver_match
+        registry.start()
+        registry.observe(
+            request.method,
+            f"/{match.route}" if match else 'unmatched',
+            response.status_code,
+            {
+                'eatit_http_request_duration_seconds': total,
+                'eatit_http_request_view_seconds': view,
+                'eatit_http_request_db_seconds': timings.db,
+                'eatit_http_request_serialize_seconds': timings.serialize,
+                'eatit_http_request_render_seconds': render,
+                'eatit_http_request_queries': timings.queries,
+            },
+        )
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:36
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counters(apps, schema_editor):
+    Order = apps.get_model('core', 'Order')
+    OrderStatusCounter = apps.get_model('core', 'OrderStatusCounter')
+    counts = dict(Order.objects.values_list('status').annotate(count=Count('id')).order_by())
+    OrderStatusCounter.objects.bulk_create(
+        OrderStatusCounter(status=status, count=counts.get(status, 0))
+        for status in ['new', 'in_progress', 'ready', 'delivered', 'cancelled']
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_order_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatusCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('new', 'New'), ('in_progress', 'In Progress'), ('ready', 'Ready'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], max_length=20, unique=True)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
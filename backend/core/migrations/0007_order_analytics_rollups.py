@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_orderstatuscounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuItemRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=10)),
+                ('bucket_start', models.DateTimeField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'ordering': ['granularity', 'bucket_start'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OrderRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=10)),
+                ('bucket_start', models.DateTimeField()),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('cancelled_count', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('delivered_count', models.PositiveIntegerField(default=0)),
+                ('fulfillment_seconds', models.FloatField(default=0)),
+            ],
+            options={
+                'ordering': ['granularity', 'bucket_start'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='orderstatushistory',
+            index=models.Index(fields=['status', 'timestamp'], name='history_status_ts_idx'),
+        ),
+        migrations.AddField(
+            model_name='menuitemrollup',
+            name='menu_item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.menuitem'),
+        ),
+        migrations.AddConstraint(
+            model_name='orderrollup',
+            constraint=models.UniqueConstraint(fields=('granularity', 'bucket_start'), name='order_rollup_bucket_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='menuitemrollup',
+            constraint=models.UniqueConstraint(fields=('granularity', 'bucket_start', 'menu_item'), name='menu_item_rollup_bucket_uniq'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-17 22:10
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+TRIGRAM_INDEXES = [
+    django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='menu_item_name_trgm_idx'),
+    django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('description'), name='gin_trgm_ops'), name='menu_item_description_trgm_idx'),
+]
+
+
+# The trigram indexes only exist on PostgreSQL; SQLite searches by scanning.
+def add_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    MenuItem = apps.get_model('core', 'MenuItem')
+    for index in TRIGRAM_INDEXES:
+        schema_editor.add_index(MenuItem, index)
+
+
+def remove_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    MenuItem = apps.get_model('core', 'MenuItem')
+    for index in TRIGRAM_INDEXES:
+        schema_editor.remove_index(MenuItem, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_menuitem_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['category', 'available', 'price'], name='menu_item_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['available', 'price'], name='menu_item_available_idx'),
+        ),
+        TrigramExtension(),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(add_trigram_indexes, remove_trigram_indexes),
+            ],
+            state_operations=[
+                migrations.AddIndex(model_name='menuitem', index=index) for index in TRIGRAM_INDEXES
+            ],
+        ),
+    ]
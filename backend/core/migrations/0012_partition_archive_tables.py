@@ -0,0 +1,68 @@
+from django.db import migrations
+
+ARCHIVE_MODELS = ['AuditLogArchive', 'OrderStatusHistoryArchive']
+
+
+def rebuild(apps, schema_editor, partitioned):
+    """
+    Recreates the archive tables, partitioned by month on timestamp or not,
+    and copies their rows over. A partitioned table's primary key has to
+    include the partition key, so it becomes (id, timestamp). Partitions are
+    named <table>_YYYYMM like core.archive.partition_name.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    quote = schema_editor.quote_name
+    for name in ARCHIVE_MODELS:
+        model = apps.get_model('core', name)
+        table = model._meta.db_table
+        old = f"{table}_old"
+        for index in model._meta.indexes:
+            schema_editor.execute(index.remove_sql(model, schema_editor))
+        schema_editor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(old)}")
+        schema_editor.execute(f"ALTER TABLE {quote(old)} RENAME CONSTRAINT {quote(table + '_pkey')} TO {quote(old + '_pkey')}")
+
+        if partitioned:
+            schema_editor.execute(
+                f"CREATE TABLE {quote(table)} (LIKE {quote(old)} INCLUDING DEFAULTS) PARTITION BY RANGE (\"timestamp\")"
+            )
+            schema_editor.execute(f"ALTER TABLE {quote(table)} ADD PRIMARY KEY (id, \"timestamp\")")
+            with schema_editor.connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT DISTINCT date_trunc('month', \"timestamp\" AT TIME ZONE 'UTC') FROM {quote(old)}"
+                )
+                months = [row[0] for row in cursor.fetchall()]
+            for start in months:
+                end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+                schema_editor.execute(
+                    f"CREATE TABLE {quote(f'{table}_{start:%Y%m}')} PARTITION OF {quote(table)} "
+                    f"FOR VALUES FROM ('{start.isoformat()}+00:00') TO ('{end.isoformat()}+00:00')"
+                )
+        else:
+            schema_editor.execute(f"CREATE TABLE {quote(table)} (LIKE {quote(old)} INCLUDING DEFAULTS)")
+            schema_editor.execute(f"ALTER TABLE {quote(table)} ADD PRIMARY KEY (id)")
+
+        schema_editor.execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(old)}")
+        # Dropping a partitioned table drops its partitions too.
+        schema_editor.execute(f"DROP TABLE {quote(old)}")
+        for index in model._meta.indexes:
+            schema_editor.execute(index.create_sql(model, schema_editor))
+
+
+def partition(apps, schema_editor):
+    rebuild(apps, schema_editor, partitioned=True)
+
+
+def unpartition(apps, schema_editor):
+    rebuild(apps, schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_menu_item_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition, unpartition),
+    ]
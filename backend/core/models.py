@@ -1,5 +1,8 @@
 ﻿from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
+from django.utils import timezone
 
 class User(AbstractUser):
     class Role(models.TextChoices):
@@ -31,6 +34,18 @@ class MenuItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     category = models.ForeignKey(MenuCategory, on_delete=models.SET_NULL, null=True, blank=True)
     image = models.ImageField(upload_to='menu_images/', null=True, blank=True)
+    # {variant: {format: storage name}}, filled in after upload by api.menu.images.
+    image_variants = models.JSONField(default=dict, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['category', 'available', 'price'], name='menu_item_category_idx'),
+            models.Index(fields=['available', 'price'], name='menu_item_available_idx'),
+            # Serve `?search=` (icontains compiles to UPPER(col) LIKE) on
+            # PostgreSQL; created by migration 0011 only on that backend.
+            GinIndex(OpClass(Upper('name'), name='gin_trgm_ops'), name='menu_item_name_trgm_idx'),
+            GinIndex(OpClass(Upper('description'), name='gin_trgm_ops'), name='menu_item_description_trgm_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -44,6 +59,15 @@ class Order(models.Model):
         DELIVERED = 'delivered', 'Delivered'
         CANCELLED = 'cancelled', 'Cancelled'
 
+    # Status changes allowed from each status; delivered and cancelled are final.
+    TRANSITIONS = {
+        Status.NEW: {Status.IN_PROGRESS, Status.CANCELLED},
+        Status.IN_PROGRESS: {Status.READY, Status.CANCELLED},
+        Status.READY: {Status.DELIVERED, Status.CANCELLED},
+        Status.DELIVERED: set(),
+        Status.CANCELLED: set(),
+    }
+
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.NEW)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -51,10 +75,31 @@ class Order(models.Model):
     table_number = models.CharField(max_length=10, null=True, blank=True)
     notes = models.TextField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+            models.Index(fields=['updated_at', 'id'], name='order_updated_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx'),
+            models.Index(fields=['status', '-created_at', '-id'], name='order_status_created_idx'),
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='order_active_created_idx',
+                condition=models.Q(status__in=['new', 'in_progress']),
+            ),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} by {self.user}" if self.user else f"Order #{self.id}"
 
 
+class OrderStatusCounter(models.Model):
+    status = models.CharField(max_length=20, choices=Order.Status.choices, unique=True)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.status}: {self.count}"
+
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
@@ -72,18 +117,131 @@ class OrderStatusHistory(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['order', 'timestamp'], name='history_order_ts_idx'),
+            models.Index(fields=['status', 'timestamp'], name='history_status_ts_idx'),
+            models.Index(fields=['-timestamp'], name='history_ts_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.order.id} changed to {self.status} by {self.changed_by} at {self.timestamp}"
 
+class Rollup(models.Model):
+    class Granularity(models.TextChoices):
+        HOUR = 'hour', 'Hour'
+        DAY = 'day', 'Day'
+
+    granularity = models.CharField(max_length=10, choices=Granularity.choices)
+    bucket_start = models.DateTimeField()
+
+    class Meta:
+        abstract = True
+
+
+class OrderRollup(Rollup):
+    order_count = models.PositiveIntegerField(default=0)
+    cancelled_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    delivered_count = models.PositiveIntegerField(default=0)
+    fulfillment_seconds = models.FloatField(default=0)
+
+    class Meta:
+        ordering = ['granularity', 'bucket_start']
+        constraints = [
+            models.UniqueConstraint(fields=['granularity', 'bucket_start'], name='order_rollup_bucket_uniq'),
+        ]
+
+    @property
+    def avg_fulfillment_seconds(self):
+        return self.fulfillment_seconds / self.delivered_count if self.delivered_count else None
+
+    def __str__(self):
+        return f"{self.granularity} {self.bucket_start}: {self.order_count} orders"
+
+
+class MenuItemRollup(Rollup):
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['granularity', 'bucket_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularity', 'bucket_start', 'menu_item'], name='menu_item_rollup_bucket_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.granularity} {self.bucket_start}: {self.quantity} x {self.menu_item_id}"
+
+
 class AuditLog(models.Model):
     action = models.CharField(max_length=100)
     performed_by = models.ForeignKey(User, null=True, on_delete=models.SET_NULL)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    object_id = models.CharField(max_length=64, null=True, blank=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     details = models.TextField(blank=True, null=True)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['-timestamp'], name='auditlog_ts_idx'),
+            models.Index(fields=['performed_by', '-timestamp'], name='auditlog_user_ts_idx'),
+        ]
 
     def __str__(self):
         return f"{self.timestamp} - {self.action} by {self.performed_by}"
+
+
+class OrderStatusHistoryArchive(models.Model):
+    """
+    Status history rows moved out of OrderStatusHistory by archive_old_records.
+    Keeps the original id; references are not enforced so archived rows never
+    block deletes on the live tables. On PostgreSQL the table is partitioned
+    by month on timestamp (see core.archive.ensure_partitions).
+    """
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(Order, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    status = models.CharField(max_length=20)
+    changed_by = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+'
+    )
+    timestamp = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['-timestamp'], name='history_archive_ts_idx'),
+            models.Index(fields=['order', 'timestamp'], name='history_archive_order_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"Order #{self.order_id} changed to {self.status} at {self.timestamp} (archived)"
+
+
+class AuditLogArchive(models.Model):
+    """
+    AuditLog rows moved out of the live table by archive_old_records.
+    Partitioned by month on PostgreSQL, like OrderStatusHistoryArchive.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    action = models.CharField(max_length=100)
+    performed_by = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+'
+    )
+    object_id = models.CharField(max_length=64, null=True, blank=True)
+    timestamp = models.DateTimeField()
+    details = models.TextField(blank=True, null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['-timestamp'], name='auditlog_archive_ts_idx'),
+            models.Index(fields=['performed_by', '-timestamp'], name='auditlog_archive_user_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.timestamp} - {self.action} by {self.performed_by_id} (archived)"
@@ -53,6 +53,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.metrics.RequestMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -79,6 +80,15 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connection reuse
+# The app is served by uvicorn (ASGI), so connections come from psycopg 3's
+# in-process pool by default. Persistent connections (CONN_MAX_AGE) are per
+# thread, and under ASGI a request may run on a new thread, so they would
+# leak there. Setting DB_POOL=False turns the pool off. Connections are then
+# closed after each request unless DB_CONN_MAX_AGE is set, which is only
+# safe under a WSGI server. Django does not allow both at once.
+DB_POOL = os.environ.get("DB_POOL", "True") == "True"
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -87,10 +97,37 @@ DATABASES = {
         'PASSWORD': os.environ.get('POSTGRES_PASSWORD'),
         'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
         'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get("DB_CONN_MAX_AGE", "0")),
+        'CONN_HEALTH_CHECKS': os.environ.get("DB_CONN_HEALTH_CHECKS", "True") == "True",
+        'OPTIONS': {
+            'pool': {
+                'min_size': int(os.environ.get("DB_POOL_MIN_SIZE", "2")),
+                'max_size': int(os.environ.get("DB_POOL_MAX_SIZE", "10")),
+                'timeout': int(os.environ.get("DB_POOL_TIMEOUT", "10")),
+            },
+        } if DB_POOL else {},
     }
 }
 
 
+# Cache
+# Multi-process deployments need a shared backend (e.g. Redis) so that
+# invalidations reach every worker. The throttle counters always default to
+# Redis, in a database of their own: a per-process cache would give every
+# worker its own limit. The throttle relies on atomic incr/decr, which Redis
+# and Memcached provide; the file and database backends do not.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    },
+    'throttle': {
+        'BACKEND': os.environ.get('THROTTLE_CACHE_BACKEND', 'django.core.cache.backends.redis.RedisCache'),
+        'LOCATION': os.environ.get('THROTTLE_CACHE_LOCATION', 'redis://localhost:6379/1'),
+        'KEY_PREFIX': 'throttle',
+    },
+}
 
 
 # Password validation
@@ -141,21 +178,46 @@ from datetime import timedelta
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.RoleClaimsAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_THROTTLE_CLASSES': [
         'core.throttling.RoleBasedThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
-        'anon': '100/day',
-        'client': '200/hour',
+        'anon': os.environ.get("THROTTLE_RATE_ANON", "100/day"),
+        'client': os.environ.get("THROTTLE_RATE_CLIENT", "200/hour"),
         'user': '300/minute',
-        'waiter': '1500/hour',
-        'kitchen': '1500/hour',
-        'manager': '2000/hour',
+        'waiter': os.environ.get("THROTTLE_RATE_WAITER", "1500/hour"),
+        'kitchen': os.environ.get("THROTTLE_RATE_KITCHEN", "1500/hour"),
+        'manager': os.environ.get("THROTTLE_RATE_MANAGER", "2000/hour"),
     }
 }
 
+MENU_CACHE_TIMEOUT = int(os.environ.get("MENU_CACHE_TIMEOUT", "86400"))
+
+ORDER_EVENTS_BROKER = 'api.orders.events.LocalBroker'
+ORDER_EVENTS_QUEUE_SIZE = int(os.environ.get("ORDER_EVENTS_QUEUE_SIZE", "100"))
+ORDER_EVENTS_KEEPALIVE = int(os.environ.get("ORDER_EVENTS_KEEPALIVE", "15"))
+ORDER_EVENTS_RETRY_MS = 3000
+
+ORDER_SYNC_LIMIT = int(os.environ.get("ORDER_SYNC_LIMIT", "200"))
+ORDER_EXPORT_CHUNK_SIZE = int(os.environ.get("ORDER_EXPORT_CHUNK_SIZE", "2000"))
+ORDER_BULK_STATUS_LIMIT = int(os.environ.get("ORDER_BULK_STATUS_LIMIT", "100"))
+
+SERVER_TIMING_HEADER = os.environ.get("SERVER_TIMING_HEADER", "True") == "True"
+METRICS_FLUSH_INTERVAL = int(os.environ.get("METRICS_FLUSH_INTERVAL", "10"))
+
+ORDER_PAGE_SIZE = int(os.environ.get("ORDER_PAGE_SIZE", "50"))
+ORDER_MAX_PAGE_SIZE = int(os.environ.get("ORDER_MAX_PAGE_SIZE", "200"))
+
+AUDIT_LOG_RETENTION_DAYS = int(os.environ.get("AUDIT_LOG_RETENTION_DAYS", "90"))
+ORDER_HISTORY_RETENTION_DAYS = int(os.environ.get("ORDER_HISTORY_RETENTION_DAYS", "365"))
+ARCHIVE_PAGE_SIZE = int(os.environ.get("ARCHIVE_PAGE_SIZE", "100"))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
@@ -165,24 +227,42 @@ SIMPLE_JWT = {
     'SIGNING_KEY': SECRET_KEY,
     'AUTH_HEADER_TYPES': ('Bearer',),
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
+    'TOKEN_USER_CLASS': 'core.authentication.UserPrincipal',
+    'TOKEN_OBTAIN_SERIALIZER': 'api.users.serializers.RoleTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'api.users.serializers.RoleTokenRefreshSerializer',
 }
 
+AUTH_USER_CACHE_TTL = int(os.environ.get("AUTH_USER_CACHE_TTL", "60"))
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+MENU_IMAGE_THUMBNAIL_SIZE = int(os.environ.get("MENU_IMAGE_THUMBNAIL_SIZE", "320"))
+MENU_IMAGE_DISPLAY_SIZE = int(os.environ.get("MENU_IMAGE_DISPLAY_SIZE", "1280"))
+MENU_IMAGE_QUALITY = int(os.environ.get("MENU_IMAGE_QUALITY", "80"))
+MENU_IMAGE_WORKERS = int(os.environ.get("MENU_IMAGE_WORKERS", "2"))
+
+# Keeps the audit writer out of the test database and the working tree.
+TEST_RUNNER = 'core.testing.TestRunner'
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
     'handlers': {
-        'audit_file': {
+        'audit_queue': {
             'level': 'INFO',
-            'class': 'logging.FileHandler',
-            'filename': os.path.join(BASE_DIR, 'logs/audit.log'),
+            'class': 'core.audit.AuditQueueHandler',
+            'maxsize': int(os.environ.get("AUDIT_QUEUE_SIZE", "10000")),
+            'batch_size': int(os.environ.get("AUDIT_BATCH_SIZE", "500")),
+            'retries': int(os.environ.get("AUDIT_WRITE_RETRIES", "3")),
+            # Set AUDIT_LOG_DATABASE=False or AUDIT_LOG_FILE= (empty) to turn a sink off.
+            'database': os.environ.get("AUDIT_LOG_DATABASE", "True") == "True",
+            'filename': os.environ.get("AUDIT_LOG_FILE", os.path.join(BASE_DIR, 'logs/audit.log')) or None,
         },
     },
     'loggers': {
         'audit': {
-            'handlers': ['audit_file'],
+            'handlers': ['audit_queue'],
             'level': 'INFO',
             'propagate': False,
         },
@@ -0,0 +1,37 @@
+﻿import logging
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from .audit import AuditQueueHandler
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Runs the tests against local resources only:
+
+    - The audit handler neither stores records in AuditLog nor writes the
+      log file. Its background writer uses its own connection, which would
+      race the test transactions and write rows for users those
+      transactions roll back. Records are still queued.
+    - The throttle counters live in a local-memory cache instead of Redis,
+      so the tests need no Redis server and never touch a shared one.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        for handler in logging.getLogger('audit').handlers:
+            if isinstance(handler, AuditQueueHandler):
+                handler.stop()
+                handler.database = False
+                handler.filename = None
+        self.local_caches = override_settings(CACHES={
+            **settings.CACHES,
+            'throttle': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'throttle'},
+        })
+        self.local_caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.local_caches.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,166 @@
+﻿from datetime import datetime, timedelta
+from io import StringIO
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from api.users.serializers import RoleTokenObtainPairSerializer
+from core.archive import month_bounds, partition_name
+from core.models import AuditLog, AuditLogArchive, Order, OrderStatusHistory, OrderStatusHistoryArchive, User
+
+
+class ArchiveCommandTests(TestCase):
+    """
+    archive_old_records moves rows past the retention period and nothing
+    else, and can be run again safely.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='manager', password='x', role=User.Role.MANAGER)
+        cls.order = Order.objects.create(user=cls.user)
+
+    def setUp(self):
+        now = timezone.now()
+        self.old = now - timedelta(days=400)
+        AuditLog.objects.bulk_create(
+            [AuditLog(action='test.old', performed_by=self.user, object_id=str(i), timestamp=self.old) for i in range(3)]
+            + [AuditLog(action='test.new', performed_by=self.user, timestamp=now)]
+        )
+        history = OrderStatusHistory.objects.bulk_create(
+            OrderStatusHistory(order=self.order, status=status, changed_by=self.user)
+            for status in [Order.Status.NEW, Order.Status.IN_PROGRESS, Order.Status.READY]
+        )
+        OrderStatusHistory.objects.filter(id__in=[row.id for row in history[:2]]).update(timestamp=self.old)
+
+    def archive(self, *args):
+        stdout = StringIO()
+        call_command('archive_old_records', '--days', '30', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_moves_old_rows(self):
+        old_logs = list(AuditLog.objects.filter(action='test.old').values('id', 'object_id', 'timestamp'))
+        old_history = list(OrderStatusHistory.objects.filter(timestamp=self.old).values('id', 'status'))
+        self.archive('--chunk-size', '2')
+
+        self.assertFalse(AuditLog.objects.filter(action='test.old').exists())
+        self.assertTrue(AuditLog.objects.filter(action='test.new').exists())
+        self.assertEqual(
+            sorted(AuditLogArchive.objects.filter(action='test.old').values('id', 'object_id', 'timestamp'),
+                   key=lambda row: row['id']),
+            sorted(old_logs, key=lambda row: row['id']),
+        )
+        self.assertEqual(list(OrderStatusHistory.objects.values_list('status', flat=True)), [Order.Status.READY])
+        self.assertEqual(
+            sorted(OrderStatusHistoryArchive.objects.values('id', 'status'), key=lambda row: row['id']),
+            sorted(old_history, key=lambda row: row['id']),
+        )
+
+    def test_rerun(self):
+        self.archive()
+        archived = AuditLogArchive.objects.count(), OrderStatusHistoryArchive.objects.count()
+        output = self.archive()
+        self.assertIn('audit: archived 0 row(s)', output)
+        self.assertIn('history: archived 0 row(s)', output)
+        self.assertEqual((AuditLogArchive.objects.count(), OrderStatusHistoryArchive.objects.count()), archived)
+
+    def test_rows_already_archived(self):
+        # A run interrupted after the insert but before the delete leaves rows in both tables.
+        row = AuditLog.objects.filter(action='test.old').first()
+        AuditLogArchive.objects.create(id=row.id, action=row.action, timestamp=row.timestamp)
+        self.archive('--only', 'audit')
+        self.assertFalse(AuditLog.objects.filter(action='test.old').exists())
+        self.assertEqual(AuditLogArchive.objects.filter(action='test.old').count(), 3)
+
+    def test_dry_run(self):
+        output = self.archive('--dry-run')
+        self.assertIn('audit: 3 row(s)', output)
+        self.assertIn('history: 2 row(s)', output)
+        self.assertFalse(AuditLogArchive.objects.exists())
+
+
+class ArchivePartitionTests(SimpleTestCase):
+
+    def test_month_bounds(self):
+        for value, start, end in [
+            ('2026-03-15T10:30:00+00:00', '2026-03-01T00:00:00+00:00', '2026-04-01T00:00:00+00:00'),
+            ('2026-12-31T23:59:59+00:00', '2026-12-01T00:00:00+00:00', '2027-01-01T00:00:00+00:00'),
+            # The partitions are UTC months whatever the offset of the value.
+            ('2026-07-01T01:00:00+02:00', '2026-06-01T00:00:00+00:00', '2026-07-01T00:00:00+00:00'),
+        ]:
+            with self.subTest(value=value):
+                bounds = month_bounds(datetime.fromisoformat(value))
+                self.assertEqual([bound.isoformat() for bound in bounds], [start, end])
+        self.assertEqual(
+            partition_name('core_auditlogarchive', datetime.fromisoformat('2026-03-01T00:00:00+00:00')),
+            'core_auditlogarchive_202603',
+        )
+
+
+class ArchiveEndpointTests(TestCase):
+    """
+    The archive listings filter by time range and exact fields.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='x', role=User.Role.MANAGER)
+
+    def setUp(self):
+        caches['throttle'].clear()
+        token = RoleTokenObtainPairSerializer.get_token(self.manager).access_token
+        self.headers = {'Authorization': f"Bearer {token}"}
+
+    def get(self, url):
+        return self.client.get(url, headers=self.headers)
+
+    def ids(self, url):
+        response = self.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.json()['results']]
+
+    def test_filters(self):
+        now = timezone.now()
+        times = [now - timedelta(days=days) for days in (30, 20, 10)]
+        other = User.objects.create_user(username='other', password='x')
+        AuditLogArchive.objects.bulk_create([
+            AuditLogArchive(id=1, action='order.list', performed_by=self.manager, timestamp=times[0]),
+            AuditLogArchive(id=2, action='order.create', performed_by=other, object_id='7', timestamp=times[1]),
+            AuditLogArchive(id=3, action='order.list', performed_by=other, timestamp=times[2]),
+        ])
+        order = Order.objects.create(user=other)
+        OrderStatusHistoryArchive.objects.bulk_create([
+            OrderStatusHistoryArchive(id=1, order=order, status='new', changed_by=other, timestamp=times[0]),
+            OrderStatusHistoryArchive(id=2, order=order, status='ready', changed_by=self.manager, timestamp=times[1]),
+            OrderStatusHistoryArchive(id=3, order_id=order.id + 1, status='ready', timestamp=times[2]),
+        ])
+        start = (now - timedelta(days=25)).isoformat().replace('+00:00', 'Z')
+        end = (now - timedelta(days=15)).isoformat().replace('+00:00', 'Z')
+        checks = [
+            ('/api/archive/audit-logs/', [3, 2, 1]),
+            ('/api/archive/audit-logs/?action=order.list', [3, 1]),
+            (f'/api/archive/audit-logs/?performed_by={other.id}', [3, 2]),
+            ('/api/archive/audit-logs/?object_id=7', [2]),
+            (f'/api/archive/audit-logs/?start={start}', [3, 2]),
+            (f'/api/archive/audit-logs/?end={end}', [2, 1]),
+            (f'/api/archive/audit-logs/?start={start}&end={end}&action=order.create', [2]),
+            (f'/api/archive/order-history/?order={order.id}', [2, 1]),
+            ('/api/archive/order-history/?status=ready', [3, 2]),
+            (f'/api/archive/order-history/?changed_by={self.manager.id}', [2]),
+            (f'/api/archive/order-history/?status=ready&start={start}&end={end}', [2]),
+        ]
+        for url, expected in checks:
+            with self.subTest(url=url):
+                self.assertEqual(self.ids(url), expected)
+        self.assertEqual(self.get('/api/archive/audit-logs/?performed_by=abc').status_code, 400)
+
+    def test_invalid_time_range(self):
+        for url in ['/api/archive/audit-logs/', '/api/archive/order-history/']:
+            for param in ['start', 'end']:
+                for value in ['garbage', '2024-13-45T00:00']:
+                    with self.subTest(url=url, param=param, value=value):
+                        response = self.get(f'{url}?{param}={value}')
+                        self.assertEqual(response.status_code, 400)
+                        self.assertIn(param, response.json())
@@ -0,0 +1,266 @@
+﻿from asgiref.sync import async_to_sync
+from django.core.cache import caches
+from django.test import AsyncClient, Client, TestCase, override_settings
+from django.urls import include, path
+from rest_framework import generics, mixins
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from api.menu.cache import get_cached_menu, get_menu_last_modified, get_menu_version
+from api.menu.images import VARIANTS
+from api.menu.querysets import filter_menu, menu_queryset
+from api.menu.serializers import MenuItemSerializer
+from api.menu.views import MenuItemListCreateView
+from api.orders.fields import SparseFieldsMixin
+from api.orders.pagination import OrderCursorPagination
+from api.orders.querysets import ACTIVE_STATUSES, filter_orders, order_queryset, orders_for_user
+from api.orders.serializers import OrderSerializer
+from api.orders.views import KitchenOrderListView, OrderDetailView, OrderListCreateView, WaiterOrderListView
+from api.users.serializers import RoleTokenObtainPairSerializer
+from api.users.views import MeView
+from core.authentication import get_full_user
+from core.conditional import ConditionalGetMixin, make_etag, queryset_validators
+from core.models import MenuCategory, MenuItem, Order, OrderItem, User
+
+COMPARED_HEADERS = ['Content-Type', 'ETag', 'Last-Modified', 'Vary', 'Allow', 'WWW-Authenticate']
+
+
+class SyncTwin:
+    """
+    Renders like the async views, so any difference comes from the request
+    cycle and not from content negotiation.
+    """
+    renderer_classes = MeView.renderer_classes
+    twin_of = None
+
+    def get_view_name(self):
+        return self.twin_of().get_view_name()
+
+    def get_view_description(self, html=False):
+        return self.twin_of().get_view_description(html)
+
+    @property
+    def default_response_headers(self):
+        headers = super().default_response_headers
+        headers['Vary'] = 'Accept'
+        return headers
+
+
+class SyncListView(SyncTwin, SparseFieldsMixin, ConditionalGetMixin, generics.ListAPIView):
+    serializer_class = OrderSerializer
+    pagination_class = OrderCursorPagination
+
+    def get(self, request, *args, **kwargs):
+        return self.conditional_get(request, super().get, *args, **kwargs)
+
+    def get_conditional_validators(self, request):
+        return queryset_validators(request, self.get_queryset())
+
+
+class SyncOrderListView(mixins.CreateModelMixin, SyncListView):
+    twin_of = OrderListCreateView
+    permission_classes = OrderListCreateView.permission_classes
+    filter_backends = OrderListCreateView.filter_backends
+    ordering_fields = OrderListCreateView.ordering_fields
+    ordering = OrderListCreateView.ordering
+
+    def post(self, request, *args, **kwargs):
+        return self.create(request, *args, **kwargs)
+
+    def get_queryset(self):
+        return filter_orders(orders_for_user(self.request.user), self.request.query_params)
+
+
+class SyncKitchenOrderListView(SyncListView):
+    twin_of = KitchenOrderListView
+    permission_classes = KitchenOrderListView.permission_classes
+
+    def get_queryset(self):
+        queryset = order_queryset().filter(status__in=ACTIVE_STATUSES).order_by('-created_at')
+        return filter_orders(queryset, self.request.query_params)
+
+
+class SyncWaiterOrderListView(SyncListView):
+    twin_of = WaiterOrderListView
+    permission_classes = WaiterOrderListView.permission_classes
+
+    def get_queryset(self):
+        queryset = order_queryset().filter(status=Order.Status.READY).order_by('-created_at')
+        return filter_orders(queryset, self.request.query_params)
+
+
+class SyncOrderDetailView(SyncTwin, ConditionalGetMixin, generics.RetrieveUpdateAPIView):
+    twin_of = OrderDetailView
+    queryset = order_queryset()
+    serializer_class = OrderSerializer
+    permission_classes = OrderDetailView.permission_classes
+
+    def get(self, request, *args, **kwargs):
+        return self.conditional_get(request, super().get, *args, **kwargs)
+
+    def get_conditional_validators(self, request):
+        order = self.get_object()
+        return make_etag(request, order.updated_at.isoformat()), order.updated_at
+
+
+class SyncMenuItemListView(SyncTwin, ConditionalGetMixin, mixins.CreateModelMixin, generics.GenericAPIView):
+    twin_of = MenuItemListCreateView
+    queryset = MenuItem.objects.all()
+    serializer_class = MenuItemSerializer
+    permission_classes = MenuItemListCreateView.permission_classes
+
+    def get(self, request, *args, **kwargs):
+        return self.conditional_get(request, self.list, *args, **kwargs)
+
+    def post(self, request, *args, **kwargs):
+        return self.create(request, *args, **kwargs)
+
+    def get_conditional_validators(self, request):
+        return make_etag(request, get_menu_version()), get_menu_last_modified()
+
+    def get_serializer_context(self):
+        # Validates ?image= like MenuItemListCreateView.
+        context = super().get_serializer_context()
+        context['image_variant'] = self.request.query_params.get('image', 'thumbnail')
+        if context['image_variant'] not in VARIANTS + ['original']:
+            raise ValidationError({'image': f"Must be one of: {', '.join(VARIANTS + ['original'])}."})
+        return context
+
+    def list(self, request, *args, **kwargs):
+        context = self.get_serializer_context()
+        queryset = filter_menu(menu_queryset(), request.query_params)
+        return Response(get_cached_menu(request, lambda: MenuItemSerializer(queryset, many=True, context=context).data))
+
+
+class SyncMeView(SyncTwin, APIView):
+    twin_of = MeView
+    permission_classes = MeView.permission_classes
+
+    def get(self, request):
+        user = get_full_user(request.user)
+        return Response({"id": user.id, "username": user.username, "email": user.email, "role": user.role})
+
+
+urlpatterns = [
+    path('api/orders/', SyncOrderListView.as_view()),
+    path('api/orders/<int:pk>/', SyncOrderDetailView.as_view()),
+    path('api/orders/kitchen/', SyncKitchenOrderListView.as_view()),
+    path('api/orders/waiter/', SyncWaiterOrderListView.as_view()),
+    path('api/menu/items/', SyncMenuItemListView.as_view()),
+    path('api/users/me/', SyncMeView.as_view()),
+]
+
+
+class AsyncURLConf:
+    # The real URLs, served by the async views.
+    urlpatterns = [path('', include('core.urls'))]
+
+
+@override_settings(MENU_CACHE_TIMEOUT=0)
+class AsyncViewParityTests(TestCase):
+    """
+    Every request is answered by a sync twin of each async view, by the
+    async view under WSGI and by the async view under ASGI, and the three
+    responses must be identical.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {role: User.objects.create_user(username=role, password='x', role=role) for role, _ in User.Role.choices}
+        cls.other_client = User.objects.create_user(username='other', password='x', role=User.Role.CLIENT)
+        category = MenuCategory.objects.create(name='Mains')
+        cls.menu_items = [
+            MenuItem.objects.create(name='Margherita', description='tomato', price='9.50', category=category),
+            MenuItem.objects.create(name='Lemonade', description='fresh lemon', price='3.00'),
+            MenuItem.objects.create(name='Tiramisu', price='6.25', available=False),
+        ]
+        cls.orders = []
+        for index, status in enumerate(['new', 'in_progress', 'ready', 'delivered', 'new', 'ready']):
+            user = cls.users['client'] if index % 2 == 0 else cls.other_client
+            order = Order.objects.create(user=user, status=status, table_number=str(index), notes='Ünïcode')
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, menu_item=menu_item, quantity=index + 1) for menu_item in cls.menu_items[:2]
+            )
+            cls.orders.append(order)
+
+    def setUp(self):
+        caches['throttle'].clear()
+        self.tokens = {
+            role: f"Bearer {RoleTokenObtainPairSerializer.get_token(user).access_token}"
+            for role, user in self.users.items()
+        }
+
+    def fetch(self, method, url, role=None, headers=None):
+        headers = dict(headers or {})
+        if role is not None:
+            headers['Authorization'] = self.tokens[role]
+        with override_settings(ROOT_URLCONF=__name__):
+            sync = getattr(Client(), method)(url, headers=headers)
+        with override_settings(ROOT_URLCONF=AsyncURLConf):
+            wsgi = getattr(Client(), method)(url, headers=headers)
+            asgi = async_to_sync(getattr(AsyncClient(), method))(url, headers=headers)
+        return sync, wsgi, asgi
+
+    def assertSameResponses(self, method, url, role=None, headers=None):
+        responses = self.fetch(method, url, role, headers)
+        expected = responses[0]
+        for name, response in zip(['WSGI', 'ASGI'], responses[1:]):
+            with self.subTest(method=method, url=url, role=role, via=name):
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.content, expected.content)
+                for header in COMPARED_HEADERS:
+                    self.assertEqual(response.get(header), expected.get(header), header)
+        return expected
+
+    def test_order_lists(self):
+        for role in self.users:
+            self.assertSameResponses('get', '/api/orders/', role)
+        first = self.assertSameResponses('get', '/api/orders/?page_size=2', 'client').json()
+        self.assertSameResponses('get', first['next'].replace('http://testserver', ''), 'client')
+        self.assertSameResponses('get', '/api/orders/?ordering=created_at&status=new', 'manager')
+        self.assertSameResponses('get', '/api/orders/?fields=id,status,items.name', 'manager')
+        self.assertSameResponses('get', '/api/orders/?view=board', 'kitchen')
+        self.assertSameResponses('get', '/api/orders/?fields=bogus', 'manager')
+        self.assertSameResponses('get', '/api/orders/kitchen/', 'kitchen')
+        self.assertSameResponses('get', '/api/orders/kitchen/', 'client')
+        self.assertSameResponses('get', '/api/orders/waiter/', 'waiter')
+        self.assertSameResponses('get', '/api/orders/')
+
+    def test_order_detail(self):
+        own, others = self.orders[0].pk, self.orders[1].pk
+        self.assertSameResponses('get', f'/api/orders/{own}/', 'client')
+        self.assertSameResponses('get', f'/api/orders/{others}/', 'client')
+        self.assertSameResponses('get', f'/api/orders/{others}/', 'manager')
+        self.assertSameResponses('get', '/api/orders/999999/', 'manager')
+        self.assertSameResponses('delete', f'/api/orders/{own}/', 'manager')
+
+    def test_conditional_get(self):
+        for url in ['/api/orders/', f'/api/orders/{self.orders[0].pk}/', '/api/menu/items/']:
+            etag = self.assertSameResponses('get', url, 'client')['ETag']
+            response = self.assertSameResponses('get', url, 'client', {'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304)
+
+    def test_options(self):
+        for role in ['client', 'manager']:
+            self.assertSameResponses('options', '/api/orders/', role)
+            response = self.assertSameResponses('options', f'/api/orders/{self.orders[0].pk}/', role)
+            self.assertEqual(response.status_code, 200)
+            self.assertSameResponses('options', '/api/menu/items/', role)
+            self.assertSameResponses('options', '/api/users/me/', role)
+
+    def test_menu_and_profile(self):
+        self.assertSameResponses('get', '/api/menu/items/')
+        self.assertSameResponses('get', '/api/menu/items/?image=original&search=lemon', 'client')
+        self.assertSameResponses('get', f'/api/menu/items/?category={self.menu_items[0].category_id}&available=true')
+        self.assertSameResponses('get', '/api/menu/items/?image=huge')
+        self.assertSameResponses('get', '/api/users/me/', 'waiter')
+        self.assertSameResponses('get', '/api/users/me/')
+
+    def test_browsable_api_is_not_acceptable(self):
+        # The async views render JSON only; the browsable API is not offered.
+        for url in ['/api/orders/', f'/api/orders/{self.orders[0].pk}/', '/api/orders/kitchen/', '/api/menu/items/']:
+            _, wsgi, asgi = self.fetch('get', url, 'manager', {'Accept': 'text/html'})
+            self.assertEqual(wsgi.status_code, 406)
+            self.assertEqual(asgi.status_code, 406)
+            self.assertEqual(wsgi.content, asgi.content)
@@ -0,0 +1,93 @@
+﻿import logging
+import os
+import tempfile
+import threading
+
+from unittest import mock
+
+from django.db import OperationalError
+from django.test import SimpleTestCase, TestCase
+
+from core.audit import AuditQueueHandler, AuditWriter
+from core.models import AuditLog
+
+
+class Actor:
+    def __init__(self):
+        self.formatted_on = None
+
+    def __str__(self):
+        self.formatted_on = threading.current_thread().name
+        return 'alice (manager)'
+
+
+class AuditQueueHandlerTests(SimpleTestCase):
+    """
+    Audit messages are formatted by the writer thread, not the caller.
+    """
+
+    def test_formatted_on_writer(self):
+        actor = Actor()
+        record = logging.LogRecord('audit', logging.INFO, __file__, 1, "%s %s%s", (actor, 'order.list', ' #3'), None)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'audit.log')
+            handler = AuditQueueHandler(database=False, filename=filename)
+            handler.handle(record)
+            self.assertNotEqual(actor.formatted_on, threading.current_thread().name)
+            handler.close()
+            with open(filename) as f:
+                self.assertIn('INFO alice (manager) order.list #3', f.read())
+        self.assertEqual(actor.formatted_on, 'audit-writer')
+
+
+def make_record(action):
+    record = logging.LogRecord('audit', logging.INFO, __file__, 1, "%s %s%s", ('alice', action, ''), None)
+    record.action, record.actor, record.object_id, record.details = action, None, None, {}
+    return record
+
+
+# close_old_connections() would close the connection holding the test transaction.
+@mock.patch('django.db.close_old_connections')
+class AuditWriterTests(TestCase):
+    """
+    A batch the database rejects is retried and, failing that, reported.
+    """
+
+    def setUp(self):
+        self.writer = AuditWriter(None, 10, retry_delay=0)
+        self.batch = [make_record('test.first'), make_record('test.second')]
+
+    def stored(self):
+        return list(AuditLog.objects.filter(action__startswith='test.').order_by('action').values_list('action', flat=True))
+
+    def test_retried(self, close_old_connections):
+        bulk_create = AuditLog.objects.bulk_create
+        calls = []
+
+        def locked_once(rows):
+            calls.append(len(rows))
+            if len(calls) == 1:
+                raise OperationalError("database is locked")
+            return bulk_create(rows)
+
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=locked_once):
+            self.writer.write_database(self.batch)
+        self.assertEqual(calls, [2, 2])
+        self.assertEqual(self.stored(), ['test.first', 'test.second'])
+        self.assertEqual(self.writer.failed, 0)
+
+    def test_written_row_by_row(self, close_old_connections):
+        save = AuditLog.save
+
+        def reject_first(row, *args, **kwargs):
+            if row.action == 'test.first':
+                raise OperationalError("FOREIGN KEY constraint failed")
+            return save(row, *args, **kwargs)
+
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=OperationalError("FOREIGN KEY constraint failed")), \
+                mock.patch.object(AuditLog, 'save', reject_first), \
+                self.assertLogs('core.audit', logging.ERROR) as logs:
+            self.writer.write_database(self.batch)
+        self.assertEqual(self.stored(), ['test.second'])
+        self.assertEqual(self.writer.failed, 1)
+        self.assertIn("could not store 1 of 2 records", logs.output[0])
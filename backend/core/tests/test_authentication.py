@@ -0,0 +1,98 @@
+﻿from django.core.cache import caches
+from django.test import TestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.users.serializers import RoleTokenObtainPairSerializer
+from core.authentication import UserPrincipal
+from core.models import Order, User
+
+
+class UserPrincipalTests(TestCase):
+    """
+    UserPrincipal exposes the token claims the way the User model does.
+    """
+
+    def test_claims(self):
+        user = User.objects.create_user(username='kitchen', password='x', role=User.Role.KITCHEN)
+        principal = UserPrincipal(RoleTokenObtainPairSerializer.get_token(user).access_token)
+        self.assertEqual(principal.id, user.id)
+        self.assertEqual(principal.pk, user.id)
+        self.assertEqual(principal.username, 'kitchen')
+        self.assertEqual(principal.role, User.Role.KITCHEN)
+        self.assertIs(principal.is_active, True)
+        self.assertEqual(principal, user)
+        self.assertEqual(str(principal), 'kitchen (kitchen)')
+
+
+class RoleClaimsAuthenticationTests(TestCase):
+    """
+    Requests are authenticated from the role claims without loading the
+    User; tokens without claims fall back to the database, and tokens for
+    inactive users or unknown roles are rejected. An access token issued
+    before the user was deactivated stays valid until it expires, but it
+    can no longer be refreshed.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.kitchen = User.objects.create_user(username='kitchen', password='x', role=User.Role.KITCHEN)
+        cls.client_user = User.objects.create_user(username='client', password='x')
+        Order.objects.bulk_create([
+            Order(user=cls.client_user, status=Order.Status.NEW),
+            Order(user=cls.client_user, status=Order.Status.DELIVERED),
+        ])
+
+    def setUp(self):
+        caches['throttle'].clear()
+
+    def get(self, url, token):
+        return self.client.get(url, headers={'Authorization': f"Bearer {token}"})
+
+    def test_role_claims(self):
+        token = RoleTokenObtainPairSerializer.get_token(self.kitchen).access_token
+        # The status counters only; the user is not loaded.
+        with self.assertNumQueries(1):
+            response = self.get('/api/orders/stats/', token)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.get('/api/orders/', token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([order['status'] for order in response.json()['results']], [Order.Status.NEW])
+
+    def test_token_without_role_claims(self):
+        token = AccessToken.for_user(self.kitchen)
+        with self.assertNumQueries(2):
+            response = self.get('/api/orders/stats/', token)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.get('/api/orders/', token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([order['status'] for order in response.json()['results']], [Order.Status.NEW])
+
+    def test_unknown_role(self):
+        token = RoleTokenObtainPairSerializer.get_token(self.kitchen).access_token
+        token['role'] = 'chef'
+        for url in ['/api/orders/stats/', '/api/orders/', '/api/users/me/']:
+            with self.subTest(url=url):
+                response = self.get(url, token)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response.json()['code'], 'unknown_role')
+
+    def test_inactive_user(self):
+        user = User.objects.create_user(username='former', password='x', role=User.Role.WAITER)
+        refresh = RoleTokenObtainPairSerializer.get_token(user)
+        claims = refresh.access_token
+        claims['is_active'] = False
+        tokens = {'role claims': claims, 'no role claims': AccessToken.for_user(user)}
+        user.is_active = False
+        user.save()
+
+        for name, token in tokens.items():
+            for url in ['/api/orders/stats/', '/api/users/me/']:
+                with self.subTest(token=name, url=url):
+                    response = self.get(url, token)
+                    self.assertEqual(response.status_code, 401)
+                    self.assertEqual(response.json()['code'], 'user_inactive')
+
+        response = self.client.post('/api/users/token/refresh/', {'refresh': str(refresh)})
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,54 @@
+﻿from django.core.cache import cache, caches
+from django.test import TestCase
+
+from api.menu.cache import MENU_VERSION_KEY
+from api.users.serializers import RoleTokenObtainPairSerializer
+from core.models import MenuItem, User
+
+
+class MenuCacheVersionTests(TestCase):
+    """
+    Losing the menu version key (eviction, cache restart) must never make
+    an older cached menu current again.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='x', role=User.Role.MANAGER)
+        cls.item = MenuItem.objects.create(name='Soup', price='4.00')
+
+    def setUp(self):
+        cache.clear()
+        caches['throttle'].clear()
+        token = RoleTokenObtainPairSerializer.get_token(self.manager).access_token
+        self.headers = {'Authorization': f"Bearer {token}"}
+
+    def menu_names(self):
+        return [item['name'] for item in self.client.get('/api/menu/items/', headers=self.headers).json()]
+
+    def rename(self, name):
+        response = self.client.patch(
+            f'/api/menu/items/{self.item.pk}/', {'name': name}, content_type='application/json', headers=self.headers
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_renamed_item_after_version_loss(self):
+        self.assertEqual(self.menu_names(), ['Soup'])
+        self.rename('Stew')
+        self.assertEqual(self.menu_names(), ['Stew'])
+
+        cache.delete(MENU_VERSION_KEY)
+        self.assertEqual(self.menu_names(), ['Stew'])
+        self.rename('Broth')
+        self.assertEqual(self.menu_names(), ['Broth'])
+
+    def test_stale_etag_after_version_loss(self):
+        etag = self.client.get('/api/menu/items/', headers=self.headers)['ETag']
+        cache.delete(MENU_VERSION_KEY)
+        self.rename('Stew')
+        cache.delete(MENU_VERSION_KEY)
+
+        response = self.client.get('/api/menu/items/', headers={**self.headers, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([item['name'] for item in response.json()], ['Stew'])
@@ -0,0 +1,77 @@
+﻿from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from core.models import MenuCategory, MenuItem
+
+
+@override_settings(MENU_CACHE_TIMEOUT=0)
+class MenuFilterTests(TestCase):
+    """
+    GET /api/menu/items/ filters by search, category, availability and
+    price. Search is a case-insensitive substring match on the name or the
+    description, name matches first.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        mains = MenuCategory.objects.create(name='Mains')
+        desserts = MenuCategory.objects.create(name='Desserts')
+        cls.categories = {'mains': mains.id, 'desserts': desserts.id}
+        for name, description, price, category, available in [
+            ('Margherita', 'Tomato, mozzarella, basil', '9.50', mains, True),
+            ('Pizza Bianca', 'No tomato; like a MARGHERITA without sauce', '8.00', mains, True),
+            ('Marinara', 'Tomato and garlic', '7.00', mains, False),
+            ('Tomato Soup', 'Roasted tomatoes', '5.50', None, True),
+            ('Tiramisu', 'Mascarpone and coffee', '6.25', desserts, True),
+        ]:
+            MenuItem.objects.create(
+                name=name, description=description, price=price, category=category, available=available,
+            )
+
+    def setUp(self):
+        caches['throttle'].clear()
+
+    def names(self, query):
+        response = self.client.get(f'/api/menu/items/?{query}')
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.json()]
+
+    def test_search(self):
+        cases = {
+            'search=margherita': ['Margherita', 'Pizza Bianca'],
+            'search=MARGHERITA': ['Margherita', 'Pizza Bianca'],
+            'search=%20gHeRi%20': ['Margherita', 'Pizza Bianca'],
+            # Name matches first, then description matches, each by name.
+            'search=tomato': ['Tomato Soup', 'Margherita', 'Marinara', 'Pizza Bianca'],
+            'search=coffee': ['Tiramisu'],
+            'search=lasagne': [],
+        }
+        for query, names in cases.items():
+            with self.subTest(query=query):
+                self.assertEqual(self.names(query), names)
+
+    def test_combined_filters(self):
+        mains, desserts = self.categories['mains'], self.categories['desserts']
+        cases = {
+            f'search=TOMATO&category={mains}': ['Margherita', 'Marinara', 'Pizza Bianca'],
+            f'search=tomato&category={mains}&available=true': ['Margherita', 'Pizza Bianca'],
+            'search=tomato&available=false': ['Marinara'],
+            'search=tomato&max_price=8': ['Tomato Soup', 'Marinara', 'Pizza Bianca'],
+            'search=tomato&min_price=7&max_price=9&available=1': ['Pizza Bianca'],
+            f'search=a&category={mains},{desserts}&min_price=8': ['Margherita', 'Pizza Bianca'],
+        }
+        for query, names in cases.items():
+            with self.subTest(query=query):
+                self.assertEqual(self.names(query), names)
+
+    def test_invalid_filters(self):
+        for query, field in [
+            ('category=mains', 'category'),
+            ('available=maybe', 'available'),
+            ('min_price=cheap', 'min_price'),
+            ('max_price=-1', 'max_price'),
+        ]:
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/menu/items/?search=tomato&{query}')
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(list(response.json()), [field])
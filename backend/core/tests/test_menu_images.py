@@ -0,0 +1,80 @@
+﻿import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from api.menu.images import VARIANTS, process_image
+from api.users.serializers import RoleTokenObtainPairSerializer
+from core.models import MenuItem, User
+
+
+def run_inline(function, *args):
+    # _run() would close the test transaction's connection.
+    process_image(*args)
+
+
+@override_settings(MENU_IMAGE_THUMBNAIL_SIZE=16, MENU_IMAGE_DISPLAY_SIZE=64)
+class MenuImageVariantTests(TestCase):
+    """
+    An uploaded menu image gets a thumbnail and a display variant in WebP
+    and JPEG; uploads that are not images are rejected.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='x', role=User.Role.MANAGER)
+
+    def setUp(self):
+        caches['throttle'].clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        token = RoleTokenObtainPairSerializer.get_token(self.manager).access_token
+        self.headers = {'Authorization': f"Bearer {token}"}
+
+    def upload(self, name, content, content_type):
+        executor = mock.Mock(submit=mock.Mock(side_effect=run_inline))
+        with mock.patch('api.menu.images.get_executor', return_value=executor), \
+                self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/menu/items/', {
+                'name': 'Margherita',
+                'price': '9.50',
+                'image': SimpleUploadedFile(name, content, content_type=content_type),
+            }, headers=self.headers)
+
+    def test_variants(self):
+        buffer = BytesIO()
+        Image.new('RGBA', (200, 100), (200, 40, 40, 128)).save(buffer, 'PNG')
+        response = self.upload('margherita.png', buffer.getvalue(), 'image/png')
+        self.assertEqual(response.status_code, 201, response.content)
+
+        item = MenuItem.objects.get(id=response.json()['id'])
+        self.assertEqual(sorted(item.image_variants), sorted(VARIANTS))
+        sizes = {'thumbnail': (16, 16), 'display': (64, 32)}
+        for variant, formats in item.image_variants.items():
+            self.assertEqual(sorted(formats), ['jpeg', 'webp'])
+            for fmt, name in formats.items():
+                with self.subTest(variant=variant, format=fmt), default_storage.open(name, 'rb') as f:
+                    image = Image.open(f)
+                    self.assertEqual(image.format, fmt.upper())
+                    self.assertEqual(image.size, sizes[variant])
+                    self.assertFalse(image.getexif())
+                    if fmt == 'jpeg':
+                        self.assertEqual(image.mode, 'RGB')
+
+        response = self.client.get('/api/menu/items/', headers=self.headers)
+        [listed] = response.json()
+        self.assertTrue(listed['image'].endswith(item.image_variants['thumbnail']['webp']))
+
+    def test_not_an_image(self):
+        response = self.upload('margherita.png', b'not an image', 'image/png')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.json())
+        self.assertFalse(MenuItem.objects.exists())
@@ -0,0 +1,107 @@
+﻿import os
+import re
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase
+
+from api.users.serializers import RoleTokenObtainPairSerializer
+from core.metrics import Registry, registry
+from core.models import Order, User
+
+
+class RequestMetricsTests(TestCase):
+    """
+    Serializer time is reported apart from the view and the renderer.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='x', role=User.Role.MANAGER)
+        Order.objects.bulk_create(Order(user=cls.manager) for _ in range(3))
+
+    def setUp(self):
+        caches['default'].clear()
+        caches['throttle'].clear()
+        token = RoleTokenObtainPairSerializer.get_token(self.manager).access_token
+        self.headers = {'Authorization': f"Bearer {token}"}
+
+    def serialize_sum(self, route):
+        return registry.snapshot()['histograms'].get(('eatit_http_request_serialize_seconds', 'GET', route), [0.0])[-1]
+
+    def test_server_timing(self):
+        for url, route in [
+            ('/api/orders/', '/api/orders/'),
+            ('/api/orders/manager/', '/api/orders/manager/'),
+            ('/api/orders/changes/', '/api/orders/changes/'),
+            ('/api/menu/items/', '/api/menu/items/'),
+        ]:
+            with self.subTest(url=url):
+                before = self.serialize_sum(route)
+                response = self.client.get(url, headers=self.headers)
+                self.assertEqual(response.status_code, 200)
+                names = re.findall(r'(\w+);dur=', response['Server-Timing'])
+                self.assertEqual(names, ['db', 'view', 'serialize', 'render', 'total'])
+                self.assertGreater(self.serialize_sum(route), before)
+
+
+class ProcessRegistry(Registry):
+    # Stands in for the registry of another process.
+    instance = None
+
+    def __init__(self, instance):
+        super().__init__()
+        self.instance = instance
+
+
+class RegistryFlushTests(TestCase):
+    """
+    Every process flushes into its own slot, off the request path, and the
+    metrics endpoint sums the slots of all live processes.
+    """
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def observe(self, registry, count):
+        for _ in range(count):
+            registry.observe('GET', '/api/orders/', 200, {'eatit_http_request_queries': 1})
+
+    def collect(self):
+        return ProcessRegistry('scraper').collect()[1].get(('GET', '/api/orders/', '200'), 0)
+
+    def test_processes_keep_separate_slots(self):
+        processes = [ProcessRegistry(f'web:{pid}') for pid in range(1, 6)]
+        for count, process in enumerate(processes, start=1):
+            self.observe(process, count)
+            process.flush()
+        self.assertEqual(self.collect(), 15)
+        self.assertEqual(len({process.slot for process in processes}), 5)
+
+        self.observe(processes[0], 10)
+        processes[0].flush()
+        self.assertEqual(self.collect(), 25)
+
+    def test_expired_slot_is_reused(self):
+        first, second = ProcessRegistry('web:1'), ProcessRegistry('web:2')
+        self.observe(first, 1)
+        first.flush()
+        caches['default'].delete(f'metrics:slot:{first.slot}')
+
+        # A new process takes the expired slot; the first moves to another.
+        self.observe(second, 2)
+        second.flush()
+        self.assertEqual(second.slot, 1)
+        first.flush()
+        self.assertNotEqual(first.slot, second.slot)
+        self.assertEqual(self.collect(), 3)
+
+    def test_requests_do_not_flush(self):
+        manager = User.objects.create_user(username='manager', password='x', role=User.Role.MANAGER)
+        token = RoleTokenObtainPairSerializer.get_token(manager).access_token
+        caches['throttle'].clear()
+        with mock.patch.object(registry, 'flush') as flush:
+            response = self.client.get('/api/orders/stats/', headers={'Authorization': f"Bearer {token}"})
+        self.assertEqual(response.status_code, 200)
+        flush.assert_not_called()
+        self.assertEqual(registry.pid, os.getpid())
@@ -0,0 +1,130 @@
+﻿from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import TestCase
+from django.utils import timezone
+
+from api.orders.analytics import DAY, HOUR, truncate_day
+from api.users.serializers import RoleTokenObtainPairSerializer
+from core.models import MenuItem, MenuItemRollup, Order, OrderItem, OrderRollup, OrderStatusHistory, User
+
+
+class OrderRollupTests(TestCase):
+    """
+    The rollups built by rollup_order_analytics, and the analytics endpoint
+    reading them, add up to the totals of the raw orders.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='x', role=User.Role.MANAGER)
+        cls.pizza = MenuItem.objects.create(name='Margherita', price='9.50')
+        cls.drink = MenuItem.objects.create(name='Lemonade', price='3.25')
+
+        cls.day = truncate_day(timezone.now()) - timedelta(days=2)
+        # (hour created, status, hours to delivery, items)
+        plan = [
+            (8, Order.Status.DELIVERED, 1, [(cls.pizza, 2), (cls.drink, 1)]),
+            (8, Order.Status.CANCELLED, None, [(cls.pizza, 5)]),
+            (12, Order.Status.DELIVERED, 2, [(cls.drink, 3)]),
+            (12, Order.Status.READY, None, [(cls.pizza, 1), (cls.drink, 2)]),
+            (23, Order.Status.NEW, None, [(cls.drink, 1)]),
+        ]
+        for hour, status, delivery, items in plan:
+            order = Order.objects.create(user=cls.manager, status=status)
+            created_at = cls.day + timedelta(hours=hour, minutes=20)
+            Order.objects.filter(id=order.id).update(created_at=created_at)
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, menu_item=item, quantity=quantity) for item, quantity in items
+            )
+            if delivery is not None:
+                history = OrderStatusHistory.objects.create(order=order, status=status, changed_by=cls.manager)
+                OrderStatusHistory.objects.filter(id=history.id).update(
+                    timestamp=created_at + timedelta(hours=delivery)
+                )
+        # Another day, left out of the totals.
+        order = Order.objects.create(user=cls.manager)
+        Order.objects.filter(id=order.id).update(created_at=cls.day + timedelta(days=1, hours=1))
+        OrderItem.objects.create(order=order, menu_item=cls.pizza, quantity=4)
+
+    def setUp(self):
+        caches['throttle'].clear()
+
+    def raw_totals(self):
+        orders = Order.objects.filter(created_at__gte=self.day, created_at__lt=self.day + timedelta(days=1))
+        items = defaultdict(lambda: [0, Decimal('0')])
+        for item in OrderItem.objects.filter(order__in=orders.exclude(status=Order.Status.CANCELLED)):
+            items[item.menu_item_id][0] += item.quantity
+            items[item.menu_item_id][1] += item.quantity * item.menu_item.price
+        deliveries = [
+            (history.timestamp - history.order.created_at).total_seconds()
+            for history in OrderStatusHistory.objects.filter(order__in=orders, status=Order.Status.DELIVERED)
+        ]
+        return {
+            'order_count': orders.count(),
+            'cancelled_count': orders.filter(status=Order.Status.CANCELLED).count(),
+            'revenue': sum((revenue for _, revenue in items.values()), Decimal('0')),
+            'delivered_count': len(deliveries),
+            'avg_fulfillment_seconds': sum(deliveries) / len(deliveries),
+            'items': {item: (quantity, revenue) for item, (quantity, revenue) in items.items()},
+        }
+
+    def roll_up(self):
+        call_command('rollup_order_analytics', '--since', self.day.isoformat(), stdout=StringIO())
+
+    def test_daily_rollup_matches_orders(self):
+        self.roll_up()
+        # Rolling up again replaces the buckets instead of adding to them.
+        self.roll_up()
+        expected = self.raw_totals()
+        self.assertEqual(expected['order_count'], 5)
+
+        day = OrderRollup.objects.get(granularity=DAY, bucket_start=self.day)
+        self.assertEqual(day.order_count, expected['order_count'])
+        self.assertEqual(day.cancelled_count, expected['cancelled_count'])
+        self.assertEqual(day.revenue, expected['revenue'])
+        self.assertEqual(day.delivered_count, expected['delivered_count'])
+        self.assertEqual(day.avg_fulfillment_seconds, expected['avg_fulfillment_seconds'])
+        self.assertEqual(
+            {
+                row.menu_item_id: (row.quantity, row.revenue)
+                for row in MenuItemRollup.objects.filter(granularity=DAY, bucket_start=self.day)
+            },
+            expected['items'],
+        )
+
+        hours = OrderRollup.objects.filter(
+            granularity=HOUR, bucket_start__gte=self.day, bucket_start__lt=self.day + timedelta(days=1)
+        )
+        self.assertEqual(hours.count(), 24)
+        self.assertEqual(
+            hours.aggregate(orders=Sum('order_count'), revenue=Sum('revenue')),
+            {'orders': expected['order_count'], 'revenue': expected['revenue']},
+        )
+
+    def test_analytics_endpoint_matches_orders(self):
+        self.roll_up()
+        expected = self.raw_totals()
+
+        token = RoleTokenObtainPairSerializer.get_token(self.manager).access_token
+        response = self.client.get(
+            '/api/orders/analytics/',
+            {'granularity': DAY, 'start': self.day.isoformat(), 'end': (self.day + timedelta(days=1)).isoformat()},
+            headers={'Authorization': f"Bearer {token}"},
+        )
+        self.assertEqual(response.status_code, 200)
+        [bucket] = response.json()['buckets']
+        self.assertEqual(bucket['order_count'], expected['order_count'])
+        self.assertEqual(bucket['cancelled_count'], expected['cancelled_count'])
+        self.assertEqual(Decimal(bucket['revenue']), expected['revenue'])
+        self.assertEqual(bucket['delivered_count'], expected['delivered_count'])
+        self.assertEqual(bucket['avg_fulfillment_seconds'], expected['avg_fulfillment_seconds'])
+        self.assertEqual(
+            {item['menu_item']: (item['quantity'], Decimal(item['revenue'])) for item in bucket['items']},
+            expected['items'],
+        )
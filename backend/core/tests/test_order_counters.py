@@ -0,0 +1,79 @@
+﻿from io import StringIO
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase
+
+from api.users.serializers import RoleTokenObtainPairSerializer
+from core.models import MenuItem, Order, OrderStatusCounter, User
+
+
+class OrderCounterTests(TestCase):
+    """
+    The status counters follow order creation and status changes, and the
+    reconcile command corrects counters that drifted.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='x', role=User.Role.MANAGER)
+        cls.item = MenuItem.objects.create(name='Margherita', price='9.50')
+
+    def setUp(self):
+        caches['throttle'].clear()
+        token = RoleTokenObtainPairSerializer.get_token(self.manager).access_token
+        self.headers = {'Authorization': f"Bearer {token}"}
+
+    def request(self, method, url, data=None):
+        response = getattr(self.client, method)(url, data, content_type='application/json', headers=self.headers)
+        self.assertLess(response.status_code, 300, response.content)
+        return response
+
+    def actual_counts(self):
+        return dict(Order.objects.values_list('status').annotate(count=Count('id')).order_by())
+
+    def stored_counts(self):
+        return dict(OrderStatusCounter.objects.filter(count__gt=0).values_list('status', 'count'))
+
+    def create_orders(self, count):
+        return [
+            self.request('post', '/api/orders/', {'items': [{'menu_item': self.item.id, 'quantity': 1}]}).json()['id']
+            for _ in range(count)
+        ]
+
+    def test_counters_follow_orders(self):
+        first, second, third, fourth = self.create_orders(4)
+        self.assertEqual(self.stored_counts(), {Order.Status.NEW: 4})
+
+        self.request('patch', f'/api/orders/{first}/', {'status': Order.Status.IN_PROGRESS})
+        self.request('patch', f'/api/orders/{second}/', {'status': Order.Status.CANCELLED})
+        self.request('patch', '/api/orders/status/', {'ids': [first, third, fourth], 'status': Order.Status.IN_PROGRESS})
+        self.request('patch', '/api/orders/status/', {'ids': [first, third], 'status': Order.Status.READY})
+        self.request('patch', f'/api/orders/{first}/', {'status': Order.Status.DELIVERED})
+
+        self.assertEqual(self.stored_counts(), self.actual_counts())
+        self.assertEqual(self.request('get', '/api/orders/stats/').json(), self.actual_counts())
+
+    def test_reconcile(self):
+        self.create_orders(3)
+        OrderStatusCounter.objects.filter(status=Order.Status.NEW).update(count=7)
+        OrderStatusCounter.objects.filter(status=Order.Status.READY).delete()
+
+        stdout = StringIO()
+        call_command('reconcile_order_counters', '--dry-run', stdout=stdout)
+        self.assertIn("new: stored 7, actual 3", stdout.getvalue())
+        self.assertIn("ready: stored None, actual 0", stdout.getvalue())
+        self.assertEqual(OrderStatusCounter.objects.get(status=Order.Status.NEW).count, 7)
+
+        stdout = StringIO()
+        call_command('reconcile_order_counters', stdout=stdout)
+        self.assertIn("Corrected 2 counter(s).", stdout.getvalue())
+        self.assertEqual(self.stored_counts(), self.actual_counts())
+        self.assertEqual(
+            set(OrderStatusCounter.objects.values_list('status', flat=True)), set(Order.Status.values),
+        )
+
+        stdout = StringIO()
+        call_command('reconcile_order_counters', stdout=stdout)
+        self.assertIn("in sync", stdout.getvalue())
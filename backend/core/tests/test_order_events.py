@@ -0,0 +1,99 @@
+﻿import json
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from api.orders.events import ORDER_CREATED, ORDER_STATUS_CHANGED, LocalBroker, event_stream, publish_order_event
+from core.models import Order, User
+
+
+def order_event(order_id, status, previous_status=None, user=1):
+    return {
+        'type': ORDER_STATUS_CHANGED if previous_status else ORDER_CREATED,
+        'order': {'id': order_id, 'user': user, 'status': status},
+        'previous_status': previous_status,
+    }
+
+
+def parse(message):
+    fields = dict(line.split(': ', 1) for line in message.strip().split('\n'))
+    return fields['event'], json.loads(fields['data'])
+
+
+class EventStreamTests(SimpleTestCase):
+    """
+    The local broker fans events out to the streams of this process, each
+    filtered like the order lists of its user's role.
+    """
+
+    async def open(self, broker, role, pk=1):
+        stream = event_stream(User(pk=pk, username=role, role=role), broker)
+        self.assertTrue((await anext(stream)).startswith('retry: '))
+        return stream
+
+    async def test_publish(self):
+        broker = LocalBroker(queue_size=10)
+        first, second = await self.open(broker, 'manager'), await self.open(broker, 'manager')
+        broker.publish(order_event(1, 'new'))
+        for stream in [first, second]:
+            event, data = parse(await anext(stream))
+            self.assertEqual(event, ORDER_CREATED)
+            self.assertEqual(data, {'order': {'id': 1, 'user': 1, 'status': 'new'}, 'previous_status': None})
+        await first.aclose()
+        await second.aclose()
+        self.assertFalse(broker._subscribers)
+
+    async def test_role_filtering(self):
+        broker = LocalBroker(queue_size=10)
+        streams = {
+            'client': await self.open(broker, 'client', pk=1),
+            'kitchen': await self.open(broker, 'kitchen'),
+            'waiter': await self.open(broker, 'waiter'),
+            'manager': await self.open(broker, 'manager'),
+        }
+        events = [
+            order_event(1, 'new', user=2),
+            order_event(2, 'in_progress', 'new'),
+            order_event(3, 'ready', 'in_progress'),
+            order_event(4, 'delivered', 'ready'),
+            order_event(5, 'cancelled', 'delivered', user=2),
+        ]
+        for event in events:
+            broker.publish(event)
+        # A last event every stream sees ends each read.
+        broker.publish(order_event(6, 'ready', 'in_progress', user=1))
+
+        expected = {
+            'client': [2, 3, 4, 6],
+            'kitchen': [1, 2, 3, 6],
+            'waiter': [3, 4, 6],
+            'manager': [1, 2, 3, 4, 5, 6],
+        }
+        for role, stream in streams.items():
+            with self.subTest(role=role):
+                received = []
+                while not received or received[-1] != 6:
+                    received.append(parse(await anext(stream))[1]['order']['id'])
+                self.assertEqual(received, expected[role])
+            await stream.aclose()
+
+    async def test_overflow(self):
+        broker = LocalBroker(queue_size=2)
+        stream = await self.open(broker, 'manager')
+        for order_id in range(1, 5):
+            broker.publish(order_event(order_id, 'new'))
+        messages = [message async for message in stream]
+        self.assertEqual([parse(message)[0] for message in messages], [ORDER_CREATED, ORDER_CREATED, 'resync'])
+        self.assertEqual([parse(message)[1].get('order', {}).get('id') for message in messages], [1, 2, None])
+        self.assertFalse(broker._subscribers)
+
+
+class PublishOrderEventTests(TestCase):
+
+    def test_published_on_commit(self):
+        published = []
+        with mock.patch('api.orders.events.get_broker', return_value=mock.Mock(publish=published.append)):
+            with self.captureOnCommitCallbacks(execute=True):
+                publish_order_event(ORDER_STATUS_CHANGED, {'id': 7, 'user': 1, 'status': Order.Status.READY}, 'new')
+                self.assertEqual(published, [])
+        self.assertEqual(published, [order_event(7, Order.Status.READY, 'new')])
@@ -0,0 +1,99 @@
+﻿import csv
+import io
+import json
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from api.orders.export import CSV_COLUMNS
+from api.users.serializers import RoleTokenObtainPairSerializer
+from core.models import MenuItem, Order, OrderItem, User
+
+
+@override_settings(ORDER_EXPORT_CHUNK_SIZE=2)
+class OrderExportTests(TestCase):
+    """
+    GET /api/orders/export/ streams the filtered orders as CSV or NDJSON
+    from both the sync and the async request path.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='x', role=User.Role.MANAGER)
+        pizza = MenuItem.objects.create(name='Margherita', price='9.50')
+        drink = MenuItem.objects.create(name='Lemonade', price='3.00')
+        statuses = [Order.Status.NEW, Order.Status.READY, Order.Status.NEW, Order.Status.DELIVERED, Order.Status.NEW]
+        cls.orders = [Order.objects.create(user=cls.manager, status=status, table_number=4) for status in statuses]
+        OrderItem.objects.bulk_create([
+            OrderItem(order=cls.orders[0], menu_item=pizza, quantity=2, comment='Extra basil, "fresh"'),
+            OrderItem(order=cls.orders[0], menu_item=drink, quantity=1),
+            OrderItem(order=cls.orders[1], menu_item=drink, quantity=3),
+            OrderItem(order=cls.orders[4], menu_item=pizza, quantity=1),
+        ])
+        # orders[2] and orders[3] have no items.
+
+    def setUp(self):
+        caches['throttle'].clear()
+        token = RoleTokenObtainPairSerializer.get_token(self.manager).access_token
+        self.headers = {'Authorization': f"Bearer {token}"}
+
+    def export(self, client, query):
+        response = client.get(f'/api/orders/export/?{query}', headers=self.headers)
+        if response.streaming:
+            content = b''.join(response.streaming_content)
+        else:
+            content = response.content
+        return response, content.decode()
+
+    async def aexport(self, query):
+        response = await self.async_client.get(f'/api/orders/export/?{query}', headers=self.headers)
+        return response, b''.join([chunk async for chunk in response.streaming_content]).decode()
+
+    def check_csv(self, response, content):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0], CSV_COLUMNS)
+        rows = [dict(zip(CSV_COLUMNS, row)) for row in rows[1:]]
+        # One row per item, one row for each order without items.
+        self.assertEqual(
+            [(int(row['order_id']), row['menu_item_name']) for row in rows],
+            [
+                (self.orders[0].id, 'Margherita'), (self.orders[0].id, 'Lemonade'),
+                (self.orders[1].id, 'Lemonade'), (self.orders[2].id, ''),
+                (self.orders[3].id, ''), (self.orders[4].id, 'Margherita'),
+            ],
+        )
+        self.assertEqual(rows[0]['comment'], 'Extra basil, "fresh"')
+        self.assertEqual(rows[0]['unit_price'], '9.50')
+        self.assertEqual(rows[0]['quantity'], '2')
+        self.assertEqual(rows[0]['status'], Order.Status.NEW)
+        self.assertEqual(rows[3]['item_id'], '')
+
+    def check_ndjson(self, response, content):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        lines = content.splitlines()
+        self.assertEqual(len(lines), 3)
+        orders = [json.loads(line) for line in lines]
+        self.assertEqual([order['id'] for order in orders], [self.orders[0].id, self.orders[2].id, self.orders[4].id])
+        self.assertEqual([len(order['items']) for order in orders], [2, 0, 1])
+
+    def test_csv(self):
+        self.check_csv(*self.export(self.client, 'format=csv'))
+
+    def test_ndjson(self):
+        self.check_ndjson(*self.export(self.client, 'format=ndjson&status=new'))
+
+    async def test_async_csv(self):
+        self.check_csv(*await self.aexport('format=csv'))
+
+    async def test_async_ndjson(self):
+        self.check_ndjson(*await self.aexport('format=ndjson&status=new'))
+
+    def test_invalid_filters(self):
+        for query in ['format=csv&status=lost', 'format=ndjson&created_after=yesterday']:
+            with self.subTest(query=query):
+                response, content = self.export(self.client, query)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(list(json.loads(content)), [query.split('&')[1].split('=')[0]])
@@ -0,0 +1,56 @@
+﻿from django.core.cache import caches
+from django.test import TestCase
+
+from api.users.serializers import RoleTokenObtainPairSerializer
+from core.models import Order, User
+
+
+class OrderQueryParameterTests(TestCase):
+    """
+    Malformed query parameters on the order endpoints are answered with
+    400, never with a server error.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='x', role=User.Role.MANAGER)
+        Order.objects.bulk_create(Order(user=cls.manager) for _ in range(3))
+
+    def setUp(self):
+        caches['throttle'].clear()
+        token = RoleTokenObtainPairSerializer.get_token(self.manager).access_token
+        self.headers = {'Authorization': f"Bearer {token}"}
+
+    def get(self, url):
+        return self.client.get(url, headers=self.headers)
+
+    def test_list_filters(self):
+        checks = [
+            ('/api/orders/?', ['created_after', 'created_before']),
+            ('/api/orders/manager/?', ['created_after', 'created_before']),
+            ('/api/orders/export/?format=ndjson&', ['created_after', 'created_before']),
+            ('/api/orders/analytics/?', ['start', 'end']),
+        ]
+        for url, params in checks:
+            for param in params:
+                for value in ['garbage', '2026-13-45T00:00:00']:
+                    with self.subTest(url=url, param=param, value=value):
+                        response = self.get(f'{url}{param}={value}')
+                        self.assertEqual(response.status_code, 400)
+        for url in ['/api/orders/', '/api/orders/manager/']:
+            with self.subTest(url=url, param='status'):
+                response = self.get(f'{url}?status=shipped')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('status', response.json())
+        response = self.get('/api/orders/manager/?status=new&created_after=2000-01-01T00:00:00Z')
+        self.assertEqual(len(response.json()['results']), 3)
+
+    def test_changes_limit(self):
+        for limit in ['-5', '0', 'ten', '1.5']:
+            with self.subTest(limit=limit):
+                response = self.get(f'/api/orders/changes/?limit={limit}')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('limit', response.json())
+        response = self.get('/api/orders/changes/?limit=2')
+        self.assertEqual(len(response.json()['orders']), 2)
+        self.assertTrue(response.json()['has_more'])
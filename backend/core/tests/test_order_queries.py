@@ -0,0 +1,63 @@
+﻿from django.core.cache import caches
+from django.test import TestCase
+
+from api.users.serializers import RoleTokenObtainPairSerializer
+from core.models import MenuItem, Order, OrderItem, User
+
+
+class OrderQueryCountTests(TestCase):
+    """
+    Order reads take a fixed number of queries however many orders and
+    items there are: the conditional GET aggregate, the orders, and one
+    prefetch of their items.
+    """
+    N = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {role: User.objects.create_user(username=role, password='x', role=role) for role, _ in User.Role.choices}
+        cls.menu_items = [MenuItem.objects.create(name=f"Dish {i}", price='5.00') for i in range(3)]
+
+    def setUp(self):
+        caches['throttle'].clear()
+
+    def add_orders(self, count):
+        statuses = [Order.Status.NEW, Order.Status.IN_PROGRESS, Order.Status.READY]
+        orders = Order.objects.bulk_create(
+            Order(user=self.users['client'], status=statuses[i % len(statuses)]) for i in range(count)
+        )
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, menu_item=menu_item, quantity=1) for order in orders for menu_item in self.menu_items
+        )
+        return orders
+
+    def get(self, role, url, queries):
+        token = RoleTokenObtainPairSerializer.get_token(self.users[role]).access_token
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, headers={'Authorization': f"Bearer {token}"})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_list_queries_do_not_grow_with_orders(self):
+        endpoints = [
+            ('client', '/api/orders/'),
+            ('manager', '/api/orders/manager/'),
+            ('kitchen', '/api/orders/kitchen/'),
+            ('waiter', '/api/orders/waiter/'),
+        ]
+        # N orders, then 2N.
+        for total in [self.N, 2 * self.N]:
+            self.add_orders(self.N)
+            for role, url in endpoints:
+                with self.subTest(url=url, orders=total):
+                    response = self.get(role, url, 3)
+                    self.assertTrue(all(len(order['items']) == 3 for order in response.json()['results']))
+
+    def test_detail_queries_do_not_grow_with_items(self):
+        order = self.add_orders(1)[0]
+        self.get('client', f'/api/orders/{order.pk}/', 2)
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, menu_item=menu_item, quantity=2) for menu_item in self.menu_items
+        )
+        response = self.get('client', f'/api/orders/{order.pk}/', 2)
+        self.assertEqual(len(response.json()['items']), 6)
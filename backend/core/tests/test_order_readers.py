@@ -0,0 +1,43 @@
+﻿from django.test import TestCase
+
+from api.orders.fields import DEFAULT_ITEM_FIELDS, ORDER_FIELDS, VIEWS, project_orders
+from api.orders.querysets import order_queryset
+from api.orders.readers import order_rows, serialize_orders
+from api.orders.serializers import OrderSerializer
+from core.models import MenuItem, Order, OrderItem, User
+
+
+class OrderReaderTests(TestCase):
+    """
+    serialize_orders() returns what OrderSerializer returns for the same
+    fields, so the two definitions of the order fields cannot drift apart.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='client', password='x')
+        menu_items = [MenuItem.objects.create(name=f"Dish {i}", price='5.00') for i in range(2)]
+        orders = Order.objects.bulk_create([
+            Order(user=user, table_number='4', notes='No onions'),
+            Order(user=None, status=Order.Status.READY),
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=orders[0], menu_item=menu_items[0], quantity=2, comment='Well done'),
+            OrderItem(order=orders[0], menu_item=menu_items[1], quantity=1),
+        ])
+
+    def test_matches_serializer(self):
+        for order_fields, item_fields in [
+            (ORDER_FIELDS, DEFAULT_ITEM_FIELDS),
+            (ORDER_FIELDS, ['id', 'menu_item', 'name', 'quantity', 'comment']),
+            VIEWS['board'],
+            (['user', 'notes'], DEFAULT_ITEM_FIELDS),
+        ]:
+            with self.subTest(order_fields=order_fields, item_fields=item_fields):
+                queryset = order_queryset().order_by('id')
+                expected = OrderSerializer(
+                    project_orders(queryset, order_fields, item_fields), many=True,
+                    fields=order_fields, item_fields=item_fields,
+                ).data
+                rows = list(order_rows(queryset, order_fields))
+                self.assertEqual(serialize_orders(rows, order_fields, item_fields), expected)
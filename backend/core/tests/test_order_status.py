@@ -0,0 +1,131 @@
+﻿from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase
+from django.utils import timezone
+
+from api.orders.views import OrderDetailView
+from api.users.serializers import RoleTokenObtainPairSerializer
+from core.models import Order, OrderStatusCounter, OrderStatusHistory, User
+
+
+class BulkStatusTests(TestCase):
+    """
+    PATCH /api/orders/status/ only moves orders still in the status they
+    were read with.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='x', role=User.Role.MANAGER)
+
+    def setUp(self):
+        caches['throttle'].clear()
+        token = RoleTokenObtainPairSerializer.get_token(self.manager).access_token
+        self.headers = {'Authorization': f"Bearer {token}"}
+        self.orders = Order.objects.bulk_create(
+            Order(user=self.manager, status=status)
+            for status in [Order.Status.NEW, Order.Status.IN_PROGRESS, Order.Status.IN_PROGRESS, Order.Status.READY]
+        )
+
+    def patch(self, ids, status):
+        return self.client.patch(
+            '/api/orders/status/', {'ids': ids, 'status': status},
+            content_type='application/json', headers=self.headers,
+        )
+
+    def test_rejections(self):
+        new, first, second, ready = (order.id for order in self.orders)
+        missing = ready + 1
+        response = self.patch([new, first, second, ready, missing], Order.Status.READY)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['moved'], [first, second])
+        self.assertEqual(response.json()['rejected'], [
+            {'id': new, 'reason': 'invalid_transition'},
+            {'id': ready, 'reason': 'unchanged'},
+            {'id': missing, 'reason': 'not_found'},
+        ])
+
+    def test_concurrent_change_is_a_conflict(self):
+        new, first, second, ready = (order.id for order in self.orders)
+        now = timezone.now
+
+        def change_first():
+            # Another request cancels the order after it was read.
+            Order.objects.filter(id=first).update(status=Order.Status.CANCELLED)
+            return now()
+
+        with mock.patch('api.orders.status.timezone.now', side_effect=change_first):
+            response = self.patch([first, second], Order.Status.READY)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['moved'], [second])
+        self.assertEqual(response.json()['rejected'], [{'id': first, 'reason': 'conflict'}])
+        self.assertEqual(Order.objects.get(id=first).status, Order.Status.CANCELLED)
+        self.assertEqual(
+            list(OrderStatusHistory.objects.filter(status=Order.Status.READY).values_list('order_id', flat=True)),
+            [second],
+        )
+
+
+class ChangeStatusTests(TestCase):
+    """
+    PATCH /api/orders/<id>/ answers 409 and writes nothing when the order
+    left the status it was read with before the UPDATE.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username='manager', password='x', role=User.Role.MANAGER)
+
+    def setUp(self):
+        caches['throttle'].clear()
+        token = RoleTokenObtainPairSerializer.get_token(self.manager).access_token
+        self.headers = {'Authorization': f"Bearer {token}"}
+        self.order = Order.objects.create(user=self.manager, status=Order.Status.IN_PROGRESS)
+
+    def patch(self, data):
+        return self.client.patch(
+            f'/api/orders/{self.order.id}/', data, content_type='application/json', headers=self.headers,
+        )
+
+    def counters(self):
+        return dict(OrderStatusCounter.objects.values_list('status', 'count'))
+
+    def test_concurrent_change_is_a_conflict(self):
+        counters = self.counters()
+        get_object = OrderDetailView.get_object
+
+        def read_then_cancel(view):
+            order = get_object(view)
+            # Another request cancels the order after this one read it.
+            Order.objects.filter(id=order.id).update(status=Order.Status.CANCELLED)
+            return order
+
+        with mock.patch.object(OrderDetailView, 'get_object', read_then_cancel):
+            response = self.patch({'status': Order.Status.READY})
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Order.objects.get(id=self.order.id).status, Order.Status.CANCELLED)
+        self.assertFalse(OrderStatusHistory.objects.exists())
+        self.assertEqual(self.counters(), counters)
+
+    def test_expected_status_mismatch_is_a_conflict(self):
+        counters = self.counters()
+        response = self.patch({'status': Order.Status.IN_PROGRESS, 'expected_status': Order.Status.NEW})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Order.objects.get(id=self.order.id).status, Order.Status.IN_PROGRESS)
+        self.assertFalse(OrderStatusHistory.objects.exists())
+        self.assertEqual(self.counters(), counters)
+
+    def test_status_change(self):
+        counters = self.counters()
+        response = self.patch({'status': Order.Status.READY})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            list(OrderStatusHistory.objects.values_list('order_id', 'status')),
+            [(self.order.id, Order.Status.READY)],
+        )
+        counters[Order.Status.IN_PROGRESS] -= 1
+        counters[Order.Status.READY] += 1
+        self.assertEqual(self.counters(), counters)
@@ -0,0 +1,63 @@
+﻿from django.core.cache import caches
+from django.test import TestCase
+
+from api.orders.status import change_status
+from api.users.serializers import RoleTokenObtainPairSerializer
+from core.models import Order, User
+
+
+class OrderChangesTests(TestCase):
+    """
+    GET /api/orders/changes/ sends tombstones only for orders that left the
+    caller's view, never for orders it could not see.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.kitchen = User.objects.create_user(username='kitchen', password='x', role=User.Role.KITCHEN)
+        cls.client_user = User.objects.create_user(username='client', password='x')
+
+    def setUp(self):
+        caches['throttle'].clear()
+        statuses = [Order.Status.NEW, Order.Status.IN_PROGRESS, Order.Status.READY, Order.Status.READY]
+        self.new, self.cooking, self.ready, self.other_ready = Order.objects.bulk_create(
+            Order(user=self.client_user, status=status) for status in statuses
+        )
+
+    def sync(self, user, cursor=None):
+        token = RoleTokenObtainPairSerializer.get_token(user).access_token
+        url = '/api/orders/changes/' + (f'?cursor={cursor}' if cursor else '')
+        response = self.client.get(url, headers={'Authorization': f"Bearer {token}"})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_kitchen_tombstones(self):
+        initial = self.sync(self.kitchen)
+        self.assertEqual({order['id'] for order in initial['orders']}, {self.new.id, self.cooking.id})
+
+        # Leaves the kitchen view.
+        change_status(self.cooking, Order.Status.READY, self.kitchen)
+        # Never in the kitchen view.
+        change_status(self.ready, Order.Status.DELIVERED, self.kitchen)
+        Order.objects.filter(id=self.other_ready.id).update(notes='Window seat', updated_at=self.ready.updated_at)
+        # Created and cancelled since the last sync.
+        unseen = Order.objects.create(user=self.client_user)
+        change_status(unseen, Order.Status.CANCELLED, self.kitchen)
+        # Still in the kitchen view.
+        change_status(self.new, Order.Status.IN_PROGRESS, self.kitchen)
+
+        changes = self.sync(self.kitchen, initial['cursor'])
+        self.assertEqual([order['id'] for order in changes['orders']], [self.new.id])
+        self.assertEqual(changes['tombstones'], [{'id': self.cooking.id, 'status': Order.Status.READY}])
+
+        # Changes after a tombstone are not sent again.
+        change_status(self.cooking, Order.Status.DELIVERED, self.kitchen)
+        self.assertEqual(self.sync(self.kitchen, changes['cursor'])['tombstones'], [])
+
+    def test_client_has_no_tombstones(self):
+        initial = self.sync(self.client_user)
+        self.assertEqual(len(initial['orders']), 4)
+        change_status(self.ready, Order.Status.DELIVERED, self.kitchen)
+        changes = self.sync(self.client_user, initial['cursor'])
+        self.assertEqual([order['id'] for order in changes['orders']], [self.ready.id])
+        self.assertEqual(changes['tombstones'], [])
@@ -0,0 +1,107 @@
+﻿from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.settings import api_settings
+from rest_framework.test import APIRequestFactory
+
+from api.users.serializers import RoleTokenObtainPairSerializer
+from core.models import User
+from core.throttling import RoleBasedThrottle
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class SlidingWindowTests(SimpleTestCase):
+    """
+    RoleBasedThrottle at 3/min: the previous window counts in proportion to
+    how much of it still overlaps the last minute.
+    """
+    START = 6000.0  # The start of a window.
+
+    def setUp(self):
+        caches['throttle'].clear()
+        self.clock = Clock(self.START)
+        self.request = APIRequestFactory().get('/api/orders/')
+        self.request.user = User(pk=1, username='kitchen', role=User.Role.KITCHEN)
+
+    def allow(self):
+        self.throttle = RoleBasedThrottle()
+        self.throttle.timer = self.clock
+        self.throttle.get_rate = lambda: '3/min'
+        return self.throttle.allow_request(self.request, None)
+
+    def test_limit(self):
+        self.assertEqual([self.allow() for _ in range(4)], [True, True, True, False])
+        self.clock.now += 59
+        self.assertFalse(self.allow())
+
+    def test_rollover(self):
+        for _ in range(3):
+            self.allow()
+        # All of the previous window still overlaps.
+        self.clock.now = self.START + 60
+        self.assertFalse(self.allow())
+        # Half of it does: 1.5 + 1 requests fit, 1.5 + 2 do not.
+        self.clock.now = self.START + 90
+        self.assertEqual([self.allow(), self.allow()], [True, False])
+        # Two windows later the full limit is back.
+        self.clock.now = self.START + 180
+        self.assertEqual([self.allow() for _ in range(4)], [True, True, True, False])
+
+    def test_rejections_do_not_count(self):
+        for _ in range(10):
+            self.allow()
+        self.clock.now = self.START + 120
+        self.assertEqual([self.allow() for _ in range(4)], [True, True, True, False])
+
+    def test_wait(self):
+        for _ in range(3):
+            self.allow()
+        self.allow()
+        # The rest of the current window.
+        self.assertEqual(self.throttle.wait(), 60)
+        self.clock.now = self.START + 60
+        self.allow()
+        # Until the previous window's weight drops from 3 to 2.
+        self.assertAlmostEqual(self.throttle.wait(), 20)
+        self.clock.now = self.START + 80
+        self.assertTrue(self.allow())
+
+    def test_other_clients(self):
+        for _ in range(4):
+            self.allow()
+        self.request.user = User(pk=2, username='kitchen2', role=User.Role.KITCHEN)
+        self.assertTrue(self.allow())
+
+
+class ThrottleResponseTests(TestCase):
+    """
+    Sync and async views answer over-limit requests with 429 and Retry-After.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.kitchen = User.objects.create_user(username='kitchen', password='x', role=User.Role.KITCHEN)
+
+    def setUp(self):
+        caches['throttle'].clear()
+        token = RoleTokenObtainPairSerializer.get_token(self.kitchen).access_token
+        self.headers = {'Authorization': f"Bearer {token}"}
+
+    def test_retry_after(self):
+        rates = {**api_settings.DEFAULT_THROTTLE_RATES, 'kitchen': '2/min'}
+        for url in ['/api/orders/stats/', '/api/orders/kitchen/']:
+            with self.subTest(url=url), override_settings(REST_FRAMEWORK={
+                **api_settings.user_settings, 'DEFAULT_THROTTLE_RATES': rates,
+            }):
+                caches['throttle'].clear()
+                statuses = [self.client.get(url, headers=self.headers).status_code for _ in range(2)]
+                self.assertEqual(statuses, [200, 200])
+                response = self.client.get(url, headers=self.headers)
+                self.assertEqual(response.status_code, 429)
+                self.assertTrue(1 <= int(response['Retry-After']) <= 60)
@@ -1,18 +1,127 @@
-﻿from rest_framework.throttling import UserRateThrottle
+﻿import time
 
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
+
+ROLE_SCOPES = {'manager', 'waiter', 'kitchen'}
+
+
+class SlidingWindowRateThrottle(BaseThrottle):
+    """
+    Sliding-window counter. Each client has two integers in the cache, one
+    for the current fixed window and one for the previous. The previous count
+    is weighted by how much of it still overlaps the sliding window. A request
+    costs one atomic incr, so with a shared backend (Redis, Memcached) the
+    limit holds across worker processes. Memory does not grow with the rate.
+    """
+    cache_alias = 'throttle'
+    key_prefix = 'throttle'
+    scope = None
+    timer = time.time
+    parse_rate = SimpleRateThrottle.parse_rate
+
+    def get_scope(self, request, view):
+        return self.scope
+
+    def get_rate(self):
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
 
-class RoleBasedThrottle(UserRateThrottle):
     def get_cache_key(self, request, view):
-        if not request.user or not request.user.is_authenticated:
-            self.scope = 'anon'
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
         else:
-            role = request.user.role
-            if role == 'manager':
-                self.scope = 'manager'
-            elif role == 'waiter':
-                self.scope = 'waiter'
-            elif role == 'kitchen':
-                self.scope = 'kitchen'
-            else:
-                self.scope = 'client'
-        return super().get_cache_key(request, view)
+            ident = self.get_ident(request)
+        return f"{self.key_prefix}:{self.scope}:{ident}"
+
+    def _windows(self, request, view):
+        """
+        Keys of the current and previous windows and the offset into the
+        current one, or None when the scope is not throttled.
+        """
+        self.scope = self.get_scope(request, view)
+        rate = self.get_rate()
+        if rate is None:
+            return None
+        self.num_requests, self.duration = self.parse_rate(rate)
+
+        key = self.get_cache_key(request, view)
+        window, offset = divmod(self.timer(), self.duration)
+        return f"{key}:{int(window)}", f"{key}:{int(window) - 1}", offset
+
+    def _admits(self, previous, current, offset):
+        weight = 1 - offset / self.duration
+        if previous * weight + current <= self.num_requests:
+            return True
+        self.wait_time = self._wait_time(previous, current - 1, offset)
+        return False
+
+    def allow_request(self, request, view):
+        windows = self._windows(request, view)
+        if windows is None:
+            return True
+        current_key, previous_key, offset = windows
+        cache = caches[self.cache_alias]
+
+        # Both windows must survive until the end of the next one.
+        cache.add(current_key, 0, timeout=self.duration * 2)
+        try:
+            current = cache.incr(current_key)
+        except ValueError:
+            # The key expired between add() and incr().
+            cache.set(current_key, 1, timeout=self.duration * 2)
+            current = 1
+        previous = cache.get(previous_key, 0)
+
+        if self._admits(previous, current, offset):
+            return True
+        # Rejected requests do not count against the limit.
+        try:
+            cache.decr(current_key)
+        except ValueError:
+            pass
+        return False
+
+    async def aallow_request(self, request, view):
+        windows = self._windows(request, view)
+        if windows is None:
+            return True
+        current_key, previous_key, offset = windows
+        cache = caches[self.cache_alias]
+
+        await cache.aadd(current_key, 0, timeout=self.duration * 2)
+        try:
+            current = await cache.aincr(current_key)
+        except ValueError:
+            await cache.aset(current_key, 1, timeout=self.duration * 2)
+            current = 1
+        previous = await cache.aget(previous_key, 0)
+
+        if self._admits(previous, current, offset):
+            return True
+        try:
+            await cache.adecr(current_key)
+        except ValueError:
+            pass
+        return False
+
+    def _wait_time(self, previous, current, offset):
+        remaining = self.duration - offset
+        spare = self.num_requests - current - 1
+        if spare < 0 or not previous:
+            return remaining
+        # Time until the previous window's weight drops enough for one more request.
+        return max(0.0, min(remaining, self.duration * (1 - spare / previous) - offset))
+
+    def wait(self):
+        return getattr(self, 'wait_time', None)
+
+
+class RoleBasedThrottle(SlidingWindowRateThrottle):
+    def get_scope(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return 'anon'
+        role = request.user.role
+        if role in ROLE_SCOPES:
+            return role
+        return 'client'